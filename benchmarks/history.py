@@ -0,0 +1,245 @@
+"""A local history of benchmark reports and a regression check between commits.
+Reports from benchmarks.run are appended to a JSON lines file, one report per line keyed by
+the git commit (with a -dirty suffix for uncommitted changes) and a fingerprint of the
+machine. compare pools the run times of each scenario for two commits, or for a commit and
+the runs before it, and flags the scenarios where a Mann-Whitney U test finds the new times
+significantly slower. Only runs from the same machine with the same scenario parameters are
+compared, and instrumented runs are only compared with instrumented runs.
+python -m benchmarks.history record, then python -m benchmarks.history compare before merging
+a hot path change; compare exits with 1 if anything regressed."""
+import argparse
+import hashlib
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+from functools import lru_cache
+from typing import Iterator
+from benchmarks.run import machine_info, run_benchmarks
+from benchmarks.scenarios import REPO_ROOT, SCENARIOS
+
+HISTORY_PATH = os.path.join(REPO_ROOT, ".benchmarks", "history.jsonl")
+DIRTY_SUFFIX = "-dirty"
+ALPHA = 0.05
+# Smaller slowdowns are reported but not flagged, however significant
+MIN_CHANGE = 0.02
+ROLLING_RUNS = 5
+# Below this many combined samples without ties the exact U distribution is used
+EXACT_SAMPLES = 40
+
+
+def machine_fingerprint(machine: dict) -> str:
+    """A short stable id of the machine and interpreter a report was measured on"""
+    return hashlib.sha1(json.dumps(machine, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def git_dirty() -> bool:
+    """Whether the working tree has uncommitted changes to tracked files"""
+    try:
+        return bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                   cwd=REPO_ROOT, check=True, capture_output=True,
+                                   text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def append_report(report: dict, path: str=HISTORY_PATH, dirty: bool=False) -> dict:
+    """Keys a report by commit and machine and appends it to the history file"""
+    record = dict(report)
+    if dirty and record.get("commit"):
+        record["commit"] += DIRTY_SUFFIX
+    record["machine_id"] = machine_fingerprint(record["machine"])
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as history_file:
+        history_file.write(json.dumps(record) + "\n")
+    return record
+
+
+def read_history(path: str=HISTORY_PATH) -> Iterator[dict]:
+    """Yields the stored reports oldest first"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as history_file:
+        for line in history_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+@lru_cache(maxsize=None)
+def _u_counts(n_first: int, n_second: int) -> tuple[int, ...]:
+    """The number of orderings of the two samples giving each U value, without ties"""
+    if not n_first or not n_second:
+        return (1,)
+    # The largest value belongs to the first sample (adding n_second to U) or the second
+    with_first, with_second = _u_counts(n_first - 1, n_second), _u_counts(n_first, n_second - 1)
+    counts = [0] * (n_first * n_second + 1)
+    for u_value, count in enumerate(with_first):
+        counts[u_value + n_second] += count
+    for u_value, count in enumerate(with_second):
+        counts[u_value] += count
+    return tuple(counts)
+
+
+def mann_whitney_u(first: list[float], second: list[float]) -> tuple[float, float]:
+    """The U statistic of the first sample and the two-sided p-value of the samples coming
+    from the same distribution. Exact for small samples without ties, otherwise the normal
+    approximation with the tie correction"""
+    n_first, n_second = len(first), len(second)
+    if not n_first or not n_second:
+        raise ValueError("Both samples need at least one value")
+    values = sorted((value, sample_idx) for sample_idx, sample in enumerate((first, second))
+                    for value in sample)
+    ranks, tie_sizes, start = [0.0] * len(values), [], 0
+    while start < len(values):
+        end = start
+        while end + 1 < len(values) and values[end + 1][0] == values[start][0]:
+            end += 1
+        for value_idx in range(start, end + 1):
+            ranks[value_idx] = (start + end) / 2 + 1
+        tie_sizes.append(end - start + 1)
+        start = end + 1
+    rank_sum = sum(rank for rank, (_, sample_idx) in zip(ranks, values) if sample_idx == 0)
+    u_value = rank_sum - n_first * (n_first + 1) / 2
+    mean_u = n_first * n_second / 2
+
+    if n_first + n_second <= EXACT_SAMPLES and max(tie_sizes) == 1:
+        counts = _u_counts(n_first, n_second)
+        tail = min(u_value, n_first * n_second - u_value)
+        p_value = 2 * sum(counts[:int(tail) + 1]) / sum(counts)
+        return u_value, min(p_value, 1.0)
+
+    n_total = n_first + n_second
+    tie_term = sum(size ** 3 - size for size in tie_sizes) / (n_total * (n_total - 1))
+    variance = n_first * n_second / 12 * (n_total + 1 - tie_term)
+    if variance <= 0:
+        return u_value, 1.0
+    z_score = (abs(u_value - mean_u) - 0.5) / math.sqrt(variance)
+    return u_value, min(math.erfc(max(z_score, 0.0) / math.sqrt(2)), 1.0)
+
+
+def compare_times(base_times: list[float], head_times: list[float], alpha: float=ALPHA,
+                  min_change: float=MIN_CHANGE) -> dict:
+    """Compares the run times of one scenario, the verdict is regression, improvement or
+    unchanged"""
+    base_median, head_median = statistics.median(base_times), statistics.median(head_times)
+    change = head_median / base_median - 1 if base_median else 0.0
+    _, p_value = mann_whitney_u(head_times, base_times)
+    verdict = "unchanged"
+    if p_value < alpha and abs(change) >= min_change:
+        verdict = "regression" if change > 0 else "improvement"
+    return {"base_median": base_median, "head_median": head_median, "change": change,
+            "p_value": p_value, "base_runs": len(base_times), "head_runs": len(head_times),
+            "verdict": verdict}
+
+
+def _matches(commit: str, wanted: str) -> bool:
+    """Whether a stored commit is the wanted one, given as a prefix"""
+    return commit is not None and commit.startswith(wanted)
+
+
+def _pooled_times(records: list[dict]) -> dict[str, tuple[dict, list[float]]]:
+    """scenario -> (params, run times) over records, runs with other parameters than the
+    latest record's are left out"""
+    pooled = {}
+    for record in reversed(records):
+        for name, result in record["scenarios"].items():
+            params, times = pooled.setdefault(name, (result["params"], []))
+            if result["params"] == params:
+                times.extend(result["times"])
+    return pooled
+
+
+def compare_history(history: list[dict], head: str=None, base: str=None,
+                    rolling: int=ROLLING_RUNS, machine_id: str=None, alpha: float=ALPHA,
+                    min_change: float=MIN_CHANGE) -> dict:
+    """Compares the head commit (the latest run by default) with the base commit, or with
+    the rolling runs recorded before the head's first run that belong to other commits.
+    Only runs of the head's machine (or machine_id) instrumented like the head count"""
+    if machine_id is None:
+        machine_id = next((record["machine_id"] for record in reversed(history)
+                           if head is None or _matches(record["commit"], head)), None)
+    history = [record for record in history if record["machine_id"] == machine_id]
+    if not history:
+        raise ValueError("No benchmark runs recorded for this machine")
+    head_record = next((record for record in reversed(history)
+                        if head is None or _matches(record["commit"], head)), history[-1])
+    instrumented = head_record.get("instrumented", False)
+    history = [record for record in history
+               if record.get("instrumented", False) == instrumented]
+    head = history[-1]["commit"] if head is None else head
+    head_records = [record for record in history if _matches(record["commit"], head)]
+    if not head_records:
+        raise ValueError(f"No benchmark runs recorded for {head}")
+    if base is not None:
+        base_records = [record for record in history if _matches(record["commit"], base)]
+    else:
+        first_head_idx = history.index(head_records[0])
+        base_records = [record for record in history[:first_head_idx]
+                        if not _matches(record["commit"], head)][-rolling:]
+    if not base_records:
+        raise ValueError(f"No baseline runs to compare {head} with")
+
+    head_times, base_times = _pooled_times(head_records), _pooled_times(base_records)
+    scenarios = {}
+    for name, (params, times) in head_times.items():
+        if name in base_times and base_times[name][0] == params:
+            scenarios[name] = compare_times(base_times[name][1], times, alpha, min_change)
+    return {"head": head_records[-1]["commit"],
+            "base": sorted({record["commit"] for record in base_records}),
+            "machine_id": machine_id, "scenarios": scenarios}
+
+
+def format_comparison(comparison: dict) -> str:
+    """A table of the comparison, regressions marked"""
+    lines = [f"{comparison['head']} against {', '.join(comparison['base'])}"]
+    for name, result in comparison["scenarios"].items():
+        marker = {"regression": "!!", "improvement": "++"}.get(result["verdict"], "  ")
+        lines.append(f"{marker} {name:<16} {result['base_median'] * 1000:>10.1f}ms -> "
+                     f"{result['head_median'] * 1000:>10.1f}ms {result['change']:>+7.1%} "
+                     f"p={result['p_value']:.3f} {result['verdict']}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str]=None) -> int:
+    """Command line entry point: python -m benchmarks.history --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON lines results file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Run the benchmarks and store them")
+    record_parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS))
+    record_parser.add_argument("--warmup", type=int, default=1)
+    record_parser.add_argument("--repeats", type=int, default=5)
+    record_parser.add_argument("--quick", action="store_true")
+    compare_parser = commands.add_parser("compare", help="Flag regressions")
+    compare_parser.add_argument("--head", help="Commit to check, the latest run by default")
+    compare_parser.add_argument("--base", help="Commit to compare with, the rolling runs "
+                                "before the head by default")
+    compare_parser.add_argument("--rolling", type=int, default=ROLLING_RUNS)
+    compare_parser.add_argument("--alpha", type=float, default=ALPHA)
+    compare_parser.add_argument("--min-change", type=float, default=MIN_CHANGE)
+    commands.add_parser("list", help="Show the stored runs")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        report = run_benchmarks(args.scenarios, args.warmup, args.repeats, quick=args.quick)
+        record = append_report(report, args.history, git_dirty())
+        print(f"Recorded {len(record['scenarios'])} scenarios for {record['commit']} "
+              f"on {record['machine_id']}")
+    elif args.command == "compare":
+        comparison = compare_history(list(read_history(args.history)), args.head, args.base,
+                                     args.rolling, machine_fingerprint(machine_info()),
+                                     args.alpha, args.min_change)
+        print(format_comparison(comparison))
+        return int(any(result["verdict"] == "regression"
+                       for result in comparison["scenarios"].values()))
+    else:
+        for record in read_history(args.history):
+            print(f"{record['timestamp']} {record['commit']} {record['machine_id']} "
+                  f"{' '.join(record['scenarios'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Runs the benchmark scenarios and reports them as JSON.
+Each scenario gets warmup runs and then repeats timed runs with time.perf_counter, reported
+as the median and interquartile range of the run times. Memory is measured with tracemalloc
+in a separate untimed run so its overhead never reaches the timings. With
+PY_CHESS_BOT_INSTRUMENT set the scenarios run on instrumented engines, the report is marked
+instrumented and an untimed run collects the hot path counters of every scenario.
+python -m benchmarks.run --quick runs a small version of every scenario as a smoke test."""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from benchmarks.scenarios import REPO_ROOT, SCENARIOS, Scenario
+from src.instrumented_engine import collecting_counters, group_counters, instrumentation_enabled
+
+REPORT_VERSION = 1
+
+
+def run_scenario(scenario: Scenario, warmup: int=1, repeats: int=5, quick: bool=False) -> dict:
+    """Times a scenario, every run gets a fresh setup"""
+    params = scenario.quick_params if quick else scenario.params
+    times, units = [], 0
+    for run_idx in range(warmup + repeats):
+        workload = scenario.setup(**params)
+        start_time = time.perf_counter()
+        units = workload()
+        run_time = time.perf_counter() - start_time
+        if run_idx >= warmup:
+            times.append(run_time)
+
+    median = statistics.median(times)
+    # quantiles needs two points, a single run has no spread
+    first_quartile, _, third_quartile = statistics.quantiles(times, n=4)\
+        if len(times) > 1 else (median, median, median)
+    expected_units = scenario.expected(**params) if scenario.expected else None
+    return {"description": scenario.description, "params": params, "unit": scenario.unit,
+            "units": units, "expected_units": expected_units, "warmup": warmup, "repeats": repeats, "times": times,
+            "median": median, "iqr": third_quartile - first_quartile,
+            "units_per_sec": units / median if median else None}
+
+
+def measure_memory(scenario: Scenario, quick: bool=False) -> dict:
+    """The peak memory of one run of the workload and what it still holds afterwards,
+    setup excluded"""
+    workload = scenario.setup(**(scenario.quick_params if quick else scenario.params))
+    tracemalloc.start()
+    try:
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        workload()
+        end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes": peak_bytes - start_bytes, "retained_bytes": end_bytes - start_bytes}
+
+
+def measure_counters(scenario: Scenario, quick: bool=False) -> dict[str, dict[str, int]]:
+    """The hot path counters of one run of the workload on instrumented engines, setup
+    excluded"""
+    with collecting_counters() as counters:
+        workload = scenario.setup(**(scenario.quick_params if quick else scenario.params))
+        counters.clear()
+        workload()
+    return group_counters(counters)
+
+
+def git_commit() -> str | None:
+    """The commit being benchmarked, None outside of a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info() -> dict:
+    """What the numbers were measured on"""
+    return {"node": platform.node(), "platform": platform.platform(),
+            "machine": platform.machine(), "processor": platform.processor(),
+            "cpu_count": os.cpu_count(), "python": platform.python_version(),
+            "implementation": platform.python_implementation()}
+
+
+def run_benchmarks(names: list[str]=None, warmup: int=1, repeats: int=5, memory: bool=False,
+                   quick: bool=False) -> dict:
+    """Runs the named scenarios (all of them by default) into a JSON ready report"""
+    instrumented = instrumentation_enabled()
+    report = {"version": REPORT_VERSION, "commit": git_commit(), "machine": machine_info(),
+              "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "quick": quick, "instrumented": instrumented, "scenarios": {}}
+    for name in names or SCENARIOS:
+        result = run_scenario(SCENARIOS[name], warmup, repeats, quick)
+        if memory:
+            result["memory"] = measure_memory(SCENARIOS[name], quick)
+        if instrumented:
+            result["counters"] = measure_counters(SCENARIOS[name], quick)
+        report["scenarios"][name] = result
+    return report
+
+
+def format_report(report: dict) -> str:
+    """A table of the scenarios"""
+    lines = []
+    for name, result in report["scenarios"].items():
+        line = f"{name:<16} {result['median'] * 1000:>10.1f}ms ± {result['iqr'] * 1000:.1f}ms "\
+            f"(IQR) {result['units']:>10,} {result['unit']}"
+        if result["units_per_sec"]:
+            line += f" {result['units_per_sec']:>12,.0f} {result['unit']}/s"
+        if "memory" in result:
+            line += f" peak {result['memory']['peak_bytes'] / 1024:,.0f}KiB"
+        if result.get("expected_units") not in (None, result["units"]):
+            line += f" WRONG, expected {result['expected_units']:,} {result['unit']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    """Command line entry point: python -m benchmarks.run --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=None)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--memory", action="store_true", help="Add a tracemalloc pass")
+    parser.add_argument("--quick", action="store_true", help="Small versions of the scenarios")
+    parser.add_argument("--output", help="JSON file to write, - for stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scenarios, args.warmup, args.repeats, args.memory, args.quick)
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        return
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
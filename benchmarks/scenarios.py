@@ -0,0 +1,172 @@
+"""Named benchmark scenarios for MainEngine.
+A scenario's setup takes its parameters and returns a workload: a function that does the
+timed work and returns the number of units it processed (nodes, moves, games...). Setup is
+never timed, so every run of a workload starts from the same fresh state. The engines are
+built with src.instrumented_engine, so PY_CHESS_BOT_INSTRUMENT instruments them."""
+import os
+import random
+import subprocess
+import sys
+from typing import Callable, NamedTuple
+from src.instrumented_engine import get_engine_class, make_engine
+from src.main_engine import MainEngine
+from src.main_engine_adapter import MainEngineAdapter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERFT_POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "endgame": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+}
+# Published perft node counts by depth, from the Chess Programming Wiki
+PERFT_REFERENCE = {
+    "start": [1, 20, 400, 8902, 197281],
+    "kiwipete": [1, 48, 2039, 97862, 4085603],
+    "endgame": [1, 14, 191, 2812, 43238, 674624],
+}
+WALK_SEED = 21221
+
+
+class Scenario(NamedTuple):
+    """A benchmark: setup(**params) returns the workload, quick_params are a small version
+    for smoke tests. expected(**params), when given, is the number of units a correct
+    workload processes, None if unknown"""
+    name: str
+    description: str
+    unit: str
+    setup: Callable[..., Callable[[], int]]
+    params: dict
+    quick_params: dict
+    expected: Callable[..., int | None] = None
+
+
+def perft(engine: MainEngine, depth: int) -> int:
+    """The number of leaf nodes of the legal move tree to depth"""
+    if depth == 0:
+        return 1
+    moves = engine.get_all_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        engine.execute_instructions(move)
+        nodes += perft(engine, depth - 1)
+        engine.reverse_last_instruction()
+    return nodes
+
+
+def walk_positions(n_positions: int, rand_seed: int=WALK_SEED) -> list[list]:
+    """States visited by random games, a new game starts whenever one ends"""
+    rand = random.Random(rand_seed)
+    engine, states = make_engine(), []
+    while len(states) < n_positions:
+        moves = engine.get_all_moves()
+        if not moves or not engine.sufficient_material() or len(engine.state_stack) >= 200:
+            engine = make_engine()
+            continue
+        states.append(engine.state.copy())
+        engine.execute_instructions(rand.choice(moves))
+    return states
+
+
+def _perft_setup(position: str, depth: int) -> Callable[[], int]:
+    """perft of one of PERFT_POSITIONS, the units are the leaf nodes"""
+    engine = get_engine_class().from_fen(PERFT_POSITIONS[position])
+    return lambda: perft(engine, depth)
+
+
+def _perft_expected(position: str, depth: int) -> int | None:
+    """The published perft count, None past the known depths"""
+    reference = PERFT_REFERENCE[position]
+    return reference[depth] if depth < len(reference) else None
+
+
+def _random_walk_setup(n_games: int, max_turns: int) -> Callable[[], int]:
+    """The random walk time_per_game.py used to run, the units are the moves considered"""
+    def workload() -> int:
+        moves_considered = 0
+        for game_idx in range(n_games):
+            # Same seeds as time_per_game.py so old and new numbers stay comparable
+            adapter = MainEngineAdapter(rand_seed=(2 ** (game_idx + 5)) - (12345 * game_idx))
+            for _ in range(max_turns):
+                new_moves_count = adapter.play_random_move()
+                moves_considered += new_moves_count
+                if new_moves_count == 0:
+                    break
+        return moves_considered
+    return workload
+
+
+def _move_generation_setup(n_positions: int) -> Callable[[], int]:
+    """Pseudo-legal move generation only, the units are the moves generated"""
+    engines = [make_engine(state) for state in walk_positions(n_positions)]
+    def workload() -> int:
+        n_moves = 0
+        for engine in engines:
+            if engine.state[-1]:
+                n_moves += len(engine.get_white_moves())
+            else:
+                n_moves += len(engine.get_black_moves())
+        return n_moves
+    return workload
+
+
+def _legality_filter_setup(n_positions: int) -> Callable[[], int]:
+    """The illegal move filter over pregenerated pseudo-legal moves, the units are the
+    moves filtered"""
+    engines = [make_engine(state) for state in walk_positions(n_positions)]
+    # pylint: disable=protected-access
+    pseudo_moves = [
+        engine._udpate_moves_to_remove_castle(
+            engine.get_white_moves() if engine.state[-1] else engine.get_black_moves())
+        for engine in engines]
+    def workload() -> int:
+        for engine, moves in zip(engines, pseudo_moves):
+            engine._filter_illegal_moves(moves)
+        return sum(len(moves) for moves in pseudo_moves)
+    return workload
+
+
+def _execute_reverse_setup(n_positions: int) -> Callable[[], int]:
+    """Executes and reverses every legal move of each position, the units are the moves"""
+    engines = [make_engine(state) for state in walk_positions(n_positions)]
+    legal_moves = [engine.get_all_moves() for engine in engines]
+    def workload() -> int:
+        for engine, moves in zip(engines, legal_moves):
+            for move in moves:
+                engine.execute_instructions(move)
+                engine.reverse_last_instruction()
+        return sum(len(moves) for moves in legal_moves)
+    return workload
+
+
+def _import_time_setup(module: str) -> Callable[[], int]:
+    """Imports a module in a fresh interpreter, interpreter start up included"""
+    def workload() -> int:
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_ROOT, check=True)
+        return 1
+    return workload
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario("perft_start", "perft of the starting position", "nodes", _perft_setup,
+             {"position": "start", "depth": 4}, {"position": "start", "depth": 2},
+             _perft_expected),
+    Scenario("perft_kiwipete", "perft of a middlegame full of tactics", "nodes", _perft_setup,
+             {"position": "kiwipete", "depth": 3}, {"position": "kiwipete", "depth": 1},
+             _perft_expected),
+    Scenario("perft_endgame", "perft of a rook and pawns endgame", "nodes", _perft_setup,
+             {"position": "endgame", "depth": 4}, {"position": "endgame", "depth": 2},
+             _perft_expected),
+    Scenario("random_walk", "random games through MainEngineAdapter", "moves",
+             _random_walk_setup, {"n_games": 100, "max_turns": 150},
+             {"n_games": 2, "max_turns": 20}),
+    Scenario("move_generation", "pseudo-legal move generation", "moves",
+             _move_generation_setup, {"n_positions": 2000}, {"n_positions": 20}),
+    Scenario("legality_filter", "illegal move filtering", "moves", _legality_filter_setup,
+             {"n_positions": 2000}, {"n_positions": 20}),
+    Scenario("execute_reverse", "executing and reversing moves", "moves",
+             _execute_reverse_setup, {"n_positions": 2000}, {"n_positions": 20}),
+    Scenario("import_time", "importing src.main_engine in a new interpreter", "imports",
+             _import_time_setup, {"module": "src.main_engine"}, {"module": "src.main_engine"}),
+)}
@@ -0,0 +1,78 @@
+"""Vectorized evaluation of large sets of engine states with NumPy"""
+from itertools import chain
+import numpy as np
+from src.resources.piece_square_tables import SQUARE_STATE_TABLE, CASTLE_RIGHT_SCORES,\
+    TEMPO_SCORE
+
+STATE_LENGTH = 69
+CASTLE_BIT_SHIFTS = np.arange(4, dtype=np.int8)
+SQUARE_OFFSETS = np.arange(64, dtype=np.intp) * 13
+
+
+def pack_states(states) -> np.ndarray:
+    """Packs engine states into an (n_states, 69) int8 matrix with one row per state.
+    states is either a list of state lists or a buffer of packed int8 rows
+    (bytes, bytearray, memoryview, ndarray...) which is viewed without copying."""
+    if isinstance(states, np.ndarray):
+        if states.dtype != np.int8:
+            states = states.astype(np.int8)
+        return states.reshape(-1, STATE_LENGTH)
+    if isinstance(states, (bytes, bytearray, memoryview)):
+        return np.frombuffer(states, dtype=np.int8).reshape(-1, STATE_LENGTH)
+    return np.fromiter(chain.from_iterable(states), dtype=np.int8,
+                       count=len(states) * STATE_LENGTH).reshape(-1, STATE_LENGTH)
+
+
+class BatchEvaluator:
+    """Scores engine states with a square-state table plus linear castle and turn terms.
+    Scores are centipawns from white's point of view."""
+    def __init__(self, square_state_weights=None, castle_weights=None,
+                 tempo: float=TEMPO_SCORE, chunk_size: int=1 << 16) -> None:
+        if square_state_weights is None:
+            square_state_weights = SQUARE_STATE_TABLE
+        if castle_weights is None:
+            castle_weights = CASTLE_RIGHT_SCORES
+        self.square_state_weights = np.asarray(square_state_weights, dtype=np.float64)
+        self.castle_weights = np.asarray(castle_weights, dtype=np.float64)
+        self.tempo = float(tempo)
+        self.chunk_size = chunk_size
+
+        # Lookups used by the two evaluation paths
+        self._flat_weights = self.square_state_weights.ravel()
+        self._weight_rows = self.square_state_weights.tolist()
+        self._castle_scores = [
+            sum(w for bit, w in enumerate(self.castle_weights) if castle_state >> bit & 1)
+            for castle_state in range(16)]
+
+    @classmethod
+    def load(cls, path: str, chunk_size: int=1 << 16) -> "BatchEvaluator":
+        """Loads weights saved with save()"""
+        with np.load(path) as weights:
+            return cls(weights["square_state_weights"], weights["castle_weights"],
+                       float(weights["tempo"]), chunk_size)
+
+    def save(self, path: str):
+        """Saves the weights in an .npz file"""
+        np.savez(path, square_state_weights=self.square_state_weights,
+                 castle_weights=self.castle_weights, tempo=np.float64(self.tempo))
+
+    def evaluate(self, states) -> np.ndarray:
+        """Evaluates every state in states (see pack_states) returning a float array.
+        Rows are processed in chunks to bound the size of the gathered weights."""
+        boards = pack_states(states)
+        scores = np.empty(len(boards), dtype=np.float64)
+        for start in range(0, len(boards), self.chunk_size):
+            chunk = boards[start:start + self.chunk_size]
+            chunk_scores = self._flat_weights[chunk[:, :64] + SQUARE_OFFSETS].sum(axis=1)
+            chunk_scores += ((chunk[:, 66, None] >> CASTLE_BIT_SHIFTS) & 1) @ self.castle_weights
+            chunk_scores += np.where(chunk[:, 68] != 0, self.tempo, -self.tempo)
+            scores[start:start + len(chunk)] = chunk_scores
+        return scores
+
+    def evaluate_state(self, state: list) -> float:
+        """Evaluates a single state list without going through NumPy"""
+        weights = self._weight_rows
+        score = self._castle_scores[state[66]] + (self.tempo if state[68] else -self.tempo)
+        for square_idx in range(64):
+            score += weights[square_idx][state[square_idx]]
+        return score
@@ -0,0 +1,143 @@
+"""Batches leaf evaluations from many concurrent searches into single NumPy evaluations.
+Searches and games run as asyncio coroutines that await BatchScheduler.evaluate(state).
+The pending states are evaluated together once batch_size of them are waiting or the oldest
+has waited max_latency seconds, and every coroutine gets its own score back.
+python -m src.evaluation.batch_scheduler compares the evaluation throughput of batch sizes
+over concurrent greedy self-play games."""
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable
+import numpy as np
+from src.evaluation.batch_evaluator import BatchEvaluator, pack_states
+from src.main_engine import MainEngine
+
+
+class BatchScheduler:
+    """Collects states from coroutines and scores them with evaluate_batch, which takes an
+    (n, 69) int8 array of packed states (see pack_states) and returns n scores, e.g.
+    BatchEvaluator.evaluate or NNUEEvaluator.evaluate_batch"""
+    def __init__(self, evaluate_batch: Callable[[np.ndarray], np.ndarray],
+                 batch_size: int=256, max_latency: float=0.001) -> None:
+        self.evaluate_batch = evaluate_batch
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self._states, self._futures = [], []
+        self._timer = None
+        self.n_batches = 0
+        self.n_positions = 0
+        self.eval_seconds = 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        """The average number of states per evaluation"""
+        return self.n_positions / self.n_batches if self.n_batches else 0.0
+
+    @property
+    def evals_per_sec(self) -> float:
+        """Positions scored per second spent in evaluate_batch"""
+        return self.n_positions / self.eval_seconds if self.eval_seconds else 0.0
+
+    async def evaluate(self, state: list) -> float:
+        """Queues a copy of the state and waits for its score"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._states.append(state.copy())
+        self._futures.append(future)
+        if len(self._states) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self.flush)
+        return await future
+
+    def flush(self):
+        """Evaluates every pending state now, errors are passed on to the waiting coroutines"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._states:
+            return
+        states, futures = self._states, self._futures
+        self._states, self._futures = [], []
+
+        start_time = time.perf_counter()
+        try:
+            scores = np.asarray(self.evaluate_batch(pack_states(states))).tolist()
+        except Exception as error:  # pylint: disable=broad-except
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.eval_seconds += time.perf_counter() - start_time
+        self.n_batches += 1
+        self.n_positions += len(states)
+        for future, score in zip(futures, scores):
+            if not future.done():
+                future.set_result(score)
+
+
+async def play_greedy_game(scheduler: BatchScheduler, rand_seed: int=None,
+                           max_plies: int=100) -> int:
+    """Plays a game where each side picks the move with the best evaluation after it,
+    scoring all the moves of a ply in one request to the scheduler. Returns the plies"""
+    rand = random.Random(rand_seed)
+    engine = MainEngine()
+    for ply in range(max_plies):
+        moves = engine.get_all_moves()
+        if not moves or not engine.sufficient_material():
+            return ply
+        child_states = []
+        for move in moves:
+            engine.execute_instructions(move)
+            child_states.append(engine.state.copy())
+            engine.reverse_last_instruction()
+        scores = await asyncio.gather(*(scheduler.evaluate(state) for state in child_states))
+        sign = 1 if engine.state[-1] else -1
+        # Noise keeps the games apart
+        best_idx = max(range(len(moves)), key=lambda idx: sign * scores[idx] + rand.random())
+        engine.execute_instructions(moves[best_idx])
+    return max_plies
+
+
+async def _play_greedy_games(scheduler: BatchScheduler, n_games: int, rand_seed: int,
+                             max_plies: int) -> list[int]:
+    """Plays n_games concurrently and flushes the last requests"""
+    return await asyncio.gather(*(play_greedy_game(scheduler, rand_seed + game_idx, max_plies)
+                                  for game_idx in range(n_games)))
+
+
+def run_greedy_self_play(evaluate_batch: Callable[[np.ndarray], np.ndarray], n_games: int=32,
+                         batch_size: int=256, max_latency: float=0.001,
+                         rand_seed: int=21221, max_plies: int=100) -> dict:
+    """Plays n_games concurrent greedy games through one scheduler and reports the plies,
+    the batches and the evaluation throughput"""
+    scheduler = BatchScheduler(evaluate_batch, batch_size, max_latency)
+    start_time = time.perf_counter()
+    plies = asyncio.run(_play_greedy_games(scheduler, n_games, rand_seed, max_plies))
+    return {"plies": sum(plies), "positions": scheduler.n_positions,
+            "batches": scheduler.n_batches, "mean_batch_size": scheduler.mean_batch_size,
+            "evals_per_sec": scheduler.evals_per_sec,
+            "seconds": time.perf_counter() - start_time}
+
+
+def main():
+    """Command line entry point: python -m src.evaluation.batch_scheduler --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=64)
+    parser.add_argument("--max-plies", type=int, default=40)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096])
+    args = parser.parse_args()
+
+    evaluator = BatchEvaluator()
+    for batch_size in args.batch_sizes:
+        report = run_greedy_self_play(evaluator.evaluate, args.games, batch_size,
+                                      max_plies=args.max_plies)
+        print(f"batch size {batch_size:>5}: {report['batches']:,} batches of "
+              f"{report['mean_batch_size']:.1f} positions, "
+              f"{report['evals_per_sec']:,.0f} evals/s in the evaluator, "
+              f"{report['positions'] / report['seconds']:,.0f} evals/s overall")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""A bounded evaluation cache keyed by the engine's Zobrist hash"""
+from array import array
+from typing import Callable
+
+EMPTY_SCORE = float("nan")
+
+
+class EvalCache:
+    """Fixed-size arrays of (zobrist_hash, score) entries indexed by the low bits of the hash.
+    With two_way=True every index is a bucket of two entries, a new entry pushes the
+    bucket's newest entry into the second slot. Otherwise entries are always replaced.
+    Empty slots hold a NaN score so a hash of 0 is still a valid key."""
+    def __init__(self, size_bits: int=16, two_way: bool=True) -> None:
+        self.two_way = two_way
+        self.size_bits = size_bits
+        self.mask = (1 << size_bits) - 1
+        self.keys = array("Q")
+        self.scores = array("d")
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.clear()
+
+    def __len__(self) -> int:
+        """The number of occupied slots"""
+        return sum(1 for score in self.scores if score == score)
+
+    @property
+    def n_slots(self) -> int:
+        """The total number of entries the cache can hold"""
+        return (self.mask + 1) << self.two_way
+
+    @property
+    def memory_bytes(self) -> int:
+        """The size of the backing arrays"""
+        return self.keys.itemsize * len(self.keys) + self.scores.itemsize * len(self.scores)
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of probes that found an entry since the counters were last reset"""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def reset_counters(self):
+        """Zeroes the probe, hit and store counters"""
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        """Empties every slot and resets the counters"""
+        self.keys = array("Q", bytes(8 * self.n_slots))
+        self.scores = array("d", [EMPTY_SCORE]) * self.n_slots
+        self.reset_counters()
+
+    def resize(self, size_bits: int):
+        """Changes the number of indices to 2 ** size_bits, re-inserting the current entries.
+        Entries that collide in a smaller cache are dropped."""
+        old_entries = [(key, score) for key, score in zip(self.keys, self.scores)
+                       if score == score]
+        self.size_bits = size_bits
+        self.mask = (1 << size_bits) - 1
+        self.clear()
+        for key, score in reversed(old_entries):
+            self.store(key, score)
+        self.reset_counters()
+
+    def probe(self, key: int) -> float | None:
+        """Returns the score stored for key or None if it isn't cached"""
+        self.probes += 1
+        slot = key & self.mask
+        if self.two_way:
+            slot <<= 1
+            if self.keys[slot] != key:
+                slot += 1
+        if self.keys[slot] == key:
+            score = self.scores[slot]
+            # Empty slots hold NaN which is the only value not equal to itself
+            if score == score:
+                self.hits += 1
+                return score
+        return None
+
+    def store(self, key: int, score: float):
+        """Stores the score for key, replacing whatever was in its slot"""
+        self.stores += 1
+        slot = key & self.mask
+        if self.two_way:
+            slot <<= 1
+            # Age the bucket's newest entry into the second slot
+            if self.keys[slot] != key:
+                self.keys[slot + 1] = self.keys[slot]
+                self.scores[slot + 1] = self.scores[slot]
+        self.keys[slot] = key
+        self.scores[slot] = score
+
+    def evaluate(self, engine, eval_func: Callable[[list], float]) -> float:
+        """Returns eval_func(engine.state), only calling it if the engine's hash isn't cached"""
+        key = hash(engine)
+        score = self.probe(key)
+        if score is None:
+            score = eval_func(engine.state)
+            self.store(key, score)
+        return score
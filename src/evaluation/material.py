@@ -0,0 +1,70 @@
+"""Material evaluation through the material table, picking specialized endgame scorers"""
+from src.resources.material_table import MATERIAL_TABLE, SUFFICIENT_MATERIAL_FLAG, DRAWISH_FLAG
+
+DRAWISH_SCALE = 0.25
+# The light squared corners a8 and h1 and the dark squared corners h8 and a1
+LIGHT_CORNERS = (0, 63)
+DARK_CORNERS = (7, 56)
+
+
+def _distance(square_a: int, square_b: int) -> int:
+    """The number of king moves between two squares"""
+    return max(abs((square_a >> 3) - (square_b >> 3)), abs((square_a & 7) - (square_b & 7)))
+
+
+def _distance_to_edge(square: int) -> int:
+    """The number of king moves from square to the closest edge of the board"""
+    rank, file = square >> 3, square & 7
+    return min(rank, 7 - rank, file, 7 - file)
+
+
+def _king_squares(state: list, strong_side_white: bool) -> tuple[int, int]:
+    """Returns the (strong_king, weak_king) squares"""
+    if strong_side_white:
+        return state[65], state[64]
+    return state[64], state[65]
+
+
+def score_kxk(state: list, strong_side_white: bool) -> int:
+    """Lone king against a major piece: push the king to the edge and close in"""
+    strong_king, weak_king = _king_squares(state, strong_side_white)
+    return 40 * (3 - _distance_to_edge(weak_king)) + 10 * (7 - _distance(strong_king, weak_king))
+
+
+def score_kbnk(state: list, strong_side_white: bool) -> int:
+    """Bishop and knight: mate only happens in a corner the bishop's color"""
+    strong_king, weak_king = _king_squares(state, strong_side_white)
+    bishop = 3 if strong_side_white else 9
+    bishop_square = state.index(bishop, 0, 64)
+    # Light squares are the ones where the rank and file have the same parity (a8 is light)
+    corners = LIGHT_CORNERS if ((bishop_square >> 3) + bishop_square) % 2 == 0 else DARK_CORNERS
+    corner_distance = min(_distance(weak_king, corner) for corner in corners)
+    return 30 * (7 - corner_distance) + 10 * (7 - _distance(strong_king, weak_king))
+
+
+def score_kpk(state: list, strong_side_white: bool) -> int:
+    """King and pawn: push the pawn while the king stays close to it"""
+    strong_king, weak_king = _king_squares(state, strong_side_white)
+    pawn_square = state.index(1 if strong_side_white else 7, 0, 64)
+    ranks_advanced = 6 - (pawn_square >> 3) if strong_side_white else (pawn_square >> 3) - 1
+    return 20 * ranks_advanced + 5 * (_distance(weak_king, pawn_square)
+                                       - _distance(strong_king, pawn_square))
+
+
+ENDGAME_SCORERS = {"KXK": score_kxk, "KBNK": score_kbnk, "KPK": score_kpk}
+
+
+def evaluate_material(engine) -> float:
+    """Scores the material of the engine's state from white's point of view with a single
+    MATERIAL_TABLE lookup, adding the endgame scorer's terms when one applies"""
+    entry = MATERIAL_TABLE[engine.material_key]
+    if not entry.flags & SUFFICIENT_MATERIAL_FLAG:
+        return 0.0
+
+    score = entry.imbalance
+    if entry.endgame is not None:
+        bonus = ENDGAME_SCORERS[entry.endgame](engine.state, entry.strong_side_white)
+        score += bonus if entry.strong_side_white else -bonus
+    if entry.flags & DRAWISH_FLAG:
+        score *= DRAWISH_SCALE
+    return float(score)
@@ -0,0 +1,178 @@
+"""A small efficiently updatable neural network (NNUE) evaluator in pure NumPy.
+The first layer is a (768, hidden) matrix with a row for every (piece, square) feature,
+the accumulator holds its output and is updated by adding and subtracting the rows of the
+squares an instruction set changes instead of being recomputed for every position."""
+import random
+import time
+import numpy as np
+from src.main_engine import MainEngine, instruction_square_changes
+
+N_FEATURES = 12 * 64
+# int16 first layer weights are stored multiplied by this and clipped at it after the ReLU
+QUANTIZATION_SCALE = 255
+OUTPUT_SCALE = 400.0
+
+
+def active_features(state: list) -> list[int]:
+    """The first layer rows of every piece on the board"""
+    return [(square_state - 1) * 64 + square_idx
+            for square_idx, square_state in enumerate(state[:64]) if square_state]
+
+
+class NNUEEvaluator:
+    """Evaluates positions in centipawns from white's point of view.
+    Use execute_instructions/reverse_last_instruction alongside the MainEngine methods
+    of the same name to keep the accumulator in sync with the engine."""
+    def __init__(self, layers: dict[str, np.ndarray], dtype=np.float32) -> None:
+        self.dtype = np.dtype(dtype)
+        if self.dtype == np.int16:
+            self.feature_weights = np.round(
+                layers["feature_weights"] * QUANTIZATION_SCALE).astype(np.int16)
+            self.feature_bias = np.round(
+                layers["feature_bias"] * QUANTIZATION_SCALE).astype(np.int16)
+            self.activation_max = QUANTIZATION_SCALE
+        else:
+            self.feature_weights = layers["feature_weights"].astype(np.float32)
+            self.feature_bias = layers["feature_bias"].astype(np.float32)
+            self.activation_max = 1.0
+        self.hidden_weights = layers["hidden_weights"].astype(np.float32) / self.activation_max
+        self.hidden_bias = layers["hidden_bias"].astype(np.float32)
+        self.output_weights = layers["output_weights"].astype(np.float32)
+        self.output_bias = float(layers["output_bias"])
+
+        # Accumulators for every ply, the current one is at self.ply
+        self.accumulators = np.zeros((64, len(self.feature_bias)), dtype=self.dtype)
+        self.ply = 0
+
+    @classmethod
+    def random(cls, hidden_size: int=256, hidden2_size: int=32,
+               seed: int=21221, dtype=np.float32) -> "NNUEEvaluator":
+        """Makes an untrained network with small random weights"""
+        rng = np.random.default_rng(seed)
+        layers = {
+            "feature_weights": rng.normal(0, 0.05, (N_FEATURES, hidden_size)),
+            "feature_bias": rng.normal(0, 0.05, hidden_size),
+            "hidden_weights": rng.normal(0, 1 / np.sqrt(hidden_size), (hidden_size, hidden2_size)),
+            "hidden_bias": np.zeros(hidden2_size),
+            "output_weights": rng.normal(0, 1 / np.sqrt(hidden2_size), hidden2_size),
+            "output_bias": np.zeros(()),
+        }
+        return cls(layers, dtype)
+
+    @classmethod
+    def load(cls, path: str, dtype=np.float32) -> "NNUEEvaluator":
+        """Loads float weights saved with save()"""
+        with np.load(path) as layers:
+            return cls(dict(layers), dtype)
+
+    def save(self, path: str):
+        """Saves the weights as float32 arrays in an .npz file"""
+        scale = QUANTIZATION_SCALE if self.dtype == np.int16 else 1.0
+        np.savez(path,
+                 feature_weights=self.feature_weights.astype(np.float32) / scale,
+                 feature_bias=self.feature_bias.astype(np.float32) / scale,
+                 hidden_weights=self.hidden_weights * self.activation_max,
+                 hidden_bias=self.hidden_bias, output_weights=self.output_weights,
+                 output_bias=np.float32(self.output_bias))
+
+    def _forward(self, accumulator: np.ndarray) -> float:
+        """Runs the layers after the accumulator"""
+        hidden = np.clip(accumulator, 0, self.activation_max).astype(np.float32) @\
+            self.hidden_weights
+        hidden += self.hidden_bias
+        np.clip(hidden, 0, 1, out=hidden)
+        return float(hidden @ self.output_weights + self.output_bias) * OUTPUT_SCALE
+
+    def refresh(self, state: list):
+        """Recomputes the accumulator of the current ply from scratch"""
+        self.accumulators[self.ply] = self.feature_bias + self.feature_weights[
+            active_features(state)].sum(axis=0, dtype=self.dtype)
+
+    def execute_instructions(self, instruction_set: tuple):
+        """Moves to the next ply, updating the accumulator with the squares that change"""
+        if self.ply + 1 == len(self.accumulators):
+            self.accumulators = np.concatenate([self.accumulators,
+                                                np.zeros_like(self.accumulators)])
+        accumulator = self.accumulators[self.ply + 1]
+        accumulator[:] = self.accumulators[self.ply]
+        for square_idx, old_state, new_state in instruction_square_changes(instruction_set):
+            if old_state:
+                accumulator -= self.feature_weights[(old_state - 1) * 64 + square_idx]
+            if new_state:
+                accumulator += self.feature_weights[(new_state - 1) * 64 + square_idx]
+        self.ply += 1
+
+    def reverse_last_instruction(self):
+        """Goes back to the previous ply's accumulator"""
+        self.ply -= 1
+
+    def evaluate(self) -> float:
+        """Evaluates the position the accumulator represents"""
+        return self._forward(self.accumulators[self.ply])
+
+    def evaluate_state(self, state: list) -> float:
+        """Evaluates a state by recomputing the first layer from scratch"""
+        accumulator = self.feature_bias + self.feature_weights[
+            active_features(state)].sum(axis=0, dtype=self.dtype)
+        return self._forward(accumulator)
+
+    def evaluate_batch(self, boards: np.ndarray) -> np.ndarray:
+        """Evaluates an (n_states, >=64) array of packed states in one pass by multiplying
+        their one-hot features with the first layer"""
+        squares = np.asarray(boards)[:, :64].astype(np.intp)
+        features = np.zeros((len(squares), N_FEATURES + 64), dtype=np.float32)
+        # Empty squares land in the 64 padding columns which are dropped before the product
+        rows = np.where(squares > 0, squares - 1, 12) * 64 + np.arange(64)
+        features[np.arange(len(squares))[:, None], rows] = 1
+        accumulators = features[:, :N_FEATURES] @ self.feature_weights + self.feature_bias
+        hidden = np.clip(accumulators, 0, self.activation_max) @ self.hidden_weights
+        hidden += self.hidden_bias
+        np.clip(hidden, 0, 1, out=hidden)
+        return (hidden @ self.output_weights + self.output_bias) * OUTPUT_SCALE
+
+
+def benchmark(evaluator: NNUEEvaluator, n_games: int=20, max_turns: int=100,
+              rand_seed: int=21221) -> dict[str, float]:
+    """Plays random games with MainEngine and times evaluating every position reached,
+    once with incremental accumulator updates and once recomputing every accumulator"""
+    random.seed(rand_seed)
+    games, states = [], []
+    for _ in range(n_games):
+        engine = MainEngine()
+        start_state = engine.state.copy()
+        for _turn in range(max_turns):
+            moves = engine.get_all_moves()
+            if not moves:
+                break
+            engine.execute_instructions(random.choice(moves))
+            states.append(engine.state.copy())
+        games.append((start_state, list(engine.state_stack)))
+    n_evals = len(states)
+
+    start_time = time.perf_counter()
+    for start_state, moves in games:
+        evaluator.ply = 0
+        evaluator.refresh(start_state)
+        for move in moves:
+            evaluator.execute_instructions(move)
+            evaluator.evaluate()
+    incremental_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for state in states:
+        evaluator.evaluate_state(state)
+    full_time = time.perf_counter() - start_time
+
+    return {
+        "evaluations": n_evals,
+        "incremental_evals_per_sec": n_evals / incremental_time,
+        "full_recompute_evals_per_sec": n_evals / full_time,
+    }
+
+
+if __name__ == "__main__":
+    for benchmark_dtype in (np.float32, np.int16):
+        results = benchmark(NNUEEvaluator.random(dtype=benchmark_dtype))
+        print(f"{np.dtype(benchmark_dtype).name}: {results['evaluations']} evaluations, "
+              f"incremental {results['incremental_evals_per_sec']:,.0f} evals/s, "
+              f"full recompute {results['full_recompute_evals_per_sec']:,.0f} evals/s")
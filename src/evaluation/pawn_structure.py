@@ -0,0 +1,56 @@
+"""Pawn structure evaluation cached by the engine's pawn-only Zobrist hash"""
+from src.evaluation.eval_cache import EvalCache
+
+DOUBLED_PAWN_SCORE = -10
+ISOLATED_PAWN_SCORE = -15
+# Indexed by how many ranks the passed pawn has advanced from its starting rank
+PASSED_PAWN_SCORES = [0, 5, 10, 20, 35, 60, 100, 0]
+
+
+def evaluate_pawn_structure(state: list) -> float:
+    """Scores doubled, isolated and passed pawns in centipawns from white's point of view.
+    Rows count from the 8th rank (row 0) like the state list so white pawns move to lower rows"""
+    white_rows = [[] for _ in range(8)]
+    black_rows = [[] for _ in range(8)]
+    for idx in range(8, 56):
+        if state[idx] == 1:
+            white_rows[idx & 7].append(idx >> 3)
+        elif state[idx] == 7:
+            black_rows[idx & 7].append(idx >> 3)
+
+    # The most advanced enemy pawns on each file decide if a pawn is passed
+    # Padding files -1 and 8 with the values for "no pawn" avoids edge checks
+    black_front = [8] + [min(rows, default=8) for rows in black_rows] + [8]
+    white_front = [-1] + [max(rows, default=-1) for rows in white_rows] + [-1]
+
+    score = 0
+    for file in range(8):
+        for own_rows, enemy_front, sign in ((white_rows, black_front, 1),
+                                            (black_rows, white_front, -1)):
+            rows = own_rows[file]
+            if not rows:
+                continue
+            score += sign * DOUBLED_PAWN_SCORE * (len(rows) - 1)
+            if (file == 0 or not own_rows[file - 1]) and (file == 7 or not own_rows[file + 1]):
+                score += sign * ISOLATED_PAWN_SCORE * len(rows)
+            for row in rows:
+                if sign == 1 and row <= min(enemy_front[file:file + 3]):
+                    score += PASSED_PAWN_SCORES[6 - row]
+                elif sign == -1 and row >= max(enemy_front[file:file + 3]):
+                    score -= PASSED_PAWN_SCORES[row - 1]
+    return score
+
+
+class PawnStructureEvaluator:
+    """Evaluates pawn structure once per pawn configuration, probing a dedicated
+    cache with MainEngine.pawn_hash before computing the terms"""
+    def __init__(self, size_bits: int=14) -> None:
+        self.cache = EvalCache(size_bits=size_bits, two_way=False)
+
+    def evaluate(self, engine) -> float:
+        """Returns the pawn structure score of the engine's current state"""
+        score = self.cache.probe(engine.pawn_hash)
+        if score is None:
+            score = evaluate_pawn_structure(engine.state)
+            self.cache.store(engine.pawn_hash, score)
+        return score
@@ -0,0 +1,51 @@
+"""Tapered evaluation blending middlegame and endgame piece-square scores by game phase"""
+from collections import deque
+from src.main_engine import MainEngine, instruction_square_changes
+from src.resources.material_table import MAX_PHASE
+from src.resources.piece_square_tables import MG_SQUARE_STATE_TABLE, EG_SQUARE_STATE_TABLE
+
+
+def square_state_score(state: list, table: list[list]) -> float:
+    """Sums table[square_idx][square_state] over the board"""
+    score = 0
+    for square_idx in range(64):
+        score += table[square_idx][state[square_idx]]
+    return score
+
+
+def tapered_score(mg_score: float, eg_score: float, phase: int) -> float:
+    """Interpolates between the endgame score at phase 0 and the middlegame score at MAX_PHASE.
+    Promotions can push the phase past MAX_PHASE so it is capped."""
+    phase = min(phase, MAX_PHASE)
+    return (mg_score * phase + eg_score * (MAX_PHASE - phase)) / MAX_PHASE
+
+
+class TaperedEngine(MainEngine):
+    """A MainEngine that also keeps its middlegame and endgame piece-square scores up to
+    date as instruction sets are executed and reversed, so evaluating needs no board scan.
+    The game phase comes from MainEngine.phase."""
+    def __init__(self, state: list=None, mg_table: list[list]=None,
+                 eg_table: list[list]=None) -> None:
+        super().__init__(state)
+        self.mg_table = MG_SQUARE_STATE_TABLE if mg_table is None else mg_table
+        self.eg_table = EG_SQUARE_STATE_TABLE if eg_table is None else eg_table
+        self.mg_score = square_state_score(self.state, self.mg_table)
+        self.eg_score = square_state_score(self.state, self.eg_table)
+        self.score_stack = deque()
+
+    def execute_instructions(self, instruction_set: tuple):
+        super().execute_instructions(instruction_set)
+        self.score_stack.append((self.mg_score, self.eg_score))
+        for square_idx, old_state, new_state in instruction_square_changes(instruction_set):
+            self.mg_score += self.mg_table[square_idx][new_state]\
+                - self.mg_table[square_idx][old_state]
+            self.eg_score += self.eg_table[square_idx][new_state]\
+                - self.eg_table[square_idx][old_state]
+
+    def reverse_last_instruction(self):
+        super().reverse_last_instruction()
+        self.mg_score, self.eg_score = self.score_stack.pop()
+
+    def evaluate(self) -> float:
+        """The tapered score in centipawns from white's point of view"""
+        return tapered_score(self.mg_score, self.eg_score, self.phase)
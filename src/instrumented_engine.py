@@ -0,0 +1,209 @@
+"""Counters for the hot paths of MainEngine, kept out of MainEngine itself so it pays nothing.
+instrumented(engine_class) derives a class that counts the calls of the hot paths, the moves
+generated per piece type, how often the player to move is in check or double check, the rays
+_move_reveals_check walks, the pins it finds, the moves the legality filters reject and the
+moves _udpate_moves_to_remove_castle rewrites. InstrumentedEngine is instrumented(MainEngine).
+make_engine and get_engine_class pick the instrumented class when asked to, or when the
+PY_CHESS_BOT_INSTRUMENT environment variable is set at construction. Tournaments, SPRT matches,
+MainEngineAdapter and the benchmarks build their engines through them and report the counters.
+Engines created inside collecting_counters() share one counter, which covers workloads whose
+engines are out of reach.
+python -m src.instrumented_engine plays random games and prints the report."""
+import argparse
+import os
+import random
+from collections import Counter
+from contextlib import contextmanager
+from src.main_engine import MOVE_GENERATOR_NAMES, MainEngine
+from src.resources.move_dict import VECTOR_TO_SQUARE_FROM
+
+INSTRUMENT_ENV_VAR = "PY_CHESS_BOT_INSTRUMENT"
+PIECE_NAMES = ["", "pawn", "knight", "bishop", "rook", "queen", "king"]
+CALL_COUNTED = ["get_all_moves", "count_all_moves", "sample_random_move",
+                "execute_instructions", "reverse_last_instruction",
+                "_square_attacked_by_player"]
+# The counters engines created inside collecting_counters() count into, innermost last
+_COLLECTORS = []
+
+
+class InstrumentationMixin:
+    """Counts what the engine methods below it do, counters[(category, name)] -> count"""
+    def __init__(self, *args, **kwargs) -> None:
+        # The engine's constructor already runs counted methods
+        self.counters = _COLLECTORS[-1] if _COLLECTORS else Counter()
+        super().__init__(*args, **kwargs)
+
+    def reset_counters(self):
+        """Starts counting from zero"""
+        self.counters.clear()
+
+    def _filter_illegal_moves(self, moves: list[tuple]) -> list[tuple]:
+        legal_moves = super()._filter_illegal_moves(moves)
+        self.counters["filter", "positions"] += 1
+        self.counters["filter", "moves_in"] += len(moves)
+        self.counters["filter", "rejected"] += len(moves) - len(legal_moves)
+        return legal_moves
+
+    def _filter_moves_in_check(self, moves: list[tuple], idx_attacking_king: list[int],
+                               king_idx: int, threatening_player: bool) -> list[tuple]:
+        legal_moves = super()._filter_moves_in_check(moves, idx_attacking_king, king_idx,
+                                                     threatening_player)
+        self.counters["checks", "in_check"] += 1
+        if len(idx_attacking_king) >= 2:
+            self.counters["checks", "double_check"] += 1
+        self.counters["checks", "rejected"] += len(moves) - len(legal_moves)
+        return legal_moves
+
+    def _filter_moves_unblockable_check(self, *args) -> list[tuple]:
+        self.counters["checks", "unblockable"] += 1
+        return super()._filter_moves_unblockable_check(*args)
+
+    def _filter_moves_blockable_check(self, *args) -> list[tuple]:
+        self.counters["checks", "blockable"] += 1
+        return super()._filter_moves_blockable_check(*args)
+
+    def _move_reveals_check(self, move: tuple, king_idx: int,
+                            threats_in_direciton: dict, friendly_pieces: set) -> bool:
+        reveals_check = super()._move_reveals_check(move, king_idx, threats_in_direciton,
+                                                    friendly_pieces)
+        self.counters["pins", "checked"] += 1
+        # Moves off the king's lines return before walking a ray
+        if move[0] in VECTOR_TO_SQUARE_FROM[king_idx]:
+            self.counters["pins", "rays_walked"] += 1
+        if reveals_check:
+            self.counters["pins", "found"] += 1
+        return reveals_check
+
+    def _udpate_moves_to_remove_castle(self, moves: list[tuple]):
+        new_moves = super()._udpate_moves_to_remove_castle(moves)
+        self.counters["castle", "calls"] += 1
+        self.counters["castle", "moves_in"] += len(moves)
+        self.counters["castle", "rewritten"] += sum(
+            new_move is not move for new_move, move in zip(new_moves, moves))
+        return new_moves
+
+    def report(self) -> dict[str, dict[str, int]]:
+        """The counters grouped by category"""
+        return group_counters(self.counters)
+
+    def format_report(self) -> str:
+        """The counters as text, with the rates that guide optimizations"""
+        counters = self.counters
+        lines = []
+        for category, counts in self.report().items():
+            lines.append(f"{category}:")
+            lines.extend(f"    {name:<28} {count:>12,}" for name, count in counts.items())
+        rates = [
+            ("in check", counters["checks", "in_check"], counters["filter", "positions"]),
+            ("double check", counters["checks", "double_check"],
+             counters["checks", "in_check"]),
+            ("rays walked", counters["pins", "rays_walked"], counters["pins", "checked"]),
+            ("pins found", counters["pins", "found"], counters["pins", "rays_walked"]),
+            ("filter rejected", counters["filter", "rejected"], counters["filter", "moves_in"]),
+            ("castle rewritten", counters["castle", "rewritten"],
+             counters["castle", "moves_in"]),
+        ]
+        lines.append("rates:")
+        lines.extend(f"    {name:<28} {count / total:>12.2%}"
+                     for name, count, total in rates if total)
+        return "\n".join(lines)
+
+
+def group_counters(counters: Counter) -> dict[str, dict[str, int]]:
+    """counters[(category, name)] -> count as {category: {name: count}}"""
+    grouped = {}
+    for (category, name), count in sorted(counters.items()):
+        grouped.setdefault(category, {})[name] = count
+    return grouped
+
+
+@contextmanager
+def collecting_counters():
+    """Yields the Counter every instrumented engine created inside the block counts into"""
+    counters = Counter()
+    _COLLECTORS.append(counters)
+    try:
+        yield counters
+    finally:
+        _COLLECTORS.remove(counters)
+
+
+def _counted_call(name: str):
+    """A method counting its calls before calling the engine's"""
+    def method(self, *args, **kwargs):
+        self.counters["calls", name] += 1
+        return getattr(super(InstrumentationMixin, self), name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+def _counted_generator(name: str, piece_name: str):
+    """A move generator counting the moves it returns"""
+    def method(self, *args):
+        moves = getattr(super(InstrumentationMixin, self), name)(*args)
+        self.counters["moves_generated", piece_name] += len(moves)
+        return moves
+    method.__name__ = name
+    return method
+
+
+for _name in CALL_COUNTED:
+    setattr(InstrumentationMixin, _name, _counted_call(_name))
+for _square_state, _name in enumerate(MOVE_GENERATOR_NAMES):
+    if _name is not None:
+        setattr(InstrumentationMixin, _name,
+                _counted_generator(_name, PIECE_NAMES[(_square_state - 1) % 6 + 1]))
+for _name in ("_get_castle_moves_white", "_get_castle_moves_black"):
+    setattr(InstrumentationMixin, _name, _counted_generator(_name, "castle"))
+
+
+def instrumented(engine_class: type) -> type:
+    """The instrumented version of MainEngine or one of its subclasses"""
+    return type(f"Instrumented{engine_class.__name__}", (InstrumentationMixin, engine_class),
+                {"__doc__": f"{engine_class.__name__} with hot path counters"})
+
+
+InstrumentedEngine = instrumented(MainEngine)
+
+
+def instrumentation_enabled() -> bool:
+    """Whether the environment asks for instrumented engines"""
+    return os.environ.get(INSTRUMENT_ENV_VAR, "").lower() not in ("", "0", "false", "no")
+
+
+def get_engine_class(instrumented_engine: bool=None) -> type:
+    """MainEngine, or InstrumentedEngine if asked or, when not given, if the environment asks"""
+    if instrumented_engine is None:
+        instrumented_engine = instrumentation_enabled()
+    return InstrumentedEngine if instrumented_engine else MainEngine
+
+
+def make_engine(state: list=None, instrumented_engine: bool=None) -> MainEngine:
+    """A MainEngine, instrumented if asked or, when not given, if the environment asks"""
+    return get_engine_class(instrumented_engine)(state)
+
+
+def main():
+    """Command line entry point: python -m src.instrumented_engine --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--max-plies", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=21221)
+    args = parser.parse_args()
+
+    rand = random.Random(args.seed)
+    counters = Counter()
+    for _ in range(args.games):
+        engine = InstrumentedEngine()
+        for _ in range(args.max_plies):
+            moves = engine.get_all_moves()
+            if not moves or not engine.sufficient_material():
+                break
+            engine.execute_instructions(rand.choice(moves))
+        counters.update(engine.counters)
+    engine.counters = counters
+    print(engine.format_report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 """Chess engine uses a list for a state and a graph to track relations"""
-from collections import deque, defaultdict
+import random
+from bisect import bisect_right
+from collections import deque
+from typing import NamedTuple
 from src.resources.move_dict import KING_MOVES, KNIGHT_MOVES, BISHOP_MOVES, ROOK_MOVES,\
     QUEEN_MOVES, PAWN_SINGLE_MOVES_WHITE, PAWN_SINGLE_MOVES_BLACK, PAWN_DOUBLE_MOVES_WHITE,\
     PAWN_DOUBLE_MOVES_BLACK, BLOCKABLE_ATTACK_DICT_WHITE, BLOCKABLE_ATTACK_DICT_BLACK,\
     UNBLOCKABLE_ATTACKS_AT, MOVES_TO_BLOCK_ATTACK_ON_FROM, VECTOR_TO_SQUARE_FROM,\
     WHITE_THREATS_IN_DIRECTION, BLACK_THREATS_IN_DIRECTION, MOVES_FROM_SQUARE_ALONG_VECTOR
 from src.resources.zobrist_hashes import ZOBRIST_TABLE
+from src.resources.data_translators import fen_to_state, state_to_fen
+from src.resources.material_table import MATERIAL_KEY_UNITS, MATERIAL_TABLE, PHASE_WEIGHTS,\
+    SUFFICIENT_MATERIAL_FLAG, material_key_from_state
 
 ASCII_LOOKUP = {1: "♙",  2: "♘", 3: "♗", 4: "♖", 5: "♕", 6: "♔",
                 7: "♟︎", 8: "♞", 9: "♝", 10: "♜", 11: "♛", 12: "♚"}
@@ -15,10 +21,108 @@ STARTING_STATE =\
     + [0] * 8 + [0] * 8 + [0] * 8 + [0] * 8\
     + [1] * 8 + [4, 2, 3, 5, 6, 3, 2, 4]\
     + [4] + [60] + [0b1111] + [-1] + [True]
-SUFFICIENT_MATERIAL = {1, 4, 5, 7, 10, 11}
 WHITE_PIECES = {1, 2, 3, 4, 5, 6}
 BLACK_PIECES = {7, 8, 9, 10, 11, 12}
 CASTLE_RIGHT_REMOVAL = {0: 0b0111, 7: 0b1011, 56: 0b1101, 63: 0b1110}
+PAWN_STATES = {1, 7}
+MAX_PLAYOUT_PLIES = 400
+FIFTY_MOVE_PLIES = 100
+MAX_SAMPLE_REJECTIONS = 64
+# The move generator of every square state, castles are generated on their own
+MOVE_GENERATOR_NAMES = [None, "_get_white_pawn_moves", "_get_knight_moves_white",
+                        "_get_bishop_moves_white", "_get_rook_moves_white",
+                        "_get_queen_moves_white", "_get_white_king_moves",
+                        "_get_black_pawn_moves", "_get_knight_moves_black",
+                        "_get_bishop_moves_black", "_get_rook_moves_black",
+                        "_get_queen_moves_black", "_get_black_king_moves"]
+
+
+def _pawn_move_bound(square_idx: int, promotion_row: int, double_move_row: int) -> int:
+    """The most moves a pawn can have on a square, every promotion counts 4 times"""
+    n_targets = 1 + (square_idx & 7 > 0) + (square_idx & 7 < 7)
+    if square_idx >> 3 == promotion_row:
+        return 4 * n_targets
+    return n_targets + (square_idx >> 3 == double_move_row)
+
+
+# MOVE_BOUNDS[square_state][square_idx] is the most pseudo-legal moves the piece can have there
+MOVE_BOUNDS = [[0] * 64,
+               [_pawn_move_bound(idx, 1, 6) for idx in range(64)],
+               [len(KNIGHT_MOVES[idx]) for idx in range(64)],
+               [sum(map(len, BISHOP_MOVES[idx])) for idx in range(64)],
+               [sum(map(len, ROOK_MOVES[idx])) for idx in range(64)],
+               [sum(map(len, QUEEN_MOVES[idx])) for idx in range(64)],
+               [len(KING_MOVES[idx]) for idx in range(64)]]
+MOVE_BOUNDS += [[_pawn_move_bound(idx, 6, 1) for idx in range(64)]] + MOVE_BOUNDS[2:]
+CASTLE_MOVE_BOUND = 2
+
+
+class PlayoutResult(NamedTuple):
+    """How a playout ended: score from white's point of view (1, 0.5 or 0), one of
+    checkmate, stalemate, insufficient_material, fifty_move or max_plies, and the plies played"""
+    score: float
+    termination: str
+    plies: int
+
+
+def pawn_hash_delta(instruction_set: tuple) -> int:
+    """Gets the change to the pawn hash caused by the instruction_set.
+    XOR-ing the same delta a second time reverses the change."""
+    delta = 0
+    if instruction_set[1] in PAWN_STATES:
+        delta ^= ZOBRIST_TABLE[instruction_set[0]][instruction_set[1]]
+        # A promotion moves the pawn onto its own square and doesn't land a pawn anywhere
+        if instruction_set[0] != instruction_set[2]:
+            delta ^= ZOBRIST_TABLE[instruction_set[2]][instruction_set[1]]
+    if instruction_set[3] in PAWN_STATES:
+        delta ^= ZOBRIST_TABLE[instruction_set[2]][instruction_set[3]]
+    # En passant removes the captured pawn in the second half of the instruction set
+    if len(instruction_set) > 8 and instruction_set[11] in PAWN_STATES:
+        delta ^= ZOBRIST_TABLE[instruction_set[10]][instruction_set[11]]
+    return delta
+
+
+def material_delta(instruction_set: tuple, units: list[int]) -> int:
+    """Gets the change to a sum of units[square_state] over the board caused by the
+    instruction_set. Only captures, en passant and promotions change the material on the board,
+    this is used for the material key (MATERIAL_KEY_UNITS) and the phase (PHASE_WEIGHTS)."""
+    if len(instruction_set) > 8:
+        # Promotions swap the pawn for a new piece and may capture on the target square
+        if instruction_set[0] == instruction_set[2]:
+            return units[instruction_set[9]] - units[instruction_set[1]]\
+                - units[instruction_set[11]]
+        # En passant removes its pawn in the second half, castling has nothing to remove
+        return -units[instruction_set[3]] - units[instruction_set[11]]
+    return -units[instruction_set[3]]
+
+
+def instruction_square_changes(instruction_set: tuple) -> list[tuple[int, int, int]]:
+    """Lists the (square_idx, old_square_state, new_square_state) changes an instruction
+    set makes to the board, for anything that tracks the board square by square"""
+    changes = [(instruction_set[0], instruction_set[1], 0)]
+    if len(instruction_set) > 8:
+        # Promotions put the new piece down with the second half of the instruction set
+        if instruction_set[0] == instruction_set[2]:
+            changes.append((instruction_set[10], instruction_set[11], instruction_set[9]))
+            return changes
+        changes.append((instruction_set[2], instruction_set[3], instruction_set[1]))
+        # En passant "moves" an empty square onto the captured pawn
+        if instruction_set[9]:
+            changes.append((instruction_set[8], instruction_set[9], 0))
+        changes.append((instruction_set[10], instruction_set[11], instruction_set[9]))
+        return changes
+    changes.append((instruction_set[2], instruction_set[3], instruction_set[1]))
+    return changes
+
+
+def captured_square_state(instruction_set: tuple) -> int:
+    """Gets the square state captured by an instruction set, 0 if it isn't a capture"""
+    # Promotions and en passant (the only double instructions without a second piece)
+    # keep the captured piece at the end of the instruction set
+    if len(instruction_set) > 8 and\
+            (instruction_set[0] == instruction_set[2] or not instruction_set[9]):
+        return instruction_set[11]
+    return instruction_set[3]
 
 
 class MainEngine:
@@ -33,6 +137,19 @@ class MainEngine:
         # Initialize the hash
         self.hash = None
         self.hash = hash(self)
+        self.pawn_hash = self._calculate_pawn_hash()
+        self.material_key = material_key_from_state(self.state)
+        self.phase = sum(PHASE_WEIGHTS[square_state] for square_state in self.state[:64])
+
+    @classmethod
+    def from_fen(cls, fen: str) -> "MainEngine":
+        """Creates an engine from a FEN string, see fen_to_state"""
+        return cls(fen_to_state(fen))
+
+    def to_fen(self, halfmove_clock: int=0, fullmove_number: int=1) -> str:
+        """The FEN string of the current state, the engine doesn't track the move counters
+        so they are passed in"""
+        return state_to_fen(self.state, halfmove_clock, fullmove_number)
 
     def __iter__(self):
         self.iter_counter = 0
@@ -68,6 +185,14 @@ class MainEngine:
                 self.hash ^= ZOBRIST_TABLE[idx][val]
         return self.hash
 
+    def _calculate_pawn_hash(self) -> int:
+        """Calculates the zobrist hash of only the pawns on the board"""
+        pawn_hash = 0
+        for idx, val in enumerate(self.state[:64]):
+            if val in PAWN_STATES:
+                pawn_hash ^= ZOBRIST_TABLE[idx][val]
+        return pawn_hash
+
     def execute_instructions(self, instruction_set: tuple):
         """Executes the instruction_set tuple, altering the hash and list,
         appending the instructions to the state_stack and updating the graph
@@ -100,6 +225,15 @@ class MainEngine:
         if self.state[64 + self.state[-1]] == instruction_set[0]:
             self.state[64 + self.state[-1]] = instruction_set[2]
 
+        # Pawn moves and pawn captures change the pawn structure
+        if instruction_set[1] in PAWN_STATES or instruction_set[3] in PAWN_STATES:
+            self.pawn_hash ^= pawn_hash_delta(instruction_set)
+
+        # Captures and promotions change the material on the board
+        if instruction_set[3] or len(instruction_set) > 8:
+            self.material_key += material_delta(instruction_set, MATERIAL_KEY_UNITS)
+            self.phase += material_delta(instruction_set, PHASE_WEIGHTS)
+
         # Update Castling rights
         if len(instruction_set) > 4:
             # Update castling information
@@ -114,6 +248,11 @@ class MainEngine:
 
             # Double instruction (castling) moves:
             if len(instruction_set) > 8:
+                # A promotion puts the pawn back on its own square, remove it from the hash
+                if instruction_set[0] == instruction_set[2]:
+                    self.hash ^= ZOBRIST_TABLE[instruction_set[0]][instruction_set[1]]
+                    self.hash ^= ZOBRIST_TABLE[instruction_set[0]][0]
+
                 # Move away
                 self.state[instruction_set[8]] = 0
                 self.hash ^= ZOBRIST_TABLE[instruction_set[8]][instruction_set[9]]
@@ -140,9 +279,6 @@ class MainEngine:
         if self.state[64 + (not self.state[-1])] == instruction_set[2]:
             self.state[64 + (not self.state[-1])] = instruction_set[0]
 
-        # Put the piece back on the start_idx
-        self.state[instruction_set[0]] = instruction_set[1]
-
         # Restore the to_idx square
         self.state[instruction_set[2]] = instruction_set[3]
 
@@ -156,6 +292,18 @@ class MainEngine:
                 self.state[instruction_set[8]] = instruction_set[9]
                 self.state[instruction_set[10]] = instruction_set[11]
 
+        # Put the piece back on the start_idx last, promotions use it as the to_idx too
+        self.state[instruction_set[0]] = instruction_set[1]
+
+        # Pawn moves and pawn captures change the pawn structure
+        if instruction_set[1] in PAWN_STATES or instruction_set[3] in PAWN_STATES:
+            self.pawn_hash ^= pawn_hash_delta(instruction_set)
+
+        # Captures and promotions change the material on the board
+        if instruction_set[3] or len(instruction_set) > 8:
+            self.material_key -= material_delta(instruction_set, MATERIAL_KEY_UNITS)
+            self.phase -= material_delta(instruction_set, PHASE_WEIGHTS)
+
         # Update the player's turn
         self.state[-1] = not self.state[-1]
 
@@ -731,18 +879,23 @@ class MainEngine:
     def _filter_moves_in_check(self, moves: list[tuple], idx_attacking_king: list[int],
                                king_idx: int, threatening_player: bool) -> list[tuple]:
         """Removes all the illegal moves in moves for when the active player is in check"""
-        # If the player is in double check
-        if len(idx_attacking_king) >= 2:
-            return self._filter_moves_double_check(moves, king_idx, threatening_player)
-
-        # If the check is caused by an unblockable attack
-        if idx_attacking_king[0] in UNBLOCKABLE_ATTACKS_AT[king_idx]:
-            return self._filter_moves_unblockable_check(moves, idx_attacking_king,
-                                                        king_idx, threatening_player)
-
-        # Otherwise the check must be caused by a blockable attack
-        return self._filter_moves_blockable_check(moves, idx_attacking_king,
-                                                  king_idx, threatening_player)
+        # Lift the king off the board so it can't block the attack on the squares behind it
+        king_state, self.state[king_idx] = self.state[king_idx], 0
+        try:
+            # If the player is in double check
+            if len(idx_attacking_king) >= 2:
+                return self._filter_moves_double_check(moves, king_idx, threatening_player)
+
+            # If the check is caused by an unblockable attack
+            if idx_attacking_king[0] in UNBLOCKABLE_ATTACKS_AT[king_idx]:
+                return self._filter_moves_unblockable_check(moves, idx_attacking_king,
+                                                            king_idx, threatening_player)
+
+            # Otherwise the check must be caused by a blockable attack
+            return self._filter_moves_blockable_check(moves, idx_attacking_king,
+                                                      king_idx, threatening_player)
+        finally:
+            self.state[king_idx] = king_state
 
     def _move_reveals_check(self, move: tuple, king_idx: int,
                             threats_in_direciton: dict, friendly_pieces: set) -> bool:
@@ -821,6 +974,61 @@ class MainEngine:
                 new_moves.append(move)
         return new_moves
 
+    def sample_random_move(self, rand: random.Random=None,
+                           max_rejections: int=MAX_SAMPLE_REJECTIONS) -> tuple | None:
+        """Draws a uniformly random legal move (None if there are none) without generating
+        every move. A piece is picked with the weight of its MOVE_BOUNDS entry and one of
+        that many slots at random, slots past the piece's pseudo-legal moves or holding an
+        illegal move are rejected and redrawn, so every legal move is equally likely.
+        In check, or after max_rejections, the move is drawn from get_all_moves"""
+        rand = rand or random
+        state = self.state
+        white = state[-1]
+        king_idx = state[64 + white]
+        if self.squares_attacking_king():
+            moves = self.get_all_moves()
+            return rand.choice(moves) if moves else None
+
+        # Cumulative bounds of the player's pieces, -1 stands for the castle moves
+        squares, cumulative_bounds, total_bound = [], [], 0
+        for square_idx, square_state in enumerate(state[:64]):
+            if square_state and (square_state < 7) == white:
+                total_bound += MOVE_BOUNDS[square_state][square_idx]
+                squares.append(square_idx)
+                cumulative_bounds.append(total_bound)
+        if state[66] & (0b0011 if white else 0b1100):
+            total_bound += CASTLE_MOVE_BOUND
+            squares.append(-1)
+            cumulative_bounds.append(total_bound)
+
+        if white:
+            threats_in_direction, friendly_pieces = BLACK_THREATS_IN_DIRECTION, WHITE_PIECES
+        else:
+            threats_in_direction, friendly_pieces = WHITE_THREATS_IN_DIRECTION, BLACK_PIECES
+        for _ in range(max_rejections):
+            slot = rand.randrange(total_bound)
+            piece_idx = bisect_right(cumulative_bounds, slot)
+            square_idx = squares[piece_idx]
+            if piece_idx:
+                slot -= cumulative_bounds[piece_idx - 1]
+            if square_idx < 0:
+                moves = self._get_castle_moves_white() if white else self._get_castle_moves_black()
+            else:
+                moves = getattr(self, MOVE_GENERATOR_NAMES[state[square_idx]])(square_idx)
+            if slot >= len(moves):
+                continue
+
+            # The same checks as _filter_illegal_moves for a player not in check
+            move = moves[slot]
+            if move[0] == king_idx and self._square_attacked_by_player(move[2], not white):
+                continue
+            if self._move_reveals_check(move, king_idx, threats_in_direction, friendly_pieces):
+                continue
+            return self._udpate_moves_to_remove_castle([move])[0]
+
+        moves = self.get_all_moves()
+        return rand.choice(moves) if moves else None
+
     def get_all_moves(self) -> list[tuple]:
         """Gets all the moves for the given state of the board"""
         if self.state[-1]:
@@ -829,34 +1037,61 @@ class MainEngine:
             moves = self.get_black_moves()
         return self._filter_illegal_moves(self._udpate_moves_to_remove_castle(moves))
 
-    def sufficient_material(self) -> bool:
-        """Checks if there is sufficient mating material"""
-        # pylint: disable=too-many-return-statements
-        material = defaultdict(int)
-        for state in self.state[:64]:
-            # If the piece on this tile by itself is sufficient material
-            if state in SUFFICIENT_MATERIAL:
-                return True
-            material[state] += 1
-
-            # If a player has two bishops
-            if material[3] == 2 or material[9] == 2:
-                return True
-
-            # If a player has at least one bishop and at least one knight
-            if (material[3] >= 1 and material[2] >= 1) or (material[9] >= 1 and material[8] >= 1):
-                return True
-
-            # If white has two knights and black has at least one knight or bishop
-            if material[2] >= 2 and (material[8] >= 1 or material[9] >= 1):
-                return True
-
-            # If black has two knights and white has at least one knight or bishop
-            if material[8] >= 2 and (material[2] >= 1 or material[3] >= 1):
-                return True
+    def count_all_moves(self) -> int:
+        """Counts the legal moves for the given state of the board. Castling rights
+        updates on rook captures don't change the count so they are skipped"""
+        if self.state[-1]:
+            return len(self._filter_illegal_moves(self.get_white_moves()))
+        return len(self._filter_illegal_moves(self.get_black_moves()))
 
-            # If a player has more than two knights (strange promotion choices)
-            if material[2] >= 3 or material[8] >= 3:
-                return True
+    def in_check(self) -> bool:
+        """Checks if the player to play is in check"""
+        if self.state[-1]:
+            return self._square_attacked_by_black(self.state[65])
+        return self._square_attacked_by_white(self.state[64])
 
-        return False
+    def sufficient_material(self) -> bool:
+        """Checks if there is sufficient mating material"""
+        return MATERIAL_TABLE[self.material_key].flags & SUFFICIENT_MATERIAL_FLAG > 0
+
+    def playout(self, max_plies: int=MAX_PLAYOUT_PLIES, rand: random.Random=None,
+                halfmove_clock: int=0) -> PlayoutResult:
+        """Plays random legal moves (see sample_random_move) from the current state until the
+        game ends or max_plies are played, for Monte-Carlo rollouts. Only the board and the
+        material key are updated on the way: no hashes, stacks or game graph, so repetitions
+        aren't detected. The engine is put back in its current state afterwards"""
+        saved_state, saved_material_key = self.state.copy(), self.material_key
+        state = self.state
+        try:
+            for ply in range(max_plies):
+                move = self.sample_random_move(rand)
+                if move is None:
+                    if self.in_check():
+                        return PlayoutResult(float(not state[-1]), "checkmate", ply)
+                    return PlayoutResult(0.5, "stalemate", ply)
+                if halfmove_clock >= FIFTY_MOVE_PLIES:
+                    return PlayoutResult(0.5, "fifty_move", ply)
+
+                # execute_instructions without the bookkeeping
+                state[move[0]] = 0
+                state[move[2]] = move[1]
+                if state[64 + state[-1]] == move[0]:
+                    state[64 + state[-1]] = move[2]
+                if len(move) > 4:
+                    state[66] = move[5]
+                    state[67] = move[7]
+                    if len(move) > 8:
+                        state[move[8]] = 0
+                        state[move[10]] = move[9]
+                state[-1] = not state[-1]
+
+                # Only captures and promotions can leave too little material to mate
+                if move[3] or len(move) > 8:
+                    self.material_key += material_delta(move, MATERIAL_KEY_UNITS)
+                    if not MATERIAL_TABLE[self.material_key].flags & SUFFICIENT_MATERIAL_FLAG:
+                        return PlayoutResult(0.5, "insufficient_material", ply + 1)
+                halfmove_clock = 0 if move[1] in PAWN_STATES or move[3] else halfmove_clock + 1
+            return PlayoutResult(0.5, "max_plies", max_plies)
+        finally:
+            state[:] = saved_state
+            self.material_key = saved_material_key
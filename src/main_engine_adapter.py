@@ -1,13 +1,13 @@
 """A simple way to perform a random walk down a board state using the instruction-set based board"""
 import random
 from collections import Counter
-from src.main_engine import MainEngine
+from src.instrumented_engine import make_engine
 
 
 class MainEngineAdapter:
     """A way to perform a random walk down a board state using SmallBoard"""
     def __init__(self, rand_seed:int = 21221) -> None:
-        self.engine = MainEngine()
+        self.engine = make_engine()
         self.current_moves = self.engine.get_all_moves()
         self.draw_counter = 100
         self.visited_state = Counter()
@@ -0,0 +1,264 @@
+"""Monte-Carlo tree search (UCT, or PUCT when given a policy) over MainEngine.
+Nodes are int ids into parallel arrays (visits, value sums, priors, first child, child count
+and the move leading to the node) instead of an object per node, and the children of a node
+take consecutive ids. Leaves are scored with a random playout (MainEngine.playout) or an
+evaluation function. After a move is played the tree keeps the subtree under it, compacted
+so the rest of the tree is freed. root_parallel_search runs independent trees in a pool of
+processes and sums their root statistics."""
+import math
+import os
+import random
+import time
+from array import array
+from multiprocessing import Pool
+from typing import Callable
+from src.main_engine import MainEngine
+from src.strategies import Strategy
+from src.tournament import game_seed
+
+UNEXPANDED = -1
+DEFAULT_EXPLORATION = 1.4
+PLAYOUT_PLIES = 200
+MAX_NODES = 1 << 20
+# The value of an unvisited child under PUCT, a draw
+FIRST_PLAY_VALUE = 0.5
+
+
+class MCTS:
+    """A search tree rooted at the engine's position. Node 0 is always the root, values are
+    stored for the player who made the move into the node, from 0 (loss) to 1 (win).
+    evaluate(engine) scores a leaf for white from 0 to 1 (a random playout if None) and
+    policy(engine, moves) gives the prior of each move (uniform UCT if None).
+    No node is added once the tree holds max_nodes, leaves are still scored"""
+    def __init__(self, engine: MainEngine=None, exploration: float=DEFAULT_EXPLORATION,
+                 evaluate: Callable[[MainEngine], float]=None,
+                 policy: Callable[[MainEngine, list[tuple]], list[float]]=None,
+                 max_nodes: int=MAX_NODES, playout_plies: int=PLAYOUT_PLIES,
+                 rand_seed: int=None) -> None:
+        self.engine = MainEngine() if engine is None else engine
+        self.exploration = exploration
+        self.evaluate = evaluate
+        self.policy = policy
+        self.max_nodes = max_nodes
+        self.playout_plies = playout_plies
+        self.random = random.Random(rand_seed)
+        self.clear()
+
+    def __len__(self) -> int:
+        """The number of nodes in the tree"""
+        return len(self.moves)
+
+    def clear(self):
+        """Drops the tree, leaving only an unexpanded root"""
+        self.visits = array("l", [0])
+        self.value_sums = array("d", [0.0])
+        self.priors = array("d", [1.0])
+        self.first_child = array("l", [UNEXPANDED])
+        self.n_children = array("l", [0])
+        self.moves = [None]
+
+    @property
+    def memory_bytes(self) -> int:
+        """The size of the node arrays, the move tuples are shared with the move generator"""
+        return sum(values.itemsize * len(values) for values in (
+            self.visits, self.value_sums, self.priors, self.first_child, self.n_children))\
+            + 8 * len(self.moves)
+
+    def children(self, node: int) -> range:
+        """The ids of a node's children, empty if it isn't expanded"""
+        if self.first_child[node] == UNEXPANDED:
+            return range(0)
+        return range(self.first_child[node], self.first_child[node] + self.n_children[node])
+
+    def _select_child(self, node: int) -> int:
+        """The child with the highest UCT (or PUCT) score, unvisited children first under UCT"""
+        visits, value_sums = self.visits, self.value_sums
+        best_child, best_score = None, -math.inf
+        if self.policy is None:
+            log_visits = math.log(visits[node])
+            for child in self.children(node):
+                if not visits[child]:
+                    return child
+                score = value_sums[child] / visits[child]\
+                    + self.exploration * math.sqrt(log_visits / visits[child])
+                if score > best_score:
+                    best_child, best_score = child, score
+            return best_child
+
+        sqrt_visits = math.sqrt(visits[node])
+        for child in self.children(node):
+            value = value_sums[child] / visits[child] if visits[child] else FIRST_PLAY_VALUE
+            score = value + self.exploration * self.priors[child] * sqrt_visits / (1 + visits[child])
+            if score > best_score:
+                best_child, best_score = child, score
+        return best_child
+
+    def _expand(self, node: int, moves: list[tuple]):
+        """Adds a child per move in a random order (ties are broken by the order), a node
+        without children is terminal"""
+        moves = self.random.sample(moves, len(moves))
+        if self.policy is None or not moves:
+            priors = [1.0] * len(moves)
+        else:
+            priors = self.policy(self.engine, moves)
+        self.first_child[node] = len(self.moves)
+        self.n_children[node] = len(moves)
+        self.moves.extend(moves)
+        self.visits.extend([0] * len(moves))
+        self.value_sums.extend([0.0] * len(moves))
+        self.priors.extend(priors)
+        self.first_child.extend([UNEXPANDED] * len(moves))
+        self.n_children.extend([0] * len(moves))
+
+    def _terminal_value(self) -> float:
+        """White's score in a position that has ended"""
+        if self.engine.sufficient_material() and self.engine.in_check():
+            return float(not self.engine.state[-1])
+        return 0.5
+
+    def _leaf_value(self, node: int) -> float:
+        """Expands the leaf if there is room and scores it for white"""
+        if self.first_child[node] != UNEXPANDED:
+            return self._terminal_value()
+        if not self.engine.sufficient_material():
+            self._expand(node, [])
+            return 0.5
+        moves = self.engine.get_all_moves()
+        if not moves:
+            self._expand(node, [])
+            return self._terminal_value()
+        if len(self.moves) + len(moves) <= self.max_nodes:
+            self._expand(node, moves)
+        if self.evaluate is not None:
+            return self.evaluate(self.engine)
+        return self.engine.playout(self.playout_plies, self.random).score
+
+    def iterate(self):
+        """Runs one selection, expansion, evaluation and backpropagation"""
+        engine, first_child, n_children = self.engine, self.first_child, self.n_children
+        root_white = engine.state[-1]
+        node, path = 0, [0]
+        while first_child[node] != UNEXPANDED and n_children[node]:
+            node = self._select_child(node)
+            engine.execute_instructions(self.moves[node])
+            path.append(node)
+        white_value = self._leaf_value(node)
+        for _ in range(len(path) - 1):
+            engine.reverse_last_instruction()
+
+        # Odd depths were moved into by the root player
+        for depth, path_node in enumerate(path):
+            mover_white = root_white if depth % 2 else not root_white
+            self.visits[path_node] += 1
+            self.value_sums[path_node] += white_value if mover_white else 1 - white_value
+
+    def search(self, iterations: int=None, seconds: float=None) -> tuple | None:
+        """Iterates until either limit is reached (one of them must be given), returns the
+        best move"""
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        n_iterations = 0
+        while (iterations is None or n_iterations < iterations)\
+                and (deadline is None or time.perf_counter() < deadline):
+            self.iterate()
+            n_iterations += 1
+        return self.best_move()
+
+    def root_statistics(self) -> list[tuple[tuple, int, float]]:
+        """(move, visits, value sum) of every root child, values for the player to move"""
+        return [(self.moves[child], self.visits[child], self.value_sums[child])
+                for child in self.children(0)]
+
+    def best_move(self) -> tuple | None:
+        """The most visited root move, None if the root has no children"""
+        statistics = self.root_statistics()
+        if not statistics:
+            return None
+        return max(statistics, key=lambda child: child[1])[0]
+
+    def advance(self, move: tuple):
+        """Plays a move on the engine, keeping its subtree as the new tree"""
+        new_root = next((child for child in self.children(0) if self.moves[child] == move), None)
+        self.engine.execute_instructions(move)
+        if new_root is None:
+            self.clear()
+            return
+
+        # Copy the subtree breadth first so every node's children stay consecutive
+        old_ids, new_first_child = [new_root], []
+        for old_id in old_ids:
+            if self.first_child[old_id] == UNEXPANDED:
+                new_first_child.append(UNEXPANDED)
+            else:
+                new_first_child.append(len(old_ids))
+                old_ids.extend(self.children(old_id))
+        self.visits = array("l", (self.visits[old_id] for old_id in old_ids))
+        self.value_sums = array("d", (self.value_sums[old_id] for old_id in old_ids))
+        self.priors = array("d", (self.priors[old_id] for old_id in old_ids))
+        self.n_children = array("l", (self.n_children[old_id] for old_id in old_ids))
+        self.first_child = array("l", new_first_child)
+        self.moves = [None] + [self.moves[old_id] for old_id in old_ids[1:]]
+
+
+def _search_tree(args: tuple) -> list[tuple[tuple, int, float]]:
+    """Builds and searches one tree in a worker process"""
+    state, iterations, seconds, rand_seed, options = args
+    tree = MCTS(MainEngine(state), rand_seed=rand_seed, **options)
+    tree.search(iterations, seconds)
+    return tree.root_statistics()
+
+
+def root_parallel_search(engine: MainEngine, iterations: int=None, seconds: float=None,
+                         n_trees: int=None, processes: int=None, base_seed: int=21221,
+                         **options) -> tuple[tuple | None, dict[tuple, list]]:
+    """Searches n_trees independent trees (one per CPU by default) over a pool of processes
+    (in this process if processes is 1), each for the given iterations or seconds.
+    options are passed to MCTS and must be picklable, so evaluate and policy have to be
+    module level functions. Returns the most visited move over all the trees and
+    move -> [visits, value sum] summed over the trees"""
+    n_trees = n_trees or processes or os.cpu_count()
+    jobs = [(engine.state.copy(), iterations, seconds, game_seed(base_seed, tree_idx), options)
+            for tree_idx in range(n_trees)]
+    if processes == 1:
+        tree_statistics = list(map(_search_tree, jobs))
+    else:
+        with Pool(processes) as pool:
+            tree_statistics = pool.map(_search_tree, jobs)
+
+    totals = {}
+    for statistics in tree_statistics:
+        for move, visits, value_sum in statistics:
+            move_totals = totals.setdefault(move, [0, 0.0])
+            move_totals[0] += visits
+            move_totals[1] += value_sum
+    if not totals:
+        return None, totals
+    return max(totals, key=lambda move: totals[move][0]), totals
+
+
+class MCTSStrategy(Strategy):
+    """Chooses moves with an MCTS of iterations iterations. The tree is kept between moves
+    when the opponent's reply is the engine's last move, otherwise it is rebuilt"""
+    name = "mcts"
+
+    def __init__(self, rand_seed: int=None, iterations: int=200, **options) -> None:
+        super().__init__(rand_seed)
+        self.iterations = iterations
+        self.options = options
+        self.tree = None
+
+    def _reuse_tree(self, engine: MainEngine) -> bool:
+        """Follows the opponent's reply in the tree, whether the tree is at the position"""
+        if self.tree is None or not engine.state_stack:
+            return False
+        self.tree.advance(engine.state_stack[-1])
+        return self.tree.engine.state == engine.state
+
+    def choose_move(self, engine: MainEngine, moves: list[tuple]) -> tuple:
+        if not self._reuse_tree(engine):
+            self.tree = MCTS(MainEngine(engine.state.copy()),
+                             rand_seed=self.random.randrange(1 << 30), **self.options)
+        move = self.tree.search(self.iterations)
+        if move not in moves:
+            move = self.random.choice(moves)
+        self.tree.advance(move)
+        return move
@@ -0,0 +1,204 @@
+"""Lookups between instruction sets and move strings (UCI and SAN) for one position.
+A MoveIndex is built from the legal moves of a position and turns a move string into its
+instruction set, or an instruction set into its strings, with a dictionary lookup. Each table
+is only built the first time it is needed."""
+from functools import lru_cache
+from src.main_engine import MainEngine, captured_square_state
+from src.resources.data_translators import SQUARE_IDX
+
+SQUARE_NAMES = [None] * 64
+for _square_name, _square_idx in SQUARE_IDX.items():
+    SQUARE_NAMES[_square_idx] = _square_name
+FILES, RANKS = "abcdefgh", "87654321"
+PIECE_LETTERS = {"N": 2, "B": 3, "R": 4, "Q": 5, "K": 6}
+# SAN piece letter and UCI promotion letter of every square state
+SAN_LETTERS = ["", "", "N", "B", "R", "Q", "K", "", "N", "B", "R", "Q", "K"]
+UCI_PROMOTION_LETTERS = ["", "", "n", "b", "r", "q", "", "", "n", "b", "r", "q", ""]
+SAN_SUFFIXES = "+#!?"
+PIECE_TYPES = [0, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6]
+
+
+def move_endpoints(move: tuple) -> tuple[int, int, int]:
+    """The origin square, destination square and promotion state (0 for none) of a move.
+    Promotions land the new piece with the second half of the instruction set"""
+    if len(move) > 8 and move[0] == move[2]:
+        return move[0], move[10], move[3]
+    return move[0], move[2], 0
+
+
+def move_to_uci(move: tuple) -> str:
+    """The UCI string of a move, e.g. e2e4, e1g1 for white's short castle or e7e8q"""
+    from_idx, to_idx, promotion_state = move_endpoints(move)
+    return SQUARE_NAMES[from_idx] + SQUARE_NAMES[to_idx] + UCI_PROMOTION_LETTERS[promotion_state]
+
+
+def _is_castle(move: tuple) -> bool:
+    """Whether a move is a castle, the king moving two squares"""
+    return len(move) > 8 and move[1] in (6, 12) and abs(move[2] - move[0]) == 2
+
+
+@lru_cache(maxsize=1 << 14)
+def parse_san(san: str) -> tuple:
+    """Splits a SAN move into the key MoveIndex files its moves under and the origin file and
+    rank given to disambiguate it (None if not given). The key is "O-O" or "O-O-O" for
+    castles, otherwise (piece, destination square, promotion piece) with pieces as white
+    square states. Loose SAN without capture marks or with a full origin square is accepted.
+    Results are cached as the same strings come up over and over"""
+    san = san.rstrip(SAN_SUFFIXES)
+    if san in ("O-O", "O-O-O", "0-0", "0-0-0"):
+        return san.replace("0", "O"), None, None
+
+    promotion_piece = 0
+    if "=" in san:
+        san, promotion = san.split("=", 1)
+        promotion_piece = PIECE_LETTERS.get(promotion, -1)
+    elif len(san) > 2 and san[-1] in "NBRQ" and san[0] in FILES:
+        san, promotion_piece = san[:-1], PIECE_LETTERS[san[-1]]
+    piece = PIECE_LETTERS.get(san[:1], 1)
+    origin = san[piece > 1:-2].replace("x", "")
+    to_square = san[-2:]
+    if to_square not in SQUARE_IDX or promotion_piece < 0 or len(origin) > 2\
+            or any(char not in FILES + RANKS for char in origin):
+        raise ValueError(f"Unreadable SAN move: {san}")
+    from_file = next((char for char in origin if char in FILES), None)
+    from_rank = next((char for char in origin if char in RANKS), None)
+    return (piece, SQUARE_IDX[to_square], promotion_piece), from_file, from_rank
+
+
+class MoveIndex:
+    """Move string lookups for the position the engine is in. moves are the engine's legal
+    moves, generated if not given. The index is only valid until the engine moves"""
+    def __init__(self, engine: MainEngine, moves: list[tuple]=None) -> None:
+        self.engine = engine
+        self.moves = engine.get_all_moves() if moves is None else moves
+        self._uci_moves, self._move_ucis = None, None
+        self._san_moves, self._move_sans = None, None
+        self._san_keys, self._check_suffixes = None, None
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __contains__(self, move: tuple) -> bool:
+        return move in self.move_ucis
+
+    @property
+    def uci_moves(self) -> dict[str, tuple]:
+        """UCI string -> instruction set"""
+        if self._uci_moves is None:
+            self._uci_moves = {uci: move for move, uci in self.move_ucis.items()}
+        return self._uci_moves
+
+    @property
+    def move_ucis(self) -> dict[tuple, str]:
+        """instruction set -> UCI string"""
+        if self._move_ucis is None:
+            self._move_ucis = {move: move_to_uci(move) for move in self.moves}
+        return self._move_ucis
+
+    @property
+    def move_sans(self) -> dict[tuple, str]:
+        """instruction set -> SAN string without the check or checkmate suffix"""
+        if self._move_sans is None:
+            self._move_sans = self._build_sans()
+        return self._move_sans
+
+    @property
+    def san_moves(self) -> dict[str, tuple]:
+        """SAN string (without suffixes) -> instruction set"""
+        if self._san_moves is None:
+            self._san_moves = {san: move for move, san in self.move_sans.items()}
+        return self._san_moves
+
+    @property
+    def san_keys(self) -> dict:
+        """parse_san key -> the instruction sets filed under it, more than one if the SAN
+        needs the origin to disambiguate"""
+        if self._san_keys is None:
+            self._san_keys = {}
+            for move in self.moves:
+                if len(move) > 8 and move[0] == move[2]:
+                    key = (1, move[10], PIECE_TYPES[move[3]])
+                elif _is_castle(move):
+                    key = "O-O" if move[2] > move[0] else "O-O-O"
+                else:
+                    key = (PIECE_TYPES[move[1]], move[2], 0)
+                if key in self._san_keys:
+                    self._san_keys[key].append(move)
+                else:
+                    self._san_keys[key] = [move]
+        return self._san_keys
+
+    def _build_sans(self) -> dict[tuple, str]:
+        """Writes the SAN of every move, disambiguating pieces that share a destination"""
+        origins = {}
+        for move in self.moves:
+            if not _is_castle(move) and move[1] not in (1, 7):
+                origins.setdefault((move[1], move[2]), set()).add(move[0])
+
+        sans = {}
+        for move in self.moves:
+            from_idx, to_idx, promotion_state = move_endpoints(move)
+            capture = "x" if captured_square_state(move) else ""
+            if _is_castle(move):
+                san = "O-O" if to_idx > from_idx else "O-O-O"
+            elif move[1] in (1, 7):
+                san = (FILES[from_idx & 7] + capture if capture else "") + SQUARE_NAMES[to_idx]
+                if promotion_state:
+                    san += "=" + SAN_LETTERS[promotion_state]
+            else:
+                origin = ""
+                rivals = origins[(move[1], to_idx)] - {from_idx}
+                if rivals:
+                    if all(rival & 7 != from_idx & 7 for rival in rivals):
+                        origin = FILES[from_idx & 7]
+                    elif all(rival >> 3 != from_idx >> 3 for rival in rivals):
+                        origin = RANKS[from_idx >> 3]
+                    else:
+                        origin = SQUARE_NAMES[from_idx]
+                san = SAN_LETTERS[move[1]] + origin + capture + SQUARE_NAMES[to_idx]
+            sans[move] = san
+        return sans
+
+    def _check_suffix(self, move: tuple) -> str:
+        """"+" if the move checks, "#" if it mates, played out on the engine"""
+        self.engine.execute_instructions(move)
+        suffix = ""
+        if self.engine.in_check():
+            suffix = "#" if self.engine.count_all_moves() == 0 else "+"
+        self.engine.reverse_last_instruction()
+        return suffix
+
+    def from_uci(self, uci: str) -> tuple:
+        """The instruction set of a UCI string, raising ValueError if it isn't legal"""
+        try:
+            return self.uci_moves[uci.lower()]
+        except KeyError as error:
+            raise ValueError(f"Illegal UCI move: {uci}") from error
+
+    def to_uci(self, move: tuple) -> str:
+        """The UCI string of a legal instruction set"""
+        return self.move_ucis[move]
+
+    def from_san(self, san: str) -> tuple:
+        """The instruction set of a SAN string, raising ValueError if it isn't legal or is
+        ambiguous. Loose SAN is accepted, see parse_san"""
+        key, from_file, from_rank = parse_san(san)
+        candidates = self.san_keys.get(key, ())
+        if len(candidates) > 1:
+            candidates = [move for move in candidates
+                          if (from_file is None or FILES[move[0] & 7] == from_file)
+                          and (from_rank is None or RANKS[move[0] >> 3] == from_rank)]
+        if len(candidates) != 1:
+            raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} SAN move: {san}")
+        return candidates[0]
+
+    def to_san(self, move: tuple, suffix: bool=True) -> str:
+        """The SAN string of a legal instruction set, with "+" or "#" if suffix is True.
+        Working out the suffix plays the move out on the engine"""
+        if not suffix:
+            return self.move_sans[move]
+        if self._check_suffixes is None:
+            self._check_suffixes = {}
+        if move not in self._check_suffixes:
+            self._check_suffixes[move] = self._check_suffix(move)
+        return self.move_sans[move] + self._check_suffixes[move]
@@ -0,0 +1,232 @@
+"""An opening book built from games and probed through a memory map.
+The first plies of PGN or self-play games are replayed and every (position, move) pair is
+aggregated into one record: the position's Zobrist key (hash(MainEngine)), the move, the
+number of games it was played in and the wins, draws and losses of the player who played it.
+A book file is a 16 byte header (BOOK_MAGIC, the format version and the record size)
+followed by the records sorted by key and move. A position's moves are found by a binary
+search over the memory-mapped keys, so nothing is loaded when the book is opened."""
+import argparse
+import bisect
+import os
+import random
+import struct
+import time
+from array import array
+from typing import NamedTuple
+import numpy as np
+from src.main_engine import MainEngine
+from src.move_index import move_endpoints, move_to_uci
+from src.pgn import read_pgn
+from src.strategies import STRATEGIES, Strategy, make_strategy
+from src.tournament import MAX_PLIES, game_seed, play_game
+
+BOOK_DTYPE = np.dtype([
+    ("key", "<u8"),
+    ("move", "<u2"),
+    ("weight", "<u4"),
+    ("wins", "<u4"),
+    ("draws", "<u4"),
+    ("losses", "<u4"),
+])
+BOOK_MAGIC = b"PYCHBOOK"
+BOOK_VERSION = 1
+HEADER_FORMAT = "<8sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+BOOK_PLIES = 16
+# Game outcomes for the player to move
+UNKNOWN_OUTCOME, LOSS_OUTCOME, DRAW_OUTCOME, WIN_OUTCOME = -1, 0, 1, 2
+
+
+def encode_move(move: tuple) -> int:
+    """The 16 bit book code of a move: origin, destination and promotion state"""
+    from_idx, to_idx, promotion_state = move_endpoints(move)
+    return from_idx | (to_idx << 6) | (promotion_state << 12)
+
+
+class BookEntry(NamedTuple):
+    """A book move with the games it was played in and their outcomes for its player"""
+    move: tuple
+    weight: int
+    wins: int
+    draws: int
+    losses: int
+
+    @property
+    def score(self) -> float | None:
+        """The player's score over the games with a known result"""
+        n_results = self.wins + self.draws + self.losses
+        return (self.wins + self.draws / 2) / n_results if n_results else None
+
+
+class BookBuilder:
+    """Collects the first max_plies moves of games and aggregates them into book records"""
+    def __init__(self, max_plies: int=BOOK_PLIES) -> None:
+        self.max_plies = max_plies
+        self.keys, self.moves, self.outcomes = array("Q"), array("H"), array("b")
+        self.n_games = 0
+
+    def add_game(self, moves: list[tuple], result: float | None, engine: MainEngine=None):
+        """Adds the moves of a game played from the engine's position (the starting position
+        by default), result being the game's score for white or None if unknown. The engine
+        is left where it was"""
+        engine = MainEngine() if engine is None else engine
+        book_moves = moves[:self.max_plies]
+        for move in book_moves:
+            self.keys.append(hash(engine))
+            self.moves.append(encode_move(move))
+            if result is None:
+                self.outcomes.append(UNKNOWN_OUTCOME)
+            else:
+                self.outcomes.append(int(2 * (result if engine.state[-1] else 1 - result)))
+            engine.execute_instructions(move)
+        for _ in book_moves:
+            engine.reverse_last_instruction()
+        self.n_games += 1
+
+    def add_pgn(self, path: str, processes: int=None) -> int:
+        """Adds the games of a PGN file (see read_pgn), skipping unreadable games.
+        Returns the number of games added"""
+        n_games = self.n_games
+        for positions in read_pgn(path, processes):
+            if positions:
+                self.add_game([move for _, move, _ in positions], positions[0][2],
+                              MainEngine(positions[0][0]))
+        return self.n_games - n_games
+
+    def add_self_play(self, n_games: int, strategy_name: str="random_move",
+                      base_seed: int=21221, max_plies: int=MAX_PLIES):
+        """Plays and adds n_games games of a strategy against itself"""
+        for game_idx in range(n_games):
+            seed = game_seed(base_seed, game_idx)
+            engine = MainEngine()
+            result = play_game(make_strategy(strategy_name, seed),
+                               make_strategy(strategy_name, seed + 1), max_plies, engine)
+            self.add_game(list(engine.state_stack), result["score"])
+
+    def records(self) -> np.ndarray:
+        """The aggregated records sorted by key and move"""
+        keys = np.frombuffer(self.keys, dtype=np.uint64)
+        moves = np.frombuffer(self.moves, dtype=np.uint16)
+        outcomes = np.frombuffer(self.outcomes, dtype=np.int8)
+        order = np.lexsort((moves, keys))
+        keys, moves, outcomes = keys[order], moves[order], outcomes[order]
+        # Each run of equal (key, move) pairs becomes a record
+        starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (moves[1:] != moves[:-1])])\
+            if len(keys) else np.zeros(0, dtype=np.int64)
+
+        records = np.zeros(len(starts), dtype=BOOK_DTYPE)
+        if not len(starts):
+            return records
+        records["key"] = keys[starts]
+        records["move"] = moves[starts]
+        records["weight"] = np.diff(np.r_[starts, len(keys)])
+        for field, outcome in (("wins", WIN_OUTCOME), ("draws", DRAW_OUTCOME),
+                               ("losses", LOSS_OUTCOME)):
+            records[field] = np.add.reduceat((outcomes == outcome).astype(np.uint32), starts)
+        return records
+
+    def write(self, path: str) -> int:
+        """Writes the book file, returns the number of records"""
+        records = self.records()
+        with open(path + ".tmp", "wb") as book_file:
+            book_file.write(struct.pack(HEADER_FORMAT, BOOK_MAGIC, BOOK_VERSION,
+                                        BOOK_DTYPE.itemsize))
+            book_file.write(records.tobytes())
+        os.replace(path + ".tmp", path)
+        return len(records)
+
+
+class OpeningBook:
+    """Probes a book file, the records stay in the memory map"""
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as book_file:
+            magic, version, record_size = struct.unpack(HEADER_FORMAT,
+                                                        book_file.read(HEADER_SIZE))
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or record_size != BOOK_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a version {BOOK_VERSION} opening book")
+        n_records = (os.path.getsize(path) - HEADER_SIZE) // BOOK_DTYPE.itemsize
+        if n_records:
+            self.records = np.memmap(path, dtype=BOOK_DTYPE, mode="r", offset=HEADER_SIZE,
+                                     shape=(n_records,))
+        else:
+            self.records = np.zeros(0, dtype=BOOK_DTYPE)
+        # A strided view, searchsorted would copy it so the search is done with bisect
+        self.keys = self.records["key"]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def probe(self, engine: MainEngine) -> list[BookEntry]:
+        """The book moves of the engine's position, moves that aren't legal (a key
+        collision) are left out"""
+        key = hash(engine)
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_right(self.keys, key, start)
+        if start == end:
+            return []
+        legal_moves = {encode_move(move): move for move in engine.get_all_moves()}
+        return [BookEntry(legal_moves[move_code], weight, wins, draws, losses)
+                for _, move_code, weight, wins, draws, losses in self.records[start:end].tolist()
+                if move_code in legal_moves]
+
+    def choose_move(self, engine: MainEngine, rand: random.Random=None,
+                    min_weight: int=1) -> tuple | None:
+        """A book move picked at random in proportion to its weight, None if the position
+        has no move played at least min_weight times"""
+        entries = [entry for entry in self.probe(engine) if entry.weight >= min_weight]
+        if not entries:
+            return None
+        rand = random if rand is None else rand
+        return rand.choices([entry.move for entry in entries],
+                            weights=[entry.weight for entry in entries])[0]
+
+
+class BookStrategy(Strategy):
+    """Plays book moves while the game is in the book, then leaves the moves to strategy"""
+    name = "book"
+
+    def __init__(self, book: OpeningBook, strategy: Strategy, rand_seed: int=None,
+                 min_weight: int=1) -> None:
+        super().__init__(rand_seed)
+        self.book = book
+        self.strategy = strategy
+        self.min_weight = min_weight
+
+    def choose_move(self, engine: MainEngine, moves: list[tuple]) -> tuple:
+        move = self.book.choose_move(engine, self.random, self.min_weight)
+        if move in moves:
+            return move
+        return self.strategy.choose_move(engine, moves)
+
+
+def main():
+    """Command line entry point: python -m src.opening_book --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="Book file to write")
+    parser.add_argument("--pgn", nargs="*", default=[], help="PGN files to add")
+    parser.add_argument("--self-play", type=int, default=0, help="Self-play games to add")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="random_move")
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    builder = BookBuilder(args.plies)
+    for pgn_path in args.pgn:
+        builder.add_pgn(pgn_path, args.processes)
+    builder.add_self_play(args.self_play, args.strategy)
+    n_records = builder.write(args.path)
+    print(f"Wrote {n_records:,} records from {builder.n_games:,} games "
+          f"in {time.perf_counter() - start_time:.1f}s")
+
+    book, engine = OpeningBook(args.path), MainEngine()
+    start_time = time.perf_counter()
+    for _ in range(1000):
+        entries = book.probe(engine)
+    # 1000 probes, so the milliseconds are the microseconds per probe
+    print(f"{(time.perf_counter() - start_time) * 1000:.1f}us per probe, starting position "
+          + " ".join(f"{move_to_uci(entry.move)}:{entry.weight}" for entry in entries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""A streaming PGN reader that replays games into MainEngine.
+Files are read line by line and split on game boundaries so archives of any size can be
+read, games are replayed in a pool of worker processes and SAN moves are resolved with a
+MoveIndex of each position."""
+import argparse
+import re
+import time
+from multiprocessing import Pool
+from typing import Iterable, Iterator
+from src.main_engine import MainEngine
+from src.move_index import MoveIndex
+
+RESULT_VALUES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5, "*": None}
+TAG_PATTERN = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+# Comments, rest of line comments, numeric annotation glyphs and move numbers
+MOVETEXT_NOISE = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|\d+\.(?:\.\.)?")
+
+
+class PGNGame:
+    """The tag pairs and the SAN moves of one game"""
+    def __init__(self, tags: dict[str, str], moves: list[str], result: str) -> None:
+        self.tags = tags
+        self.moves = moves
+        self.result = result
+
+    def __repr__(self) -> str:
+        return f"PGNGame({self.tags.get('White', '?')} - {self.tags.get('Black', '?')}, "\
+            f"{len(self.moves)} moves, {self.result})"
+
+
+def split_games(lines: Iterable[str]) -> Iterator[str]:
+    """Yields the text of every game in a stream of PGN lines without reading ahead more
+    than one game. A game ends when a tag pair follows its movetext"""
+    game_lines, in_movetext = [], False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("[") and in_movetext:
+            yield "".join(game_lines)
+            game_lines, in_movetext = [], False
+        elif stripped and not stripped.startswith("["):
+            in_movetext = True
+        game_lines.append(line)
+    if any(line.strip() for line in game_lines):
+        yield "".join(game_lines)
+
+
+def _remove_variations(movetext: str) -> str:
+    """Removes the (possibly nested) variations in parentheses"""
+    depth, kept = 0, []
+    for char in movetext:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif not depth:
+            kept.append(char)
+    return "".join(kept)
+
+
+def parse_game(game_text: str) -> PGNGame:
+    """Parses the text of one game (see split_games)"""
+    tags, movetext_lines = {}, []
+    for line in game_text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("[") and not movetext_lines:
+            for name, value in TAG_PATTERN.findall(stripped):
+                tags[name] = value.replace('\\"', '"')
+        elif stripped and not stripped.startswith("%"):
+            movetext_lines.append(line)
+
+    movetext = MOVETEXT_NOISE.sub(" ", _remove_variations("\n".join(movetext_lines)))
+    moves, result = [], tags.get("Result", "*")
+    for token in movetext.split():
+        if token in RESULT_VALUES:
+            result = token
+        else:
+            moves.append(token)
+    return PGNGame(tags, moves, result)
+
+
+def replay_game(game: PGNGame) -> Iterator[tuple[list, tuple, float | None]]:
+    """Yields (state, move, result) for every move of the game, state being a copy of the
+    position the move is played from and result the game's result for white (None if
+    unknown). Games with a FEN tag start from that position"""
+    engine = MainEngine.from_fen(game.tags["FEN"]) if "FEN" in game.tags else MainEngine()
+    result = RESULT_VALUES.get(game.result)
+    for san in game.moves:
+        move = MoveIndex(engine).from_san(san)
+        yield engine.state.copy(), move, result
+        engine.execute_instructions(move)
+
+
+def replay_game_text(game_text: str) -> list[tuple[list, tuple, float | None]] | None:
+    """Parses and replays a game, returning None if it holds an illegal or unreadable move"""
+    try:
+        return list(replay_game(parse_game(game_text)))
+    except ValueError:
+        return None
+
+
+def _replay_game_texts(game_texts: list[str]) -> list:
+    """Replays a batch of games in a worker process"""
+    return [replay_game_text(game_text) for game_text in game_texts]
+
+
+def _batched(items: Iterator, batch_size: int) -> Iterator[list]:
+    """Groups an iterator into lists of batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_pgn(path: str, processes: int=None,
+             games_per_task: int=64) -> Iterator[list[tuple[list, tuple, float | None]]]:
+    """Streams the games of a PGN file through a pool of processes (in this process if
+    processes is 1), yielding each game's list of (state, move, result) in file order.
+    Games with illegal or unreadable moves are yielded as None"""
+    with open(path, encoding="utf-8", errors="replace") as pgn_file:
+        batches = _batched(split_games(pgn_file), games_per_task)
+        if processes == 1:
+            for batch in batches:
+                yield from _replay_game_texts(batch)
+            return
+        with Pool(processes) as pool:
+            for replayed_batch in pool.imap(_replay_game_texts, batches):
+                yield from replayed_batch
+
+
+def main():
+    """Command line entry point: python -m src.pgn --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="PGN file to read")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--games-per-task", type=int, default=64)
+    args = parser.parse_args()
+
+    n_games, n_errors, n_positions = 0, 0, 0
+    start_time = time.perf_counter()
+    for positions in read_pgn(args.path, args.processes, args.games_per_task):
+        n_games += 1
+        if positions is None:
+            n_errors += 1
+        else:
+            n_positions += len(positions)
+    run_time = time.perf_counter() - start_time
+    print(f"Read {n_games:,} games ({n_errors:,} with errors) and {n_positions:,} positions "
+          f"in {run_time:.1f}s: {n_games / run_time:,.0f} games/s, "
+          f"{n_positions / run_time:,.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
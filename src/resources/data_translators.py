@@ -24,3 +24,66 @@ CASTLE_STATES = {
 EP_FILE = {None: -1} | {file_name: int(idx) for file_name, idx in zip("abcdefgh", "01234567")}
 
 PLAYER_TURN = {"white": True, "black": False}
+
+FEN_PIECES = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6,
+              "p": 7, "n": 8, "b": 9, "r": 10, "q": 11, "k": 12}
+FEN_CASTLE_RIGHTS = {"K": CASTLE_STATES["w_short"], "Q": CASTLE_STATES["w_long"],
+                     "k": CASTLE_STATES["b_short"], "q": CASTLE_STATES["b_long"]}
+# Expands a FEN piece placement to one character per square, "." being an empty square
+FEN_EXPANSION = str.maketrans({str(n_empty): "." * n_empty for n_empty in range(1, 9)} | {"/": ""})
+FEN_SQUARE_STATES = FEN_PIECES | {".": 0}
+FEN_CHARACTERS = {square_state: char for char, square_state in FEN_SQUARE_STATES.items()}
+FEN_CASTLE_STRINGS = ["".join(char for char, bit in FEN_CASTLE_RIGHTS.items() if castle_state & bit)
+                      or "-" for castle_state in range(16)]
+
+
+def fen_to_state(fen: str) -> list:
+    """Translates the first four fields of a FEN string (pieces, side to move, castle rights
+    and en passant square) into an engine state, the move counters are ignored"""
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"FEN needs at least four fields: {fen}")
+    placement, turn, castle_rights, en_passant = fields[:4]
+    try:
+        state = [FEN_SQUARE_STATES[char] for char in placement.translate(FEN_EXPANSION)]
+    except KeyError as error:
+        raise ValueError(f"Bad FEN piece placement: {placement}") from error
+    if len(state) != 64:
+        raise ValueError(f"FEN piece placement does not cover 64 squares: {placement}")
+    if state.count(SQUARE_STATES["b_king"]) != 1 or state.count(SQUARE_STATES["w_king"]) != 1:
+        raise ValueError(f"FEN piece placement needs one king per player: {placement}")
+
+    if turn not in ("w", "b"):
+        raise ValueError(f"Bad FEN side to move: {turn}")
+    if castle_rights != "-" and (not set(castle_rights) <= FEN_CASTLE_RIGHTS.keys()
+                                 or len(set(castle_rights)) != len(castle_rights)):
+        raise ValueError(f"Bad FEN castle rights: {castle_rights}")
+    if en_passant != "-" and (len(en_passant) != 2 or en_passant[0] not in "abcdefgh"
+                              or en_passant[1] not in "36"):
+        raise ValueError(f"Bad FEN en passant square: {en_passant}")
+
+    castle_state = 0
+    for char in castle_rights.replace("-", ""):
+        castle_state |= FEN_CASTLE_RIGHTS[char]
+    state += [state.index(SQUARE_STATES["b_king"]), state.index(SQUARE_STATES["w_king"]),
+              castle_state, EP_FILE[en_passant[0]] if en_passant != "-" else -1, turn == "w"]
+    return state
+
+
+def state_to_fen(state: list, halfmove_clock: int=0, fullmove_number: int=1) -> str:
+    """Translates an engine state into a FEN string. The state doesn't hold the move counters
+    so they are passed in"""
+    ranks = []
+    for rank_start in range(0, 64, 8):
+        rank = "".join(FEN_CHARACTERS[square_state]
+                       for square_state in state[rank_start:rank_start + 8])
+        for n_empty in range(8, 0, -1):
+            rank = rank.replace("." * n_empty, str(n_empty))
+        ranks.append(rank)
+
+    # The en passant target is behind the pawn that just double moved
+    en_passant = "-"
+    if state[EP_IDX] >= 0:
+        en_passant = "abcdefgh"[state[EP_IDX]] + ("6" if state[TURN_IDX] else "3")
+    return f"{'/'.join(ranks)} {'w' if state[TURN_IDX] else 'b'} "\
+        f"{FEN_CASTLE_STRINGS[state[CASTLE_IDX]]} {en_passant} {halfmove_clock} {fullmove_number}"
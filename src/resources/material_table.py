@@ -0,0 +1,130 @@
+"""A material signature key and a table of material information indexed by it.
+The key packs the count of every non-king piece into 4 bits, ordered by square state:
+white pawn in bits 0-3 up to white queen in bits 16-19, then black pawn to black queen
+in bits 20-39. Adding or removing a piece adds or subtracts MATERIAL_KEY_UNITS[state]."""
+from typing import NamedTuple
+from src.resources.piece_square_tables import PIECE_VALUES
+
+MATERIAL_KEY_UNITS = [0, 1, 1 << 4, 1 << 8, 1 << 12, 1 << 16, 0,
+                      1 << 20, 1 << 24, 1 << 28, 1 << 32, 1 << 36, 0]
+# The game phase counts down from MAX_PHASE as knights, bishops, rooks and queens come off
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+BISHOP_PAIR_SCORE = 30
+# Knights gain and rooks lose value for every friendly pawn above 5 (Kaufman)
+KNIGHT_PAWN_ADJUSTMENT = 6
+ROOK_PAWN_ADJUSTMENT = -12
+
+# Flags stored with each entry
+SUFFICIENT_MATERIAL_FLAG = 0b0001
+DRAWISH_FLAG = 0b0010
+
+
+class MaterialEntry(NamedTuple):
+    """What the material on the board says about the position.
+    imbalance: centipawns from white's point of view
+    phase: MAX_PHASE with all minor and major pieces on the board down to 0 with none
+    flags: a combination of the *_FLAG constants
+    endgame: the name of a specialized endgame (e.g. "KBNK") or None
+    strong_side_white: whether white is the side trying to win the named endgame"""
+    imbalance: int
+    phase: int
+    flags: int
+    endgame: str | None
+    strong_side_white: bool
+
+
+def material_key_from_state(state: list) -> int:
+    """Calculates the material key of the 64 squares of a state"""
+    material_key = 0
+    for square_state in state[:64]:
+        material_key += MATERIAL_KEY_UNITS[square_state]
+    return material_key
+
+
+def material_counts(material_key: int) -> list[int]:
+    """Unpacks a material key into a list of piece counts indexed by square state"""
+    counts = [0] * 13
+    for square_state, unit in enumerate(MATERIAL_KEY_UNITS):
+        if unit:
+            counts[square_state] = (material_key // unit) & 0b1111
+    return counts
+
+
+def _has_sufficient_material(counts: list[int]) -> bool:
+    """Whether either player could still deliver checkmate"""
+    # pylint: disable=too-many-return-statements
+    # Any pawn, rook or queen is enough
+    if counts[1] or counts[4] or counts[5] or counts[7] or counts[10] or counts[11]:
+        return True
+
+    # If a player has two bishops, or a bishop and a knight
+    if counts[3] >= 2 or counts[9] >= 2:
+        return True
+    if (counts[3] and counts[2]) or (counts[9] and counts[8]):
+        return True
+
+    # If a player has two knights and the other player has a knight or bishop
+    if counts[2] >= 2 and (counts[8] or counts[9]):
+        return True
+    if counts[8] >= 2 and (counts[2] or counts[3]):
+        return True
+
+    # If a player has more than two knights (strange promotion choices)
+    return counts[2] >= 3 or counts[8] >= 3
+
+
+def _side_value(counts: list[int], pawn: int) -> int:
+    """The material value of one player's pieces, pawn is 1 for white and 7 for black"""
+    value = sum(PIECE_VALUES[piece] * counts[pawn + piece - 1] for piece in range(1, 6))
+    if counts[pawn + 2] >= 2:
+        value += BISHOP_PAIR_SCORE
+    value += KNIGHT_PAWN_ADJUSTMENT * counts[pawn + 1] * (counts[pawn] - 5)
+    value += ROOK_PAWN_ADJUSTMENT * counts[pawn + 3] * (counts[pawn] - 5)
+    return value
+
+
+def _endgame(counts: list[int]) -> tuple[str | None, bool]:
+    """Names the specialized endgame for the material, if there is one"""
+    for pawn, enemy_pawn, strong_side_white in ((1, 7, True), (7, 1, False)):
+        strong = counts[pawn:pawn + 5]
+        weak = counts[enemy_pawn:enemy_pawn + 5]
+        if any(weak):
+            continue
+        if strong == [0, 1, 1, 0, 0]:
+            return "KBNK", strong_side_white
+        if strong == [1, 0, 0, 0, 0]:
+            return "KPK", strong_side_white
+        if not strong[0] and (strong[3] or strong[4]):
+            return "KXK", strong_side_white
+    return None, True
+
+
+def calculate_material_entry(material_key: int) -> MaterialEntry:
+    """Calculates the table entry for a material key"""
+    counts = material_counts(material_key)
+    imbalance = _side_value(counts, 1) - _side_value(counts, 7)
+    phase = min(MAX_PHASE, sum(PHASE_WEIGHTS[state] * count for state, count in enumerate(counts)))
+
+    flags = 0
+    if _has_sufficient_material(counts):
+        flags |= SUFFICIENT_MATERIAL_FLAG
+    # Without pawns being up less than a rook is usually not enough to win
+    if not counts[1] and not counts[7] and abs(imbalance) < PIECE_VALUES[4]:
+        flags |= DRAWISH_FLAG
+
+    endgame, strong_side_white = _endgame(counts)
+    return MaterialEntry(imbalance, phase, flags, endgame, strong_side_white)
+
+
+class MaterialTable(dict):
+    """MATERIAL_TABLE[material_key] = MaterialEntry
+    Entries are calculated the first time a signature is seen and looked up afterwards,
+    there are far too many signatures (promotions included) to build them all on import"""
+    def __missing__(self, material_key: int) -> MaterialEntry:
+        entry = calculate_material_entry(material_key)
+        self[material_key] = entry
+        return entry
+
+
+MATERIAL_TABLE = MaterialTable()
@@ -0,0 +1,128 @@
+"""Piece-square tables used by the evaluators.
+Each table is written from white's point of view in the same order as the state list
+(a8 first, h1 last) so a white piece on idx uses TABLE[idx] and a black piece uses
+TABLE[idx ^ 56], the same square mirrored across the board. Values are in centipawns."""
+
+PIECE_VALUES = {1: 100, 2: 320, 3: 330, 4: 500, 5: 900, 6: 0}
+
+PAWN_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+
+ROOK_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0,
+]
+
+QUEEN_TABLE = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+]
+
+PIECE_TABLES = {1: PAWN_TABLE, 2: KNIGHT_TABLE, 3: BISHOP_TABLE,
+                4: ROOK_TABLE, 5: QUEEN_TABLE, 6: KING_TABLE}
+
+# Bonus for each castle right in the order of the castle state bits (see data_structures.md)
+CASTLE_RIGHT_SCORES = [15, 10, -15, -10]
+TEMPO_SCORE = 10
+
+
+def build_square_state_table(piece_values: dict[int, int],
+                             piece_tables: dict[int, list[int]]) -> list[list[int]]:
+    """Combines material and piece-square values into a single lookup:
+    SQUARE_STATE_TABLE[square_idx][square_state] = score for white.
+    Black pieces use the mirrored square and a negated score"""
+    table = [[0] * 13 for _ in range(64)]
+    for square_idx in range(64):
+        for piece, piece_table in piece_tables.items():
+            table[square_idx][piece] = piece_values[piece] + piece_table[square_idx]
+            table[square_idx][piece + 6] =\
+                -(piece_values[piece] + piece_table[square_idx ^ 56])
+    return table
+
+
+SQUARE_STATE_TABLE = build_square_state_table(PIECE_VALUES, PIECE_TABLES)
+
+
+# Tapered evaluation uses separate middlegame and endgame values blended by the game phase
+MG_PIECE_VALUES = {1: 82, 2: 337, 3: 365, 4: 477, 5: 1025, 6: 0}
+EG_PIECE_VALUES = {1: 94, 2: 281, 3: 297, 4: 512, 5: 936, 6: 0}
+
+EG_PAWN_TABLE = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    80,  80,  80,  80,  80,  80,  80,  80,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    30,  30,  30,  30,  30,  30,  30,  30,
+    15,  15,  15,  15,  15,  15,  15,  15,
+     5,   5,   5,   5,   5,   5,   5,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+
+EG_KING_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+EG_PIECE_TABLES = PIECE_TABLES | {1: EG_PAWN_TABLE, 6: EG_KING_TABLE}
+
+MG_SQUARE_STATE_TABLE = build_square_state_table(MG_PIECE_VALUES, PIECE_TABLES)
+EG_SQUARE_STATE_TABLE = build_square_state_table(EG_PIECE_VALUES, EG_PIECE_TABLES)
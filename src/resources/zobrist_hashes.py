@@ -1,10 +1,12 @@
 """Generate an importable zobrist hashtable"""
 import random
 
-RAND_RANGE = (2**64) - 1
+# Kept below 2**63 so hash() returns the zobrist value as is, python re-hashes any
+# __hash__ return value that doesn't fit in a signed 64-bit int
+RAND_RANGE = (2**63) - 1
 random.seed(21221)  # Should make the table the same for each import
 
-# For each square on the chessboard, make a random 64-bit number for each state to use as a hash
+# For each square on the chessboard, make a random 63-bit number for each state to use as a hash
 ZOBRIST_TABLE = {idx: {s: random.randrange(RAND_RANGE) for s in range(13)} for idx in range(64)}
 
 # Do the same with castle states, en passant states, and the player turn
@@ -0,0 +1,162 @@
+"""An iterative deepening alpha-beta search over MainEngine.
+Each depth is searched with a negamax alpha-beta and a capture-only quiescence search,
+trying the previous depth's principal variation first and captures before quiet moves.
+The search can be stopped at any node by a threading.Event, a node limit or a time limit,
+in which case the last completed depth is returned."""
+import threading
+import time
+from typing import Callable, NamedTuple
+from src.main_engine import MainEngine, captured_square_state
+from src.strategies import CAPTURE_VALUES
+
+MATE_SCORE = 100000
+# Scores beyond this are mates, MATE_SCORE minus the plies to the mate
+MATE_BOUND = MATE_SCORE - 1000
+INFINITE_SCORE = MATE_SCORE + 1
+MAX_DEPTH = 64
+
+
+class SearchInfo(NamedTuple):
+    """The result of one completed depth, score in centipawns for the side to move"""
+    depth: int
+    score: int
+    nodes: int
+    seconds: float
+    pv: list[tuple]
+
+    @property
+    def nps(self) -> int:
+        """Nodes per second"""
+        return int(self.nodes / self.seconds) if self.seconds > 0 else 0
+
+    @property
+    def mate_in(self) -> int | None:
+        """Moves to mate, negative if the side to move is getting mated, None if no mate"""
+        if abs(self.score) < MATE_BOUND:
+            return None
+        plies = MATE_SCORE - abs(self.score)
+        return (plies + 1) // 2 if self.score > 0 else -(plies // 2)
+
+
+class SearchStopped(Exception):
+    """Raised inside the search when it has to stop"""
+
+
+def order_moves(moves: list[tuple], first_move: tuple=None) -> list[tuple]:
+    """Puts first_move (if legal) ahead of the captures, most valuable victim first, and the
+    captures ahead of the quiet moves"""
+    ordered = sorted(moves, key=lambda move: -CAPTURE_VALUES[captured_square_state(move)])
+    if first_move in moves:
+        ordered.remove(first_move)
+        ordered.insert(0, first_move)
+    return ordered
+
+
+class Search:
+    """Searches the engine's position, the engine must have an evaluate method scoring
+    from white's point of view (e.g. TaperedEngine). The engine is left in the position it
+    was given. info_callback is called with a SearchInfo after every completed depth"""
+    def __init__(self, engine: MainEngine, stop_event: threading.Event=None,
+                 info_callback: Callable[[SearchInfo], None]=None) -> None:
+        self.engine = engine
+        self.stop_event = threading.Event() if stop_event is None else stop_event
+        self.info_callback = info_callback
+        self.nodes = 0
+        self.node_limit = None
+        self.deadline = None
+        self.previous_pv = []
+
+    def _check_stop(self):
+        """Raises SearchStopped when the stop event is set or a limit is reached"""
+        if self.stop_event.is_set()\
+                or (self.node_limit is not None and self.nodes >= self.node_limit)\
+                or (self.deadline is not None and time.perf_counter() >= self.deadline):
+            raise SearchStopped
+
+    def _evaluate(self) -> int:
+        """The static evaluation for the side to move"""
+        if not self.engine.sufficient_material():
+            return 0
+        score = int(self.engine.evaluate())
+        return score if self.engine.state[-1] else -score
+
+    def _quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """Searches captures until the position is quiet, standing pat on the evaluation.
+        Mates and stalemates are still scored as such"""
+        self.nodes += 1
+        self._check_stop()
+        moves = self.engine.get_all_moves()
+        if not moves:
+            return -MATE_SCORE + ply if self.engine.in_check() else 0
+        stand_pat = self._evaluate()
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        for move in order_moves(moves):
+            if not captured_square_state(move):
+                break
+            self.engine.execute_instructions(move)
+            score = -self._quiescence(-beta, -alpha, ply + 1)
+            self.engine.reverse_last_instruction()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int, pv: list) -> int:
+        """Alpha-beta search to depth, filling pv with the principal variation"""
+        if depth == 0:
+            return self._quiescence(alpha, beta, ply)
+        self.nodes += 1
+        self._check_stop()
+        moves = self.engine.get_all_moves()
+        if not moves:
+            return -MATE_SCORE + ply if self.engine.in_check() else 0
+        if not self.engine.sufficient_material():
+            return 0
+
+        pv_move = self.previous_pv[ply] if ply < len(self.previous_pv) else None
+        best_score = -INFINITE_SCORE
+        for move in order_moves(moves, pv_move):
+            child_pv = []
+            self.engine.execute_instructions(move)
+            score = -self._negamax(depth - 1, -beta, -alpha, ply + 1, child_pv)
+            self.engine.reverse_last_instruction()
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+                pv[:] = [move] + child_pv
+                if alpha >= beta:
+                    break
+        return best_score
+
+    def search(self, max_depth: int=MAX_DEPTH, node_limit: int=None,
+               seconds: float=None) -> SearchInfo:
+        """Searches depth 1 to max_depth until stopped, returning the deepest completed
+        depth. If not even depth 1 completes the pv is the first ordered legal move"""
+        self.nodes, self.previous_pv = 0, []
+        self.node_limit = node_limit
+        start_time = time.perf_counter()
+        self.deadline = None if seconds is None else start_time + seconds
+        stack_size = len(self.engine.state_stack)
+
+        moves = order_moves(self.engine.get_all_moves())
+        best = SearchInfo(0, 0, 0, 0.0, moves[:1])
+        for depth in range(1, max_depth + 1):
+            pv = []
+            try:
+                score = self._negamax(depth, -INFINITE_SCORE, INFINITE_SCORE, 0, pv)
+            except SearchStopped:
+                # Unwind the moves the search was in the middle of
+                while len(self.engine.state_stack) > stack_size:
+                    self.engine.reverse_last_instruction()
+                break
+            best = SearchInfo(depth, score, self.nodes, time.perf_counter() - start_time, pv)
+            self.previous_pv = pv
+            if self.info_callback is not None:
+                self.info_callback(best)
+            # No legal moves or a forced mate, deeper searches won't change anything
+            if not pv or abs(score) >= MATE_BOUND:
+                break
+        return best
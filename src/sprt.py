@@ -0,0 +1,286 @@
+"""A sequential probability ratio test (SPRT) between two engine configurations.
+Games are played in pairs from the same random opening with the colors swapped, and the
+pairs are scored with the pentanomial model (each pair scores 0, 0.25, 0.5, 0.75 or 1 for
+the new configuration), which accounts for the correlation between the two games.
+Testing stops as soon as the generalized log-likelihood ratio crosses either bound."""
+import argparse
+import importlib
+import math
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import NamedTuple
+from src.instrumented_engine import group_counters, instrumentation_enabled, instrumented
+from src.main_engine import MainEngine
+from src.strategies import STRATEGIES, make_strategy
+from src.tournament import MAX_PLIES, game_seed, play_game
+
+OPENING_PLIES = 8
+ELO_SCALE = 400.0
+CONFIDENCE_Z = 1.959964  # 95%
+PAIR_SCORES = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+class EngineConfig(NamedTuple):
+    """A strategy name from STRATEGIES played on an engine class given as "module:Class"
+    so it can be imported in the worker processes"""
+    strategy: str
+    engine: str = "src.main_engine:MainEngine"
+
+
+_ENGINE_CLASSES = {}
+
+
+def counting_engine_class(engine_path: str, instrumented_engine: bool=None) -> type:
+    """A subclass of the engine at engine_path whose nodes attribute counts every move
+    generation, the same work a search spends on each node. The engine is instrumented if
+    asked or, when not given, if the environment asks (see src.instrumented_engine)"""
+    if instrumented_engine is None:
+        instrumented_engine = instrumentation_enabled()
+    if (engine_path, instrumented_engine) not in _ENGINE_CLASSES:
+        module_name, class_name = engine_path.split(":")
+        engine_class = getattr(importlib.import_module(module_name), class_name)
+        if instrumented_engine:
+            engine_class = instrumented(engine_class)
+
+        class CountingEngine(engine_class):
+            """Counts move generations in self.nodes"""
+            nodes = 0
+
+            def get_all_moves(self) -> list[tuple]:
+                self.nodes += 1
+                return super().get_all_moves()
+
+            def count_all_moves(self) -> int:
+                self.nodes += 1
+                return super().count_all_moves()
+
+        CountingEngine.__name__ = f"Counting{engine_class.__name__}"
+        _ENGINE_CLASSES[engine_path, instrumented_engine] = CountingEngine
+    return _ENGINE_CLASSES[engine_path, instrumented_engine]
+
+
+def elo_to_score(elo: float) -> float:
+    """The expected score of a player elo points stronger than its opponent"""
+    return 1 / (1 + 10 ** (-elo / ELO_SCALE))
+
+
+def score_to_elo(score: float) -> float:
+    """The elo difference with an expected score, clamped away from 0 and 1"""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -ELO_SCALE * math.log10(1 / score - 1)
+
+
+def random_opening(seed: int, plies: int=OPENING_PLIES) -> list[tuple]:
+    """A random sequence of legal moves from the starting position, redrawn until neither
+    side is left without moves"""
+    rand = random.Random(seed)
+    while True:
+        engine, opening = MainEngine(), []
+        for _ in range(plies):
+            moves = engine.get_all_moves()
+            if not moves:
+                break
+            opening.append(rand.choice(moves))
+            engine.execute_instructions(opening[-1])
+        else:
+            if engine.get_all_moves():
+                return opening
+
+
+def play_timed_game(white: EngineConfig, black: EngineConfig, opening: list[tuple],
+                    seed: int, max_plies: int=MAX_PLIES) -> dict:
+    """Plays one game from the opening with each side moving on its own engine, returns the
+    play_game result plus the nodes and seconds each side spent choosing moves, and the
+    counters of instrumented engines"""
+    sides = {}
+    for is_white, config, side_seed in ((True, white, seed), (False, black, seed + 1)):
+        engine = counting_engine_class(config.engine)()
+        for move in opening:
+            engine.execute_instructions(move)
+        sides[is_white] = {"engine": engine, "strategy": make_strategy(config.strategy, side_seed),
+                           "nodes": 0, "seconds": 0.0}
+
+    class TimedStrategy:
+        """Generates the root moves and chooses with the side to move's strategy on its own
+        engine, and keeps the other side's engine in sync"""
+        def choose_move(self, engine: MainEngine, moves: list[tuple]) -> tuple:
+            side = sides[bool(engine.state[-1])]
+            side_engine = side["engine"]
+            nodes = side_engine.nodes
+            start_time = time.perf_counter()
+            # The root generation is the side's work, it counts as a node and is timed
+            move = side["strategy"].choose_move(side_engine, side_engine.get_all_moves())
+            side["seconds"] += time.perf_counter() - start_time
+            side["nodes"] += side_engine.nodes - nodes
+            if move not in moves:
+                raise ValueError(f"{type(side_engine).__name__} played a move white's engine "
+                                 f"doesn't allow: {move}")
+            for other_side in sides.values():
+                if other_side["engine"] is not engine:
+                    other_side["engine"].execute_instructions(move)
+            return move
+
+    # The game is adjudicated on white's engine, which also applies its moves. Its move
+    # generation for the adjudication isn't timed or counted for either side
+    timed_strategy = TimedStrategy()
+    result = play_game(timed_strategy, timed_strategy, max_plies - len(opening),
+                       engine=sides[True]["engine"])
+    for side, is_white in (("white", True), ("black", False)):
+        result[side] = {"nodes": sides[is_white]["nodes"], "seconds": sides[is_white]["seconds"]}
+        if hasattr(sides[is_white]["engine"], "counters"):
+            result[side]["counters"] = sides[is_white]["engine"].counters
+    return result
+
+
+def play_pair(base: EngineConfig, new: EngineConfig, pair_idx: int, base_seed: int=21221,
+              max_plies: int=MAX_PLIES) -> dict:
+    """Plays both colors from the same opening, scores are from new's point of view"""
+    seed = game_seed(base_seed, pair_idx)
+    opening = random_opening(seed)
+    first = play_timed_game(new, base, opening, seed, max_plies)
+    second = play_timed_game(base, new, opening, seed, max_plies)
+    pair = {"pair": pair_idx, "scores": [first["score"], 1.0 - second["score"]]}
+    for side, games in (("new", (first["white"], second["black"])),
+                        ("base", (first["black"], second["white"]))):
+        pair[side] = {"nodes": sum(game["nodes"] for game in games),
+                      "seconds": sum(game["seconds"] for game in games)}
+        if all("counters" in game for game in games):
+            pair[side]["counters"] = games[0]["counters"] + games[1]["counters"]
+    return pair
+
+
+def _play_pair_args(args: tuple) -> dict:
+    """Unpacks the arguments for play_pair in a worker process"""
+    return play_pair(*args)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple[float, float]:
+    """The lower (accept H0) and upper (accept H1) LLR bounds"""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def pair_score_moments(pair_counts: list[int]) -> tuple[float, float]:
+    """The mean and variance of the pair scores, pair_counts must not be all 0"""
+    n_pairs = sum(pair_counts)
+    mean = sum(score * n for score, n in zip(PAIR_SCORES, pair_counts)) / n_pairs
+    variance = sum(n * (score - mean) ** 2 for score, n in zip(PAIR_SCORES, pair_counts)) / n_pairs
+    return mean, variance
+
+
+def pentanomial_llr(pair_counts: list[int], elo0: float, elo1: float) -> float:
+    """The generalized log-likelihood ratio of H1 (new is elo1 stronger) against H0 (elo0)
+    for counts of pairs scoring 0, 0.25, 0.5, 0.75 and 1"""
+    n_pairs = sum(pair_counts)
+    if not n_pairs:
+        return 0.0
+    mean, variance = pair_score_moments(pair_counts)
+    # If every pair scored the same there is no variance to estimate from yet
+    if variance <= 0:
+        return 0.0
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    return n_pairs * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+
+def elo_estimate(pair_counts: list[int]) -> tuple[float, float]:
+    """The elo difference and the half width of its 95% confidence interval"""
+    n_pairs = sum(pair_counts)
+    if not n_pairs:
+        return 0.0, math.inf
+    mean, variance = pair_score_moments(pair_counts)
+    error = CONFIDENCE_Z * math.sqrt(variance / n_pairs)
+    elo = score_to_elo(mean)
+    return elo, (score_to_elo(mean + error) - score_to_elo(mean - error)) / 2
+
+
+def run_sprt(base: EngineConfig, new: EngineConfig, elo0: float=0.0, elo1: float=10.0,
+             alpha: float=0.05, beta: float=0.05, max_pairs: int=20000, processes: int=None,
+             base_seed: int=21221, max_plies: int=MAX_PLIES) -> dict:
+    """Plays pairs over a pool of processes (in this process if processes is 1) until the
+    LLR crosses a bound or max_pairs have been played. result is "H1" if new is at least
+    elo1 stronger, "H0" if it is at most elo0 stronger and "inconclusive" otherwise"""
+    lower, upper = sprt_bounds(alpha, beta)
+    pair_counts, games = [0] * 5, Counter()
+    nodes = {"base": [0, 0.0], "new": [0, 0.0]}
+    counters = {"base": Counter(), "new": Counter()}
+    llr, verdict = 0.0, "inconclusive"
+    jobs = ((base, new, pair_idx, base_seed, max_plies) for pair_idx in range(max_pairs))
+
+    if processes == 1:
+        pool, finished_pairs = None, map(_play_pair_args, jobs)
+    else:
+        pool = Pool(processes)
+        finished_pairs = pool.imap_unordered(_play_pair_args, jobs)
+    try:
+        for pair in finished_pairs:
+            pair_counts[int(sum(pair["scores"]) * 2)] += 1
+            games.update(pair["scores"])
+            for side in ("base", "new"):
+                nodes[side][0] += pair[side]["nodes"]
+                nodes[side][1] += pair[side]["seconds"]
+                counters[side].update(pair[side].get("counters", {}))
+            llr = pentanomial_llr(pair_counts, elo0, elo1)
+            if llr >= upper or llr <= lower:
+                verdict = "H1" if llr >= upper else "H0"
+                break
+    finally:
+        # Pairs still being played when a bound is crossed are thrown away
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    elo, elo_error = elo_estimate(pair_counts)
+    report = {
+        "result": verdict, "llr": llr, "bounds": (lower, upper),
+        "pairs": sum(pair_counts), "pentanomial": pair_counts,
+        "wins": games[1.0], "draws": games[0.5], "losses": games[0.0],
+        "elo": elo, "elo_error": elo_error,
+        "nodes_per_sec": {side: side_nodes / seconds if seconds else 0.0
+                          for side, (side_nodes, seconds) in nodes.items()},
+    }
+    if any(counters.values()):
+        report["counters"] = {side: group_counters(side_counters)
+                              for side, side_counters in counters.items()}
+    return report
+
+
+def format_report(report: dict) -> str:
+    """A short human readable summary of run_sprt's report"""
+    lower, upper = report["bounds"]
+    return "\n".join([
+        f"Result: {report['result']} after {report['pairs']} pairs "
+        f"(LLR {report['llr']:.2f} in [{lower:.2f}, {upper:.2f}])",
+        f"Games: +{report['wins']} ={report['draws']} -{report['losses']}, "
+        f"pentanomial {report['pentanomial']}",
+        f"Elo: {report['elo']:+.1f} +/- {report['elo_error']:.1f}",
+        f"Nodes/sec: base {report['nodes_per_sec']['base']:,.0f}, "
+        f"new {report['nodes_per_sec']['new']:,.0f}",
+    ])
+
+
+def main():
+    """Command line entry point: python -m src.sprt --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("base_strategy", choices=list(STRATEGIES))
+    parser.add_argument("new_strategy", choices=list(STRATEGIES))
+    parser.add_argument("--base-engine", default=EngineConfig._field_defaults["engine"])
+    parser.add_argument("--new-engine", default=EngineConfig._field_defaults["engine"])
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--max-pairs", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=21221)
+    args = parser.parse_args()
+
+    report = run_sprt(EngineConfig(args.base_strategy, args.base_engine),
+                      EngineConfig(args.new_strategy, args.new_engine),
+                      args.elo0, args.elo1, args.alpha, args.beta, args.max_pairs,
+                      args.processes, args.seed)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Move choosing strategies for MainEngine, starting with the weak players from
+tom7's "Elo World" (http://tom7.org/chess/weak.pdf).
+A strategy gets the engine and the legal moves for its state and returns one of the moves,
+a ScoringStrategy plays the move its score_move scores highest.
+Strategies that look ahead use execute_instructions/reverse_last_instruction on the engine
+and always leave it in the state they were given."""
+import random
+from src.main_engine import MainEngine, instruction_square_changes, captured_square_state
+from src.resources.piece_square_tables import PIECE_VALUES
+
+# The value of capturing a square state, kings are never captured
+CAPTURE_VALUES = [0] + [PIECE_VALUES[piece] for piece in range(1, 7)] * 2
+
+
+def square_distance(square_a: int, square_b: int) -> int:
+    """The number of king moves between two squares"""
+    return max(abs((square_a >> 3) - (square_b >> 3)), abs((square_a & 7) - (square_b & 7)))
+
+
+def is_light_square(square_idx: int) -> bool:
+    """Whether the square is light, a8 (idx 0) being a light square"""
+    return ((square_idx >> 3) + square_idx) % 2 == 0
+
+
+class Strategy:
+    """Base class for strategies"""
+    name = "strategy"
+
+    def __init__(self, rand_seed: int=None) -> None:
+        self.random = random.Random(rand_seed)
+
+    def choose_move(self, engine: MainEngine, moves: list[tuple]) -> tuple:
+        """Picks one of the legal moves for the engine's state. moves must not be empty"""
+        raise NotImplementedError
+
+
+class ScoringStrategy(Strategy):
+    """Base class for strategies playing their highest scoring move, ties between equally
+    good moves are broken at random"""
+    def choose_move(self, engine: MainEngine, moves: list[tuple]) -> tuple:
+        best_score, best_moves = None, []
+        for move in moves:
+            score = self.score_move(engine, move)
+            if best_score is None or score > best_score:
+                best_score, best_moves = score, [move]
+            elif score == best_score:
+                best_moves.append(move)
+        return self.random.choice(best_moves)
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        """Scores a move, higher is better. Scores only need to be comparable"""
+        raise NotImplementedError
+
+
+class RandomMove(Strategy):
+    """Plays a random legal move"""
+    name = "random_move"
+
+    def choose_move(self, engine: MainEngine, moves: list[tuple]) -> tuple:
+        return self.random.choice(moves)
+
+
+class SameColor(ScoringStrategy):
+    """Keeps as many pieces as possible on squares of its own color,
+    light squares for white and dark squares for black"""
+    name = "same_color"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        white = engine.state[-1]
+        score = 0
+        for square_idx, old_state, new_state in instruction_square_changes(move):
+            own_color = is_light_square(square_idx) == white
+            if old_state and (old_state < 7) == white and own_color:
+                score -= 1
+            if new_state and (new_state < 7) == white and own_color:
+                score += 1
+        return score
+
+
+class Swarm(ScoringStrategy):
+    """Moves its pieces as close to the opponent's king as possible"""
+    name = "swarm"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        white = engine.state[-1]
+        enemy_king = engine.state[64 if white else 65]
+        score = 0
+        for square_idx, old_state, new_state in instruction_square_changes(move):
+            if old_state and (old_state < 7) == white:
+                score += square_distance(square_idx, enemy_king)
+            if new_state and (new_state < 7) == white:
+                score -= square_distance(square_idx, enemy_king)
+        return score
+
+
+class SuicideKing(ScoringStrategy):
+    """Moves its king as close to the opponent's king as possible"""
+    name = "suicide_king"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        white = engine.state[-1]
+        own_king, enemy_king = (65, 64) if white else (64, 65)
+        king_square = move[2] if move[0] == engine.state[own_king] else engine.state[own_king]
+        return -square_distance(king_square, engine.state[enemy_king])
+
+
+class MinOpptMoves(ScoringStrategy):
+    """Plays the move that leaves the opponent with the fewest legal moves"""
+    name = "min_oppt_moves"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        engine.execute_instructions(move)
+        opponent_moves = engine.count_all_moves()
+        engine.reverse_last_instruction()
+        return -opponent_moves
+
+
+class Generous(ScoringStrategy):
+    """Plays the move that gives the opponent the most valuable captures"""
+    name = "generous"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        engine.execute_instructions(move)
+        score = sum(CAPTURE_VALUES[captured_square_state(reply)]
+                    for reply in engine.get_all_moves())
+        engine.reverse_last_instruction()
+        return score
+
+
+class CCCP(ScoringStrategy):
+    """Checkmate, check, capture (the most valuable piece), push (the furthest)"""
+    name = "cccp"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        # Promotions land the new piece with the second half of the instruction set
+        to_idx = move[10] if len(move) > 8 and move[0] == move[2] else move[2]
+        pushed_rows = (move[0] >> 3) - (to_idx >> 3)
+        if not engine.state[-1]:
+            pushed_rows = -pushed_rows
+        engine.execute_instructions(move)
+        check = engine.in_check()
+        checkmate = check and engine.count_all_moves() == 0
+        engine.reverse_last_instruction()
+        return (checkmate, check, CAPTURE_VALUES[captured_square_state(move)], pushed_rows)
+
+
+class Pacifist(ScoringStrategy):
+    """Avoids checkmating, checking and capturing, in that order"""
+    name = "pacifist"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        engine.execute_instructions(move)
+        check = engine.in_check()
+        checkmate = check and engine.count_all_moves() == 0
+        engine.reverse_last_instruction()
+        return (not checkmate, not check, -CAPTURE_VALUES[captured_square_state(move)])
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (
+    RandomMove, SameColor, Swarm, Generous, CCCP, SuicideKing, MinOpptMoves, Pacifist)}
+
+
+def make_strategy(name: str, rand_seed: int=None) -> Strategy:
+    """Instantiates the strategy registered under name"""
+    return STRATEGIES[name](rand_seed)
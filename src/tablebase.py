@@ -0,0 +1,510 @@
+"""Endgame tablebases for 3 and 4 piece material (KQK, KRK, KPK, KRKP...) built by
+retrograde analysis and probed through memory maps.
+Each material is named strong side first ("KRKP": white king and rook against the black king
+and pawn) and stored in its own file of one int8 per position: the distance to mate in plies
+for the side to move, 0 for a draw, d > 0 to win in d plies and -(d + 1) to lose in d plies,
+so -1 is checkmated. Positions that can't occur hold ILLEGAL.
+Positions are indexed by the white king's square, reduced by the board's symmetries (8 without
+pawns, the left-right mirror with pawns), the squares of the other pieces and the side to move.
+Castling, en passant and the fifty move rule are ignored."""
+import argparse
+import os
+import struct
+import time
+from array import array
+import numpy as np
+from src.resources.move_dict import KING_MOVES, KNIGHT_MOVES, BISHOP_MOVES, ROOK_MOVES,\
+    QUEEN_MOVES
+
+TABLE_MAGIC = b"PYCHTB\x00\x00"
+TABLE_VERSION = 1
+HEADER_FORMAT = "<8sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TABLE_SUFFIX = ".tb"
+MAX_PIECES = 4
+ILLEGAL = -128
+DRAW = 0
+MAX_DTM_PLIES = 126
+PIECE_STATES = {"K": 6, "Q": 5, "R": 4, "B": 3, "N": 2, "P": 1}
+PIECE_LETTERS = [""] + list("PNBRQK") * 2
+# Non-king pieces are written in this order on each side
+SIDE_ORDER = "QRBNP"
+LETTER_VALUES = {"Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
+# Neither side can ever mate
+DEAD_MATERIALS = {"KK", "KBK", "KNK"}
+PROMOTION_PIECES = (5, 4, 3, 2)
+SLIDER_MOVES = {3: BISHOP_MOVES, 4: ROOK_MOVES, 5: QUEEN_MOVES}
+JUMP_MOVES = {2: KNIGHT_MOVES, 6: KING_MOVES}
+
+# The 8 symmetries of the board as square permutations, the identity first
+IDENTITY = list(range(64))
+FLIP_FILES = [square_idx ^ 7 for square_idx in range(64)]
+FLIP_ROWS = [square_idx ^ 56 for square_idx in range(64)]
+TRANSPOSE = [((square_idx & 7) << 3) | (square_idx >> 3) for square_idx in range(64)]
+
+
+def _compose(first: list[int], second: list[int]) -> list[int]:
+    """The permutation applying first and then second"""
+    return [second[first[square_idx]] for square_idx in range(64)]
+
+
+_FLIPS = [IDENTITY, FLIP_FILES, FLIP_ROWS, _compose(FLIP_FILES, FLIP_ROWS)]
+SYMMETRIES = _FLIPS + [_compose(flip, TRANSPOSE) for flip in _FLIPS]
+# The white king's squares in the a1-d1-d4 triangle (rows count down from rank 8)
+TRIANGLE_SQUARES = [square_idx for square_idx in range(64)
+                    if square_idx & 7 < 4 and square_idx >> 3 >= 4
+                    and square_idx & 7 >= 7 - (square_idx >> 3)]
+LEFT_HALF_SQUARES = [square_idx for square_idx in range(64) if square_idx & 7 < 4]
+
+
+def win_value(plies: int) -> int:
+    """The table value of a win in plies"""
+    return plies
+
+
+def loss_value(plies: int) -> int:
+    """The table value of a loss in plies"""
+    return -(plies + 1)
+
+
+def decode_value(value: int) -> tuple[int, int | None]:
+    """(1 win, 0 draw or -1 loss for the side to move, plies to mate or None for a draw)"""
+    if value == DRAW:
+        return 0, None
+    if value > 0:
+        return 1, value
+    return -1, -value - 1
+
+
+def _side_key(side: str) -> tuple:
+    """Orders sides by material so the stronger side is written first"""
+    return (sum(LETTER_VALUES[letter] for letter in side[1:]), len(side),
+            [-SIDE_ORDER.index(letter) for letter in side[1:]])
+
+
+def _side_string(letters) -> str:
+    """A king and the pieces in SIDE_ORDER"""
+    return "K" + "".join(sorted(letters, key=SIDE_ORDER.index))
+
+
+def split_material(material: str) -> tuple[str, str]:
+    """Splits "KRKP" into ("KR", "KP")"""
+    second_king = material.index("K", 1)
+    return material[:second_king], material[second_king:]
+
+
+def canonical_material(material: str) -> str:
+    """The table name of a material with the stronger side first, e.g. "KPKR" -> "KRKP" """
+    white_side, black_side = (_side_string(side[1:]) for side in split_material(material))
+    if _side_key(white_side) < _side_key(black_side):
+        white_side, black_side = black_side, white_side
+    return white_side + black_side
+
+
+def sub_materials(material: str) -> set[str]:
+    """The materials a capture or a promotion leads to"""
+    white_side, black_side = split_material(material)
+    results = set()
+    for side_idx, side in enumerate((white_side, black_side)):
+        for letter_idx in range(1, len(side)):
+            others = side[:letter_idx] + side[letter_idx + 1:]
+            replacements = [""] + (["Q", "R", "B", "N"] if side[letter_idx] == "P" else [])
+            for replacement in replacements:
+                new_side = others + replacement
+                sides = (new_side, black_side) if side_idx == 0 else (white_side, new_side)
+                results.add(canonical_material(sides[0] + sides[1]))
+    return results
+
+
+def _empty_board_attacks() -> tuple[list, list]:
+    """The squares each square state attacks from each square on an empty board and the
+    squares between every pair of squares on a line"""
+    attacks = [[frozenset()] * 64 for _ in range(13)]
+    between = [[()] * 64 for _ in range(64)]
+    for square_idx in range(64):
+        file_idx = square_idx & 7
+        # White pawns capture towards row 0, black pawns towards row 7
+        for pawn_state, step in ((1, -8), (7, 8)):
+            attacks[pawn_state][square_idx] = frozenset(
+                square_idx + step + side
+                for side, file_ok in ((-1, file_idx > 0), (1, file_idx < 7))
+                if file_ok and 0 <= square_idx + step + side < 64)
+        for piece_type, targets in ((2, KNIGHT_MOVES[square_idx]), (6, KING_MOVES[square_idx]),
+                                    (3, sum(BISHOP_MOVES[square_idx], [])),
+                                    (4, sum(ROOK_MOVES[square_idx], [])),
+                                    (5, sum(QUEEN_MOVES[square_idx], []))):
+            attacks[piece_type][square_idx] = frozenset(targets)
+            attacks[piece_type + 6][square_idx] = attacks[piece_type][square_idx]
+        for direction in QUEEN_MOVES[square_idx]:
+            for distance, target_idx in enumerate(direction):
+                between[square_idx][target_idx] = tuple(direction[:distance])
+    return attacks, between
+
+
+PIECE_ATTACKS, SQUARES_BETWEEN = _empty_board_attacks()
+
+
+def square_attacked(board: list[int], pieces: list[int], squares: list[int], square_idx: int,
+                    by_white: bool) -> bool:
+    """Whether a piece of the given color attacks the square. pieces and squares list the
+    square states and squares of the pieces, a piece that isn't on its square in board (it
+    has been captured) is skipped"""
+    for piece_state, from_idx in zip(pieces, squares):
+        if (piece_state < 7) == by_white and board[from_idx] == piece_state\
+                and square_idx in PIECE_ATTACKS[piece_state][from_idx]\
+                and not any(board[between_idx]
+                            for between_idx in SQUARES_BETWEEN[from_idx][square_idx]):
+            return True
+    return False
+
+
+def _piece_targets(board: list[int], square_idx: int, piece_state: int) -> list[int]:
+    """The squares a non-pawn piece reaches: empty squares and any piece it runs into
+    (the caller sorts out captures), rays stop at the first piece"""
+    piece_type = piece_state - 6 if piece_state > 6 else piece_state
+    if piece_type in JUMP_MOVES:
+        return JUMP_MOVES[piece_type][square_idx]
+    targets = []
+    for direction in SLIDER_MOVES[piece_type][square_idx]:
+        for target_idx in direction:
+            targets.append(target_idx)
+            if board[target_idx]:
+                break
+    return targets
+
+
+class TableLayout:
+    """Maps the positions of a material to table indices and back. pieces holds the square
+    states in index order: white king, black king, white pieces, black pieces"""
+    def __init__(self, material: str) -> None:
+        self.material = canonical_material(material)
+        white_side, black_side = split_material(self.material)
+        self.pieces = [6, 12] + [PIECE_STATES[letter] for letter in white_side[1:]]\
+            + [PIECE_STATES[letter] + 6 for letter in black_side[1:]]
+        self.has_pawns = 1 in self.pieces or 7 in self.pieces
+        if self.has_pawns:
+            self.king_squares, symmetries = LEFT_HALF_SQUARES, [IDENTITY, FLIP_FILES]
+        else:
+            self.king_squares, symmetries = TRIANGLE_SQUARES, SYMMETRIES
+        self.king_slots = {square_idx: slot for slot, square_idx in enumerate(self.king_squares)}
+        # The symmetries taking each white king square to a king square of the table
+        self.king_symmetries = [[symmetry for symmetry in symmetries
+                                 if symmetry[square_idx] in self.king_slots]
+                                for square_idx in range(64)]
+        # Identical pieces are indexed with their squares sorted
+        self.identical_groups = []
+        for start in range(2, len(self.pieces)):
+            end = start + self.pieces[start:].count(self.pieces[start])
+            if end - start > 1 and self.pieces[start - 1] != self.pieces[start]:
+                self.identical_groups.append((start, end))
+        self.n_positions = len(self.king_squares) * 64 ** (len(self.pieces) - 1) * 2
+
+    def index(self, squares: list[int], white_to_move: bool) -> int:
+        """The index of a position, the same for every symmetric copy of it"""
+        best_index = None
+        for symmetry in self.king_symmetries[squares[0]]:
+            mapped = [symmetry[square_idx] for square_idx in squares]
+            for start, end in self.identical_groups:
+                mapped[start:end] = sorted(mapped[start:end])
+            index = self.king_slots[mapped[0]]
+            for square_idx in mapped[1:]:
+                index = (index << 6) | square_idx
+            index = (index << 1) | (not white_to_move)
+            if best_index is None or index < best_index:
+                best_index = index
+        return best_index
+
+    def decode(self, index: int) -> tuple[list[int], bool]:
+        """The (squares, white_to_move) of an index"""
+        white_to_move = not index & 1
+        index >>= 1
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.king_squares[index])
+        squares.reverse()
+        return squares, white_to_move
+
+    def ordered_squares(self, pieces: list[tuple[int, int]]) -> list[int]:
+        """The squares of (square_state, square_idx) pieces in index order"""
+        remaining = list(pieces)
+        squares = []
+        for piece_state in self.pieces:
+            piece_idx = next(idx for idx, piece in enumerate(remaining) if piece[0] == piece_state)
+            squares.append(remaining.pop(piece_idx)[1])
+        return squares
+
+
+def table_path(directory: str, material: str) -> str:
+    """The file of a material's table"""
+    return os.path.join(directory, canonical_material(material) + TABLE_SUFFIX)
+
+
+class Tablebase:
+    """Probes the tables in a directory, each table is memory-mapped the first time it is used"""
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.layouts = {}
+        self.tables = {}
+
+    def table(self, material: str) -> np.ndarray | None:
+        """The memory-mapped values of a material, None if it hasn't been built"""
+        if material not in self.tables:
+            path = table_path(self.directory, material)
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as table_file:
+                magic, version, n_positions = struct.unpack(HEADER_FORMAT,
+                                                            table_file.read(HEADER_SIZE))
+            if magic != TABLE_MAGIC or version != TABLE_VERSION:
+                raise ValueError(f"{path} is not a version {TABLE_VERSION} tablebase")
+            self.layouts[material] = TableLayout(material)
+            self.tables[material] = np.memmap(path, dtype=np.int8, mode="r",
+                                              offset=HEADER_SIZE, shape=(n_positions,))
+        return self.tables[material]
+
+    def probe_pieces(self, pieces: list[tuple[int, int]], white_to_move: bool) -> int | None:
+        """The table value of a position given as (square_state, square_idx) pieces,
+        None if its table isn't built. Positions are color flipped to the table's material"""
+        white_side = _side_string(PIECE_LETTERS[state] for state, _ in pieces if state < 6)
+        black_side = _side_string(PIECE_LETTERS[state] for state, _ in pieces if 6 < state < 12)
+        if _side_key(white_side) < _side_key(black_side):
+            pieces = [(state + 6 if state < 7 else state - 6, square_idx ^ 56)
+                      for state, square_idx in pieces]
+            white_to_move = not white_to_move
+            white_side, black_side = black_side, white_side
+        material = white_side + black_side
+        if material in DEAD_MATERIALS:
+            return DRAW
+        table = self.table(material)
+        if table is None:
+            return None
+        layout = self.layouts[material]
+        return int(table[layout.index(layout.ordered_squares(pieces), white_to_move)])
+
+    def probe(self, state: list) -> tuple[int, int | None] | None:
+        """(win/draw/loss, plies to mate) for the side to move of an engine state (see
+        decode_value), None if there are too many pieces or the table isn't built"""
+        pieces = [(square_state, square_idx)
+                  for square_idx, square_state in enumerate(state[:64]) if square_state]
+        if len(pieces) > MAX_PIECES:
+            return None
+        value = self.probe_pieces(pieces, bool(state[68]))
+        if value is None or value == ILLEGAL:
+            return None
+        return decode_value(value)
+
+    def white_score(self, state: list) -> float | None:
+        """The game's result for white (1, 0.5 or 0) with perfect play, for adjudication"""
+        probe_result = self.probe(state)
+        if probe_result is None:
+            return None
+        side_score = (probe_result[0] + 1) / 2
+        return side_score if state[68] else 1 - side_score
+
+
+def _legal_moves(board: list[int], pieces: list[int], squares: list[int],
+                 white_to_move: bool) -> list[tuple[int, int, int]]:
+    """The (piece_idx, target_idx, promotion_state) legal moves of the side to move,
+    promotion_state is 0 if the move doesn't promote"""
+    own_king = squares[0] if white_to_move else squares[1]
+    moves = []
+    for piece_idx, piece_state in enumerate(pieces):
+        if (piece_state < 7) != white_to_move:
+            continue
+        from_idx = squares[piece_idx]
+        targets = []
+        if piece_state in (1, 7):
+            step, start_row, last_row = (-8, 6, 0) if piece_state == 1 else (8, 1, 7)
+            if not board[from_idx + step]:
+                targets.append(from_idx + step)
+                if from_idx >> 3 == start_row and not board[from_idx + 2 * step]:
+                    targets.append(from_idx + 2 * step)
+            for capture_step, file_ok in ((step - 1, from_idx & 7 > 0),
+                                          (step + 1, from_idx & 7 < 7)):
+                target_state = board[from_idx + capture_step] if file_ok else 0
+                if target_state and (target_state < 7) != white_to_move:
+                    targets.append(from_idx + capture_step)
+            promotions = [(target_idx, promotion_state + (0 if white_to_move else 6))
+                          for target_idx in targets if target_idx >> 3 == last_row
+                          for promotion_state in PROMOTION_PIECES]
+            targets = [(target_idx, 0) for target_idx in targets
+                       if target_idx >> 3 != last_row] + promotions
+        else:
+            targets = [(target_idx, 0)
+                       for target_idx in _piece_targets(board, from_idx, piece_state)
+                       if not board[target_idx] or (board[target_idx] < 7) != white_to_move]
+
+        for target_idx, promotion_state in targets:
+            if board[target_idx] in (6, 12):
+                continue
+            captured_state = board[target_idx]
+            board[from_idx] = 0
+            board[target_idx] = promotion_state or piece_state
+            king_idx = target_idx if from_idx == own_king else own_king
+            if not square_attacked(board, pieces, squares, king_idx, not white_to_move):
+                moves.append((piece_idx, target_idx, promotion_state))
+            board[target_idx] = captured_state
+            board[from_idx] = piece_state
+    return moves
+
+
+def _predecessors(layout: TableLayout, board: list[int], squares: list[int],
+                  white_to_move: bool) -> set[int]:
+    """The indices of the positions one quiet move (no capture or promotion) before this one"""
+    mover_white = not white_to_move
+    waiting_king = squares[0] if white_to_move else squares[1]
+    indices = set()
+    for piece_idx, piece_state in enumerate(layout.pieces):
+        if (piece_state < 7) != mover_white:
+            continue
+        to_idx = squares[piece_idx]
+        if piece_state in (1, 7):
+            # Pawns are walked back, never onto their first row
+            step = 8 if piece_state == 1 else -8
+            origins = []
+            back_idx = to_idx + step
+            if 8 <= back_idx < 56 and not board[back_idx]:
+                origins.append(back_idx)
+                double_row = 4 if piece_state == 1 else 3
+                if to_idx >> 3 == double_row and not board[back_idx + step]:
+                    origins.append(back_idx + step)
+        else:
+            origins = [origin_idx for origin_idx in _piece_targets(board, to_idx, piece_state)
+                       if not board[origin_idx]]
+
+        board[to_idx] = 0
+        for origin_idx in origins:
+            board[origin_idx] = piece_state
+            origin_squares = list(squares)
+            origin_squares[piece_idx] = origin_idx
+            # The player who is to move now can't have been left in check
+            if not square_attacked(board, layout.pieces, origin_squares, waiting_king,
+                                   mover_white):
+                indices.add(layout.index(origin_squares, mover_white))
+            board[origin_idx] = 0
+        board[to_idx] = piece_state
+    return indices
+
+
+def build_table(directory: str, material: str, verbose: bool=False) -> str:
+    """Builds the table of a material and every table its captures and promotions lead to
+    that isn't built yet, returns the table's path"""
+    material = canonical_material(material)
+    if len(material) > MAX_PIECES:
+        raise ValueError(f"Tables go up to {MAX_PIECES} pieces: {material}")
+    os.makedirs(directory, exist_ok=True)
+    for sub_material in sub_materials(material):
+        if sub_material not in DEAD_MATERIALS and not os.path.exists(
+                table_path(directory, sub_material)):
+            build_table(directory, sub_material, verbose)
+
+    start_time = time.perf_counter()
+    layout, tablebase = TableLayout(material), Tablebase(directory)
+    pieces, n_pieces = layout.pieces, len(layout.pieces)
+    values = array("b", [ILLEGAL]) * layout.n_positions
+    resolved = bytearray(layout.n_positions)
+    # Children left before a position is known to be lost
+    n_children = array("H", [0]) * layout.n_positions
+    # Positions resolved at each distance and the capture or promotion results at each
+    # distance as (index, whether the child's side to move wins)
+    resolved_at = [[] for _ in range(MAX_DTM_PLIES + 2)]
+    results_at = [[] for _ in range(MAX_DTM_PLIES + 2)]
+
+    for index in range(layout.n_positions):
+        squares, white_to_move = layout.decode(index)
+        if len(set(squares)) < n_pieces or layout.index(squares, white_to_move) != index\
+                or any(piece_state in (1, 7) and squares[piece_idx] >> 3 in (0, 7)
+                       for piece_idx, piece_state in enumerate(pieces)):
+            continue
+        board = [0] * 64
+        for piece_state, square_idx in zip(pieces, squares):
+            board[square_idx] = piece_state
+        if square_attacked(board, pieces, squares, squares[1] if white_to_move else squares[0],
+                           white_to_move):
+            continue
+
+        moves = _legal_moves(board, pieces, squares, white_to_move)
+        if not moves:
+            in_check = square_attacked(board, pieces, squares,
+                                       squares[0] if white_to_move else squares[1],
+                                       not white_to_move)
+            values[index], resolved[index] = (loss_value(0) if in_check else DRAW), 1
+            if in_check:
+                resolved_at[0].append(index)
+            continue
+
+        values[index] = DRAW
+        quiet_children, n_results = set(), 0
+        for piece_idx, target_idx, promotion_state in moves:
+            if not promotion_state and not board[target_idx]:
+                child_squares = list(squares)
+                child_squares[piece_idx] = target_idx
+                quiet_children.add(layout.index(child_squares, not white_to_move))
+                continue
+            child_pieces = [(promotion_state or piece_state if idx == piece_idx else piece_state,
+                             target_idx if idx == piece_idx else square_idx)
+                            for idx, (piece_state, square_idx) in enumerate(zip(pieces, squares))
+                            if square_idx != target_idx or idx == piece_idx]
+            child_value = tablebase.probe_pieces(child_pieces, not white_to_move)
+            n_results += 1
+            if child_value > 0:
+                results_at[child_value].append((index, True))
+            elif child_value < 0:
+                results_at[-child_value - 1].append((index, False))
+        n_children[index] = len(quiet_children) + n_results
+
+    def child_resolved(parent: int, child_wins: bool, plies: int):
+        """Updates a parent with a child that is won or lost in plies"""
+        if resolved[parent]:
+            return
+        if not child_wins:
+            values[parent] = win_value(plies + 1)
+        else:
+            n_children[parent] -= 1
+            if n_children[parent]:
+                return
+            values[parent] = loss_value(plies + 1)
+        if plies + 1 > MAX_DTM_PLIES:
+            raise ValueError(f"{material} has mates longer than {MAX_DTM_PLIES} plies")
+        resolved[parent] = 1
+        resolved_at[plies + 1].append(parent)
+
+    for plies in range(MAX_DTM_PLIES + 1):
+        for parent, child_wins in results_at[plies]:
+            child_resolved(parent, child_wins, plies)
+        for index in resolved_at[plies]:
+            squares, white_to_move = layout.decode(index)
+            board = [0] * 64
+            for piece_state, square_idx in zip(pieces, squares):
+                board[square_idx] = piece_state
+            for parent in _predecessors(layout, board, squares, white_to_move):
+                child_resolved(parent, values[index] > 0, plies)
+
+    path = table_path(directory, material)
+    with open(path + ".tmp", "wb") as table_file:
+        table_file.write(struct.pack(HEADER_FORMAT, TABLE_MAGIC, TABLE_VERSION,
+                                     layout.n_positions))
+        table_file.write(values.tobytes())
+    os.replace(path + ".tmp", path)
+    if verbose:
+        longest = max((plies for plies in range(MAX_DTM_PLIES + 2) if resolved_at[plies]),
+                      default=0)
+        print(f"Built {material}: {layout.n_positions:,} positions, longest mate {longest} "
+              f"plies in {time.perf_counter() - start_time:.1f}s")
+    return path
+
+
+def main():
+    """Command line entry point: python -m src.tablebase --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", help="Directory the tables are written to")
+    parser.add_argument("materials", nargs="+", help="Materials to build, e.g. KQK KRKP")
+    args = parser.parse_args()
+    for material in args.materials:
+        build_table(args.directory, material, verbose=True)
+
+
+if __name__ == "__main__":
+    main()
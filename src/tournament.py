@@ -0,0 +1,188 @@
+"""Round-robin self-play tournaments between strategies played on MainEngine.
+Games are spread over a process pool and their results are streamed to a JSON lines file
+as they finish, one object per game."""
+import argparse
+import json
+import time
+from collections import Counter, defaultdict
+from itertools import combinations
+from multiprocessing import Pool
+from typing import Iterable
+from src.instrumented_engine import make_engine
+from src.main_engine import MainEngine, PAWN_STATES, captured_square_state
+from src.strategies import STRATEGIES, Strategy, make_strategy
+
+MAX_PLIES = 400
+FIFTY_MOVE_PLIES = 100
+RESULT_STRINGS = {1.0: "1-0", 0.5: "1/2-1/2", 0.0: "0-1"}
+
+
+def game_seed(base_seed: int, game_idx: int) -> int:
+    """A reproducible seed for every game of a tournament"""
+    return base_seed * 1_000_003 + game_idx
+
+
+def play_game(white: Strategy, black: Strategy, max_plies: int=MAX_PLIES,
+              engine: MainEngine=None) -> dict:
+    """Plays a game between two strategies from the engine's state (the starting position
+    by default) and adjudicates draws by threefold repetition, the fifty-move rule and
+    insufficient material. score is 1.0 for a white win, 0.5 for a draw and 0.0 for a loss"""
+    engine = make_engine() if engine is None else engine
+    players = {True: white, False: black}
+    repetitions = Counter({hash(engine): 1})
+    halfmove_clock = 0
+    score, termination = 0.5, "max_plies"
+
+    for ply in range(max_plies + 1):
+        moves = engine.get_all_moves()
+        if not moves:
+            if engine.in_check():
+                score, termination = (0.0 if engine.state[-1] else 1.0), "checkmate"
+            else:
+                termination = "stalemate"
+            break
+        # Checked after mate and stalemate so a game can end on its last allowed ply
+        if ply == max_plies:
+            break
+
+        move = players[bool(engine.state[-1])].choose_move(engine, moves)
+        engine.execute_instructions(move)
+
+        # Pawn moves and captures restart the fifty-move count
+        if move[1] in PAWN_STATES or captured_square_state(move):
+            halfmove_clock = 0
+        else:
+            halfmove_clock += 1
+
+        repetitions[hash(engine)] += 1
+        if repetitions[hash(engine)] >= 3:
+            termination = "repetition"
+        elif halfmove_clock >= FIFTY_MOVE_PLIES:
+            termination = "fifty_move"
+        elif not engine.sufficient_material():
+            termination = "insufficient_material"
+        else:
+            continue
+        ply += 1
+        break
+
+    return {"score": score, "result": RESULT_STRINGS[score],
+            "termination": termination, "plies": ply}
+
+
+def schedule_round_robin(strategy_names: list[str], games_per_pair: int,
+                         base_seed: int=21221) -> list[tuple[str, str, int]]:
+    """Lists (white, black, seed) for every game, each pair swapping colors every game"""
+    schedule = []
+    for name_a, name_b in combinations(strategy_names, 2):
+        for pair_game in range(games_per_pair):
+            white, black = (name_a, name_b) if pair_game % 2 == 0 else (name_b, name_a)
+            schedule.append((white, black, game_seed(base_seed, len(schedule))))
+    return schedule
+
+
+def play_scheduled_game(scheduled_game: tuple[str, str, int], max_plies: int=MAX_PLIES) -> dict:
+    """Plays one (white, black, seed) game of a schedule, used by the worker processes.
+    The counters of an instrumented engine are added to the result"""
+    white, black, seed = scheduled_game
+    engine = make_engine()
+    start_time = time.perf_counter()
+    result = play_game(make_strategy(white, seed), make_strategy(black, seed + 1), max_plies,
+                       engine)
+    result = {"white": white, "black": black, "seed": seed,
+              "seconds": time.perf_counter() - start_time} | result
+    if hasattr(engine, "report"):
+        result["counters"] = engine.report()
+    return result
+
+
+def _play_scheduled_game_args(args: tuple) -> dict:
+    """Unpacks the arguments for play_scheduled_game in a worker process"""
+    return play_scheduled_game(*args)
+
+
+def run_tournament(strategy_names: list[str], games_per_pair: int, output_path: str,
+                   processes: int=None, base_seed: int=21221,
+                   max_plies: int=MAX_PLIES) -> dict[str, dict]:
+    """Plays a round robin over a pool of processes (in this process if processes is 1),
+    appending each result to output_path as a JSON line as soon as the game finishes.
+    Returns the standings from aggregate_results"""
+    jobs = [(game, max_plies) for game in
+            schedule_round_robin(strategy_names, games_per_pair, base_seed)]
+    results = []
+    with open(output_path, "a", encoding="utf-8") as output_file:
+        if processes == 1:
+            finished_games = map(_play_scheduled_game_args, jobs)
+            pool = None
+        else:
+            pool = Pool(processes)
+            finished_games = pool.imap_unordered(_play_scheduled_game_args, jobs, chunksize=4)
+        try:
+            for result in finished_games:
+                output_file.write(json.dumps(result) + "\n")
+                output_file.flush()
+                results.append(result)
+        finally:
+            # Every game has finished unless one raised, then the others are thrown away
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+    return aggregate_results(results)
+
+
+def read_results(path: str) -> Iterable[dict]:
+    """Streams the game results from a JSON lines file"""
+    with open(path, encoding="utf-8") as results_file:
+        for line in results_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def aggregate_results(results: Iterable[dict]) -> dict[str, dict]:
+    """Totals wins, draws, losses, score and terminations for every strategy"""
+    standings = defaultdict(lambda: {"games": 0, "wins": 0, "draws": 0, "losses": 0,
+                                     "score": 0.0, "terminations": Counter()})
+    for result in results:
+        for name, score in ((result["white"], result["score"]),
+                            (result["black"], 1.0 - result["score"])):
+            entry = standings[name]
+            entry["games"] += 1
+            entry["score"] += score
+            entry["wins" if score == 1.0 else "draws" if score == 0.5 else "losses"] += 1
+            entry["terminations"][result["termination"]] += 1
+    return dict(standings)
+
+
+def format_standings(standings: dict[str, dict]) -> str:
+    """A table of the standings, best score percentage first"""
+    lines = [f"{'strategy':<16}{'games':>7}{'wins':>7}{'draws':>7}{'losses':>8}{'score %':>9}"]
+    for name, entry in sorted(standings.items(),
+                              key=lambda item: -item[1]["score"] / item[1]["games"]):
+        lines.append(f"{name:<16}{entry['games']:>7}{entry['wins']:>7}{entry['draws']:>7}"
+                     f"{entry['losses']:>8}{100 * entry['score'] / entry['games']:>9.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    """Command line entry point: python -m src.tournament --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES),
+                        choices=list(STRATEGIES))
+    parser.add_argument("--games-per-pair", type=int, default=10)
+    parser.add_argument("--output", default="tournament_results.jsonl")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=21221)
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    standings = run_tournament(args.strategies, args.games_per_pair, args.output,
+                               args.processes, args.seed, args.max_plies)
+    run_time = time.perf_counter() - start_time
+    n_games = sum(entry["games"] for entry in standings.values()) // 2
+    print(format_standings(standings))
+    print(f"Played {n_games} games in {run_time:.1f}s ({3600 * n_games / run_time:,.0f} games/hour)")
+
+
+if __name__ == "__main__":
+    main()
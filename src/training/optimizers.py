@@ -0,0 +1,25 @@
+"""Gradient descent optimizers for NumPy parameter arrays"""
+import numpy as np
+
+
+class Adam:
+    """Adam (Kingma & Ba) updating a parameter array in place"""
+    def __init__(self, params: np.ndarray, learning_rate: float=1.0, beta1: float=0.9,
+                 beta2: float=0.999, epsilon: float=1e-8) -> None:
+        self.params = params
+        self.learning_rate = learning_rate
+        self.beta1, self.beta2, self.epsilon = beta1, beta2, epsilon
+        self.first_moment = np.zeros_like(params, dtype=np.float64)
+        self.second_moment = np.zeros_like(params, dtype=np.float64)
+        self.steps = 0
+
+    def step(self, gradient: np.ndarray):
+        """Moves the parameters against the gradient"""
+        self.steps += 1
+        self.first_moment *= self.beta1
+        self.first_moment += (1 - self.beta1) * gradient
+        self.second_moment *= self.beta2
+        self.second_moment += (1 - self.beta2) * gradient ** 2
+        first_unbiased = self.first_moment / (1 - self.beta1 ** self.steps)
+        second_unbiased = self.second_moment / (1 - self.beta2 ** self.steps)
+        self.params -= self.learning_rate * first_unbiased / (np.sqrt(second_unbiased) + self.epsilon)
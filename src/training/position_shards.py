@@ -0,0 +1,178 @@
+"""A compact fixed-width record format for storing positions, written to append-only shard
+files and read back through memory maps.
+A record is 48 bytes: the Zobrist key, the 64 square states packed two per byte (the even
+square in the low 4 bits), the eval, the castle state, the en passant file, the turn and the
+result from white's point of view (2 win, 1 draw, 0 loss, -1 unknown).
+Each shard starts with a 16 byte header: SHARD_MAGIC, the format version and the record size."""
+import os
+import struct
+import numpy as np
+from src.evaluation.batch_evaluator import STATE_LENGTH, pack_states
+
+POSITION_DTYPE = np.dtype([
+    ("key", "<u8"),
+    ("squares", np.uint8, 32),
+    ("eval", "<f4"),
+    ("castle", np.uint8),
+    ("en_passant", np.int8),
+    ("turn", np.uint8),
+    ("result", np.int8),
+])
+SHARD_MAGIC = b"PYCHPOS\x00"
+SHARD_VERSION = 1
+HEADER_FORMAT = "<8sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+SHARD_PREFIX = "positions_"
+SHARD_SUFFIX = ".bin"
+UNKNOWN_RESULT = -1
+
+
+def pack_records(states, keys, results=UNKNOWN_RESULT, evals=np.nan) -> np.ndarray:
+    """Builds an array of records from engine states (anything pack_states takes), their
+    Zobrist keys and optionally their results and evals (arrays or single values)"""
+    boards = pack_states(states)
+    records = np.empty(len(boards), dtype=POSITION_DTYPE)
+    squares = boards[:, :64].astype(np.uint8)
+    records["squares"] = squares[:, 0::2] | (squares[:, 1::2] << 4)
+    records["castle"] = boards[:, 66]
+    records["en_passant"] = boards[:, 67]
+    records["turn"] = boards[:, 68]
+    records["key"] = keys
+    records["result"] = results
+    records["eval"] = evals
+    return records
+
+
+def unpack_squares(records: np.ndarray) -> np.ndarray:
+    """The (n, 64) int8 square states of records"""
+    packed = records["squares"]
+    squares = np.empty((len(records), 64), dtype=np.int8)
+    squares[:, 0::2] = packed & 0b1111
+    squares[:, 1::2] = packed >> 4
+    return squares
+
+
+def unpack_states(records: np.ndarray) -> np.ndarray:
+    """The (n, 69) int8 packed engine states of records, king squares included"""
+    boards = np.empty((len(records), STATE_LENGTH), dtype=np.int8)
+    boards[:, :64] = unpack_squares(records)
+    boards[:, 64] = (boards[:, :64] == 12).argmax(axis=1)
+    boards[:, 65] = (boards[:, :64] == 6).argmax(axis=1)
+    boards[:, 66] = records["castle"]
+    boards[:, 67] = records["en_passant"]
+    boards[:, 68] = records["turn"]
+    return boards
+
+
+def record_to_state(record: np.void) -> list:
+    """The engine state list of a single record"""
+    state = unpack_states(record.reshape(1))[0].tolist()
+    state[68] = bool(state[68])
+    return state
+
+
+def _shard_path(directory: str, shard_idx: int) -> str:
+    """The path of a shard"""
+    return os.path.join(directory, f"{SHARD_PREFIX}{shard_idx:05d}{SHARD_SUFFIX}")
+
+
+def _shard_paths(directory: str) -> list[str]:
+    """The shard files of a directory in order"""
+    return sorted(os.path.join(directory, file_name) for file_name in os.listdir(directory)
+                  if file_name.startswith(SHARD_PREFIX) and file_name.endswith(SHARD_SUFFIX))
+
+
+def _check_header(shard_file) -> None:
+    """Reads and checks a shard header"""
+    magic, version, record_size = struct.unpack(HEADER_FORMAT, shard_file.read(HEADER_SIZE))
+    if magic != SHARD_MAGIC or version != SHARD_VERSION or record_size != POSITION_DTYPE.itemsize:
+        raise ValueError(f"{shard_file.name} is not a version {SHARD_VERSION} position shard")
+
+
+class ShardWriter:
+    """Appends records to the shards of a directory, starting a new shard every
+    shard_records records. An existing directory is appended to"""
+    def __init__(self, directory: str, shard_records: int=1 << 20) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_records = shard_records
+        self.shard_idx, self.shard_file, self.shard_count = 0, None, 0
+        shard_paths = _shard_paths(directory)
+        if shard_paths:
+            self.shard_idx = len(shard_paths) - 1
+            with open(shard_paths[-1], "rb") as shard_file:
+                _check_header(shard_file)
+            self.shard_count = (os.path.getsize(shard_paths[-1]) - HEADER_SIZE)\
+                // POSITION_DTYPE.itemsize
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_shard(self):
+        """Opens the current shard for appending, writing the header of a new shard"""
+        path = _shard_path(self.directory, self.shard_idx)
+        new_shard = not os.path.exists(path)
+        self.shard_file = open(path, "ab")  # pylint: disable=consider-using-with
+        if new_shard:
+            self.shard_file.write(struct.pack(HEADER_FORMAT, SHARD_MAGIC, SHARD_VERSION,
+                                              POSITION_DTYPE.itemsize))
+
+    def append(self, records: np.ndarray):
+        """Writes records (see pack_records), splitting them across shards as they fill"""
+        records = np.ascontiguousarray(records, dtype=POSITION_DTYPE)
+        while len(records):
+            if self.shard_count == self.shard_records:
+                self.close()
+                self.shard_idx += 1
+                self.shard_count = 0
+            if self.shard_file is None:
+                self._open_shard()
+            n_records = min(len(records), self.shard_records - self.shard_count)
+            self.shard_file.write(records[:n_records].tobytes())
+            self.shard_count += n_records
+            records = records[n_records:]
+
+    def close(self):
+        """Flushes and closes the current shard"""
+        if self.shard_file is not None:
+            self.shard_file.close()
+            self.shard_file = None
+
+
+class ShardReader:
+    """Memory-maps every shard of a directory. Records are read as views of the maps,
+    nothing is copied until fields are used"""
+    def __init__(self, directory: str) -> None:
+        self.shards = []
+        for path in _shard_paths(directory):
+            with open(path, "rb") as shard_file:
+                _check_header(shard_file)
+            n_records = (os.path.getsize(path) - HEADER_SIZE) // POSITION_DTYPE.itemsize
+            if n_records:
+                self.shards.append(np.memmap(path, dtype=POSITION_DTYPE, mode="r",
+                                             offset=HEADER_SIZE, shape=(n_records,)))
+        self.shard_starts = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def __len__(self) -> int:
+        return int(self.shard_starts[-1])
+
+    def __getitem__(self, record_idx: int) -> np.void:
+        if record_idx < 0:
+            record_idx += len(self)
+        if not 0 <= record_idx < len(self):
+            raise IndexError(record_idx)
+        shard_idx = int(np.searchsorted(self.shard_starts, record_idx, side="right")) - 1
+        return self.shards[shard_idx][record_idx - self.shard_starts[shard_idx]]
+
+    def __iter__(self):
+        """Yields every shard's records"""
+        return iter(self.shards)
+
+    def batches(self, batch_size: int=1 << 16):
+        """Yields views of at most batch_size records, batches don't span shards"""
+        for shard in self.shards:
+            for start in range(0, len(shard), batch_size):
+                yield shard[start:start + batch_size]
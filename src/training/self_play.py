@@ -0,0 +1,72 @@
+"""Generates labeled training positions by letting a strategy play itself.
+A dataset is a directory with two append-only files that are memory-mapped for training:
+boards.bin holds one packed int8 state (see pack_states) per position and results.bin holds
+the game's result from white's point of view for each position as 2 (win), 1 (draw) or 0."""
+import os
+from multiprocessing import Pool
+import numpy as np
+from src.evaluation.batch_evaluator import STATE_LENGTH
+from src.main_engine import MainEngine
+from src.strategies import make_strategy
+from src.tournament import MAX_PLIES, game_seed, play_game
+
+BOARDS_FILE = "boards.bin"
+RESULTS_FILE = "results.bin"
+
+
+def self_play_positions(strategy_name: str="random_move", seed: int=21221,
+                        max_plies: int=MAX_PLIES, skip_plies: int=0) -> tuple[np.ndarray, np.ndarray]:
+    """Plays one game and returns the packed boards of every position after the first
+    skip_plies moves with the game's result for each of them"""
+    engine = MainEngine()
+    result = play_game(make_strategy(strategy_name, seed), make_strategy(strategy_name, seed + 1),
+                       max_plies, engine)
+    # Walk back through the game instead of copying the state after every move
+    boards = []
+    for _ in range(len(engine.state_stack) - skip_plies):
+        boards.append(engine.state.copy())
+        engine.reverse_last_instruction()
+    boards = np.array(boards[::-1], dtype=np.int8).reshape(-1, STATE_LENGTH)
+    return boards, np.full(len(boards), int(result["score"] * 2), dtype=np.int8)
+
+
+def _self_play_positions_args(args: tuple) -> tuple[np.ndarray, np.ndarray]:
+    """Unpacks the arguments for self_play_positions in a worker process"""
+    return self_play_positions(*args)
+
+
+def write_self_play_dataset(directory: str, n_games: int, strategy_name: str="random_move",
+                            processes: int=None, base_seed: int=21221,
+                            max_plies: int=MAX_PLIES, skip_plies: int=0) -> int:
+    """Plays n_games over a pool of processes (in this process if processes is 1) and
+    appends their positions to the dataset in directory. Returns the positions written"""
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(strategy_name, game_seed(base_seed, game_idx), max_plies, skip_plies)
+            for game_idx in range(n_games)]
+    n_positions = 0
+    with open(os.path.join(directory, BOARDS_FILE), "ab") as boards_file,\
+            open(os.path.join(directory, RESULTS_FILE), "ab") as results_file:
+        if processes == 1:
+            pool, finished_games = None, map(_self_play_positions_args, jobs)
+        else:
+            pool = Pool(processes)
+            finished_games = pool.imap_unordered(_self_play_positions_args, jobs, chunksize=8)
+        try:
+            for boards, results in finished_games:
+                boards_file.write(boards.tobytes())
+                results_file.write(results.tobytes())
+                n_positions += len(boards)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    return n_positions
+
+
+def load_dataset(directory: str) -> tuple[np.ndarray, np.ndarray]:
+    """Memory-maps a dataset, returning (boards, results) where boards is (n, 69) int8
+    and results is n int8 values"""
+    results = np.memmap(os.path.join(directory, RESULTS_FILE), dtype=np.int8, mode="r")
+    boards = np.memmap(os.path.join(directory, BOARDS_FILE), dtype=np.int8, mode="r",
+                       shape=(len(results), STATE_LENGTH))
+    return boards, results
@@ -0,0 +1,145 @@
+"""Fits the square-state table of BatchEvaluator to game outcomes.
+Each position is a 64x13 one-hot vector (a 1 for the state of every square) plus the castle
+bits and the side to move, and the evaluation is its dot product with the weights. The one-hot
+vectors are never built: a position is kept as the 64 indices square_idx * 13 + state of its
+ones, the forward pass gathers those weights and the gradient scatters back with bincount.
+The loss is the cross entropy between the game result and sigmoid(score * SCORE_SCALE)."""
+import argparse
+import math
+import time
+import numpy as np
+from src.evaluation.batch_evaluator import BatchEvaluator, CASTLE_BIT_SHIFTS, SQUARE_OFFSETS,\
+    pack_states
+from src.training.optimizers import Adam
+from src.training.self_play import load_dataset, write_self_play_dataset
+
+# A 400 centipawn advantage is 10 to 1 odds of winning
+SCORE_SCALE = math.log(10) / 400
+N_SQUARE_WEIGHTS = 64 * 13
+
+
+def sigmoid(values: np.ndarray) -> np.ndarray:
+    """The logistic function"""
+    return 1 / (1 + np.exp(-values))
+
+
+class SquareStateTrainer:
+    """Mini-batch gradient descent on the weights of a BatchEvaluator (the default tables
+    if evaluator is None). results are 2 for a white win, 1 for a draw and 0 for a loss"""
+    def __init__(self, evaluator: BatchEvaluator=None, learning_rate: float=1.0,
+                 batch_size: int=1 << 14, l2: float=0.0, rand_seed: int=21221) -> None:
+        evaluator = BatchEvaluator() if evaluator is None else evaluator
+        # square-state weights, castle weights and tempo in one vector for the optimizer
+        self.params = np.concatenate([evaluator.square_state_weights.ravel(),
+                                      evaluator.castle_weights, [evaluator.tempo]])
+        self.optimizer = Adam(self.params, learning_rate)
+        self.batch_size = batch_size
+        self.l2 = l2
+        self.rng = np.random.default_rng(rand_seed)
+
+    def _features(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The one-hot indices, castle bits and turn signs of packed boards"""
+        indices = boards[:, :64].astype(np.intp) + SQUARE_OFFSETS
+        castle_bits = ((boards[:, 66, None] >> CASTLE_BIT_SHIFTS) & 1).astype(np.float64)
+        turn_signs = np.where(boards[:, 68] != 0, 1.0, -1.0)
+        return indices, castle_bits, turn_signs
+
+    def _feature_scores(self, indices: np.ndarray, castle_bits: np.ndarray,
+                        turn_signs: np.ndarray) -> np.ndarray:
+        """Evaluates the output of _features with the current weights"""
+        return self.params[indices].sum(axis=1) + castle_bits @ self.params[N_SQUARE_WEIGHTS:-1]\
+            + turn_signs * self.params[-1]
+
+    def scores(self, boards) -> np.ndarray:
+        """Evaluates packed boards with the current weights"""
+        return self._feature_scores(*self._features(pack_states(boards)))
+
+    def loss(self, boards, results, chunk_size: int=1 << 18) -> float:
+        """The mean cross entropy over a dataset, evaluated in chunks"""
+        boards = pack_states(boards)
+        total = 0.0
+        for start in range(0, len(boards), chunk_size):
+            targets = np.asarray(results[start:start + chunk_size], dtype=np.float64) / 2
+            predictions = np.clip(sigmoid(self.scores(boards[start:start + chunk_size])
+                                          * SCORE_SCALE), 1e-12, 1 - 1e-12)
+            total -= (targets * np.log(predictions)
+                      + (1 - targets) * np.log(1 - predictions)).sum()
+        return total / len(boards)
+
+    def gradient(self, boards: np.ndarray, results: np.ndarray) -> np.ndarray:
+        """The gradient of the mean cross entropy of a batch with respect to self.params"""
+        indices, castle_bits, turn_signs = self._features(boards)
+        scores = self._feature_scores(indices, castle_bits, turn_signs)
+        errors = (sigmoid(scores * SCORE_SCALE) - results / 2) * (SCORE_SCALE / len(boards))
+
+        gradient = np.empty_like(self.params)
+        gradient[:N_SQUARE_WEIGHTS] = np.bincount(indices.ravel(), weights=np.repeat(errors, 64),
+                                                  minlength=N_SQUARE_WEIGHTS)
+        gradient[N_SQUARE_WEIGHTS:-1] = errors @ castle_bits
+        gradient[-1] = errors @ turn_signs
+        if self.l2:
+            gradient[:N_SQUARE_WEIGHTS] += self.l2 * self.params[:N_SQUARE_WEIGHTS]
+        return gradient
+
+    def fit(self, boards, results, epochs: int=1, block_batches: int=16) -> list[float]:
+        """Trains on a dataset that may be memory-mapped and larger than memory.
+        Each epoch reads blocks of block_batches batches in a random order, shuffling the
+        positions within a block, so the disk is read sequentially. Returns the loss after
+        every epoch"""
+        boards = pack_states(boards)
+        block_size = self.batch_size * block_batches
+        block_starts = np.arange(0, len(boards), block_size)
+        losses = []
+        for _ in range(epochs):
+            for block_start in self.rng.permutation(block_starts):
+                block_boards = np.asarray(boards[block_start:block_start + block_size])
+                block_results = np.asarray(results[block_start:block_start + block_size],
+                                           dtype=np.float64)
+                order = self.rng.permutation(len(block_boards))
+                for batch_start in range(0, len(order), self.batch_size):
+                    batch = order[batch_start:batch_start + self.batch_size]
+                    self.optimizer.step(self.gradient(block_boards[batch], block_results[batch]))
+            losses.append(self.loss(boards, results))
+        return losses
+
+    def evaluator(self) -> BatchEvaluator:
+        """A BatchEvaluator with the trained weights"""
+        return BatchEvaluator(self.params[:N_SQUARE_WEIGHTS].reshape(64, 13),
+                              self.params[N_SQUARE_WEIGHTS:-1], self.params[-1])
+
+
+def main():
+    """Command line entry point: python -m src.training.square_state_trainer --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("dataset", help="Directory holding a self-play dataset")
+    parser.add_argument("output", help="Path of the .npz weights file BatchEvaluator.load reads")
+    parser.add_argument("--games", type=int, default=0,
+                        help="Self-play games to add to the dataset before training")
+    parser.add_argument("--strategy", default="random_move")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--learning-rate", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, default=1 << 14)
+    parser.add_argument("--l2", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.games:
+        start_time = time.perf_counter()
+        n_positions = write_self_play_dataset(args.dataset, args.games, args.strategy,
+                                              args.processes)
+        print(f"Generated {n_positions:,} positions in {time.perf_counter() - start_time:.1f}s")
+
+    boards, results = load_dataset(args.dataset)
+    trainer = SquareStateTrainer(learning_rate=args.learning_rate, batch_size=args.batch_size,
+                                 l2=args.l2)
+    print(f"Training on {len(boards):,} positions, initial loss {trainer.loss(boards, results):.5f}")
+    for epoch in range(args.epochs):
+        start_time = time.perf_counter()
+        loss = trainer.fit(boards, results)[0]
+        run_time = time.perf_counter() - start_time
+        print(f"Epoch {epoch + 1}: loss {loss:.5f}, {len(boards) / run_time:,.0f} positions/s")
+    trainer.evaluator().save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Texel-style tuning of the tapered evaluation (material, piece-square tables and game phase
+weights) on labeled quiet positions.
+Positions are translated once into memory-mapped feature arrays: the 64 square states of
+every board, the white minus black count of every piece and the count of the minor and major
+pieces. Every iteration after that is vectorized NumPy over those arrays, the loss is the mean
+squared error between the result and sigmoid(scaling_constant * score) and the parameters
+are updated with Adam. MainEngine and TaperedEngine use the integer PHASE_WEIGHTS, so the
+phase weights are only tuned when asked (fit(tune_phase=True), --tune-phase)."""
+import argparse
+import math
+import os
+import time
+import numpy as np
+from src.resources.data_translators import fen_to_state
+from src.resources.material_table import MAX_PHASE, PHASE_WEIGHTS
+from src.resources.piece_square_tables import EG_PIECE_TABLES, EG_PIECE_VALUES,\
+    MG_PIECE_VALUES, PIECE_TABLES, build_square_state_table
+from src.training.optimizers import Adam
+
+SQUARES_FILE = "squares.npy"
+MATERIAL_FILE = "material.npy"
+PHASE_PIECES_FILE = "phase_pieces.npy"
+RESULTS_FILE = "results.npy"
+RESULT_VALUES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+# The dtype and the shape of one position of every feature array
+FEATURE_LAYOUT = {
+    SQUARES_FILE: (np.int8, (64,)),
+    MATERIAL_FILE: (np.int8, (5,)),
+    PHASE_PIECES_FILE: (np.int8, (4,)),
+    RESULTS_FILE: (np.float32, ()),
+}
+
+# Parameter vector layout: mg and eg tables (6 pieces x 64 squares each), mg and eg values of
+# pawn to queen and the phase weights of knight, bishop, rook and queen
+MG_TABLES = slice(0, 384)
+EG_TABLES = slice(384, 768)
+MG_VALUES = slice(768, 773)
+EG_VALUES = slice(773, 778)
+PHASE = slice(778, 782)
+N_PARAMS = 782
+# Empty squares point at a padding parameter with a sign of 0
+EMPTY_FEATURE = 384
+
+
+def _build_feature_lookups() -> tuple[np.ndarray, np.ndarray]:
+    """The table row and sign of every square_idx * 13 + square_state. Black pieces use the
+    white table of the mirrored square with a negative sign"""
+    rows = np.full(64 * 13, EMPTY_FEATURE, dtype=np.intp)
+    signs = np.zeros(64 * 13, dtype=np.float64)
+    for square_idx in range(64):
+        for piece in range(1, 7):
+            rows[square_idx * 13 + piece] = (piece - 1) * 64 + square_idx
+            signs[square_idx * 13 + piece] = 1
+            rows[square_idx * 13 + piece + 6] = (piece - 1) * 64 + (square_idx ^ 56)
+            signs[square_idx * 13 + piece + 6] = -1
+    return rows, signs
+
+
+FEATURE_ROWS, FEATURE_SIGNS = _build_feature_lookups()
+SQUARE_OFFSETS = np.arange(64, dtype=np.intp) * 13
+
+
+def parse_labeled_position(line: str) -> tuple[str, float]:
+    """Splits a line holding a FEN and a result ("1-0", "0-1", "1/2-1/2" or a white score
+    like 0.5), optionally quoted, bracketed or separated by a semicolon"""
+    fields = line.replace(";", " ").split()
+    result = fields[-1].strip("[]\"'")
+    return " ".join(fields[:4]), RESULT_VALUES[result] if result in RESULT_VALUES\
+        else float(result)
+
+
+def _feature_chunk(squares: list[list], results: list[float]) -> dict[str, np.ndarray]:
+    """The feature arrays of a chunk of boards and their results"""
+    squares = np.array(squares, dtype=np.int8).reshape(-1, 64)
+    counts = np.zeros((len(squares), 13), dtype=np.int16)
+    for square_state in range(1, 13):
+        counts[:, square_state] = (squares == square_state).sum(axis=1)
+    return {
+        SQUARES_FILE: squares,
+        MATERIAL_FILE: (counts[:, 1:6] - counts[:, 7:12]).astype(np.int8),
+        PHASE_PIECES_FILE: (counts[:, 2:6] + counts[:, 8:12]).astype(np.int8),
+        RESULTS_FILE: np.array(results, dtype=np.float32),
+    }
+
+
+def _write_chunk(raw_files: dict, squares: list[list], results: list[float]):
+    """Appends the feature arrays of a chunk to the raw files"""
+    for file_name, array in _feature_chunk(squares, results).items():
+        raw_files[file_name].write(array.tobytes())
+
+
+def build_features(labeled_lines, directory: str, chunk_size: int=1 << 16) -> int:
+    """Translates labeled positions (an iterable of lines, see parse_labeled_position) into
+    the memory-mapped feature arrays of a directory. Returns the number of positions.
+    At most chunk_size positions are held in memory: the chunks are appended to raw files
+    and copied into the .npy files once the number of positions is known"""
+    os.makedirs(directory, exist_ok=True)
+    raw_paths = {file_name: os.path.join(directory, file_name + ".tmp")
+                 for file_name in FEATURE_LAYOUT}
+    raw_files = {file_name: open(path, "wb")  # pylint: disable=consider-using-with
+                 for file_name, path in raw_paths.items()}
+    n_positions, squares, results = 0, [], []
+    try:
+        for line in labeled_lines:
+            if line.strip():
+                fen, result = parse_labeled_position(line)
+                squares.append(fen_to_state(fen)[:64])
+                results.append(result)
+            if len(results) == chunk_size:
+                _write_chunk(raw_files, squares, results)
+                n_positions, squares, results = n_positions + len(results), [], []
+        _write_chunk(raw_files, squares, results)
+        n_positions += len(results)
+    finally:
+        for raw_file in raw_files.values():
+            raw_file.close()
+
+    for file_name, (dtype, shape) in FEATURE_LAYOUT.items():
+        memmap = np.lib.format.open_memmap(os.path.join(directory, file_name), mode="w+",
+                                           dtype=dtype, shape=(n_positions, *shape))
+        if n_positions:
+            raw = np.memmap(raw_paths[file_name], dtype=dtype, mode="r",
+                            shape=(n_positions, *shape))
+            for start in range(0, n_positions, chunk_size):
+                memmap[start:start + chunk_size] = raw[start:start + chunk_size]
+            del raw
+        memmap.flush()
+        del memmap
+        os.remove(raw_paths[file_name])
+    return n_positions
+
+
+def load_features(directory: str) -> dict[str, np.ndarray]:
+    """Memory-maps the feature arrays written by build_features"""
+    return {file_name: np.load(os.path.join(directory, file_name), mmap_mode="r")
+            for file_name in FEATURE_LAYOUT}
+
+
+def initial_params() -> np.ndarray:
+    """The parameters of the current tapered evaluation"""
+    params = np.zeros(N_PARAMS, dtype=np.float64)
+    for piece in range(1, 7):
+        params[MG_TABLES][(piece - 1) * 64:piece * 64] = PIECE_TABLES[piece]
+        params[EG_TABLES][(piece - 1) * 64:piece * 64] = EG_PIECE_TABLES[piece]
+    params[MG_VALUES] = [MG_PIECE_VALUES[piece] for piece in range(1, 6)]
+    params[EG_VALUES] = [EG_PIECE_VALUES[piece] for piece in range(1, 6)]
+    params[PHASE] = PHASE_WEIGHTS[2:6]
+    return params
+
+
+def sigmoid(values: np.ndarray) -> np.ndarray:
+    """The logistic function"""
+    return 1 / (1 + np.exp(-values))
+
+
+class TexelTuner:
+    """Tunes the tapered evaluation parameters on the features of a directory (or a dict of
+    arrays in the same layout)"""
+    def __init__(self, features, params: np.ndarray=None, learning_rate: float=1.0,
+                 scaling_constant: float=None, chunk_size: int=1 << 16) -> None:
+        self.features = load_features(features) if isinstance(features, str) else features
+        self.params = initial_params() if params is None else np.array(params, dtype=np.float64)
+        self.optimizer = Adam(self.params, learning_rate)
+        self.chunk_size = chunk_size
+        self.scaling_constant = self.fit_scaling_constant() if scaling_constant is None\
+            else scaling_constant
+
+    def __len__(self) -> int:
+        return len(self.features[RESULTS_FILE])
+
+    def _chunks(self):
+        """Yields the feature arrays in chunks of self.chunk_size positions"""
+        for start in range(0, len(self), self.chunk_size):
+            end = start + self.chunk_size
+            squares = np.asarray(self.features[SQUARES_FILE][start:end], dtype=np.intp)
+            feature_idx = squares + SQUARE_OFFSETS
+            yield (FEATURE_ROWS[feature_idx], FEATURE_SIGNS[feature_idx],
+                   np.asarray(self.features[MATERIAL_FILE][start:end], dtype=np.float64),
+                   np.asarray(self.features[PHASE_PIECES_FILE][start:end], dtype=np.float64),
+                   np.asarray(self.features[RESULTS_FILE][start:end], dtype=np.float64))
+
+    def _scores(self, rows: np.ndarray, signs: np.ndarray, material: np.ndarray,
+                phase_pieces: np.ndarray) -> tuple[np.ndarray, ...]:
+        """The tapered scores of a chunk along with its mg, eg and raw phase values"""
+        # The padding parameter after each table set is read as 0 for empty squares
+        mg_tables = np.append(self.params[MG_TABLES], 0)
+        eg_tables = np.append(self.params[EG_TABLES], 0)
+        mg_scores = (mg_tables[rows] * signs).sum(axis=1) + material @ self.params[MG_VALUES]
+        eg_scores = (eg_tables[rows] * signs).sum(axis=1) + material @ self.params[EG_VALUES]
+        raw_phase = phase_pieces @ self.params[PHASE]
+        phase = np.clip(raw_phase, 0, MAX_PHASE)
+        scores = (mg_scores * phase + eg_scores * (MAX_PHASE - phase)) / MAX_PHASE
+        return scores, mg_scores, eg_scores, raw_phase, phase
+
+    def scores(self) -> np.ndarray:
+        """The tapered score of every position"""
+        return np.concatenate([self._scores(*chunk[:4])[0] for chunk in self._chunks()])
+
+    def loss(self, scaling_constant: float=None) -> float:
+        """The mean squared error between the results and the predicted scores"""
+        scaling_constant = self.scaling_constant if scaling_constant is None else scaling_constant
+        total = 0.0
+        for *chunk, results in self._chunks():
+            predictions = sigmoid(self._scores(*chunk)[0] * scaling_constant)
+            total += ((results - predictions) ** 2).sum()
+        return total / len(self)
+
+    def fit_scaling_constant(self, low: float=1e-4, high: float=0.05,
+                             iterations: int=40) -> float:
+        """Finds the scaling constant minimizing the loss of the current parameters with a
+        golden-section search, the loss is unimodal in it"""
+        ratio = (math.sqrt(5) - 1) / 2
+        for _ in range(iterations):
+            mid_low, mid_high = high - ratio * (high - low), low + ratio * (high - low)
+            if self.loss(mid_low) < self.loss(mid_high):
+                high = mid_high
+            else:
+                low = mid_low
+        return (low + high) / 2
+
+    def gradient(self) -> tuple[float, np.ndarray]:
+        """The loss and its gradient with respect to self.params over every position"""
+        gradient = np.zeros(N_PARAMS + 1, dtype=np.float64)
+        total = 0.0
+        for rows, signs, material, phase_pieces, results in self._chunks():
+            scores, mg_scores, eg_scores, raw_phase, phase = self._scores(
+                rows, signs, material, phase_pieces)
+            predictions = sigmoid(scores * self.scaling_constant)
+            total += ((results - predictions) ** 2).sum()
+            # d loss / d score for every position
+            errors = -2 * (results - predictions) * predictions * (1 - predictions)\
+                * self.scaling_constant / len(self)
+            mg_errors, eg_errors = errors * phase / MAX_PHASE, errors * (1 - phase / MAX_PHASE)
+
+            gradient[MG_TABLES] += np.bincount(rows.ravel(), weights=(signs * mg_errors[:, None]).ravel(),
+                                               minlength=EMPTY_FEATURE + 1)[:EMPTY_FEATURE]
+            gradient[EG_TABLES] += np.bincount(rows.ravel(), weights=(signs * eg_errors[:, None]).ravel(),
+                                               minlength=EMPTY_FEATURE + 1)[:EMPTY_FEATURE]
+            gradient[MG_VALUES] += mg_errors @ material
+            gradient[EG_VALUES] += eg_errors @ material
+            # The phase is clipped to [0, MAX_PHASE], outside that range it has no gradient
+            unclipped = (raw_phase > 0) & (raw_phase < MAX_PHASE)
+            gradient[PHASE] += (errors * unclipped * (mg_scores - eg_scores) / MAX_PHASE) @ phase_pieces
+        return total / len(self), gradient[:N_PARAMS]
+
+    def fit(self, iterations: int=100, frozen: slice=None, callback=None,
+            tune_phase: bool=False) -> list[float]:
+        """Takes full-batch Adam steps, returning the loss before every step.
+        Parameters in the frozen slice are left alone, and so are the phase weights unless
+        tune_phase since the engines only take integer PHASE_WEIGHTS. callback is called with
+        the iteration and loss after each step"""
+        frozen_slices = ([] if frozen is None else [frozen]) + ([] if tune_phase else [PHASE])
+        losses = []
+        for iteration in range(iterations):
+            loss, gradient = self.gradient()
+            # Adam's moments from earlier steps would still move them, so they are put back
+            frozen_values = [self.params[frozen_slice].copy() for frozen_slice in frozen_slices]
+            self.optimizer.step(gradient)
+            for frozen_slice, values in zip(frozen_slices, frozen_values):
+                self.params[frozen_slice] = values
+            losses.append(loss)
+            if callback is not None:
+                callback(iteration, loss)
+        return losses
+
+    def piece_values(self) -> tuple[dict[int, float], dict[int, float]]:
+        """The tuned middlegame and endgame piece values, in the PIECE_VALUES layout"""
+        return ({piece: self.params[MG_VALUES][piece - 1] for piece in range(1, 6)} | {6: 0},
+                {piece: self.params[EG_VALUES][piece - 1] for piece in range(1, 6)} | {6: 0})
+
+    def square_state_tables(self) -> tuple[list[list], list[list]]:
+        """The tuned (mg_table, eg_table) TaperedEngine takes"""
+        mg_values, eg_values = self.piece_values()
+        mg_tables = {piece: self.params[MG_TABLES][(piece - 1) * 64:piece * 64].tolist()
+                     for piece in range(1, 7)}
+        eg_tables = {piece: self.params[EG_TABLES][(piece - 1) * 64:piece * 64].tolist()
+                     for piece in range(1, 7)}
+        return (build_square_state_table(mg_values, mg_tables),
+                build_square_state_table(eg_values, eg_tables))
+
+    def phase_weights(self) -> list[float]:
+        """The tuned weights in the PHASE_WEIGHTS layout"""
+        knight, bishop, rook, queen = self.params[PHASE].tolist()
+        white_weights = [0, 0, knight, bishop, rook, queen, 0]
+        return white_weights + white_weights[1:]
+
+    def save(self, path: str):
+        """Saves the tuned tables, values and phase weights in an .npz file. The phase
+        weights are PHASE_WEIGHTS unless they were tuned, for inspection only"""
+        mg_table, eg_table = self.square_state_tables()
+        np.savez(path, params=self.params, mg_table=np.array(mg_table),
+                 eg_table=np.array(eg_table), phase_weights=np.array(self.phase_weights()),
+                 scaling_constant=np.float64(self.scaling_constant))
+
+
+def main():
+    """Command line entry point: python -m src.training.texel_tuner --help"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("features", help="Directory holding the memory-mapped features")
+    parser.add_argument("output", help="Path of the .npz file the tuned parameters go to")
+    parser.add_argument("--positions", help="Labeled FEN file to build the features from first")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--learning-rate", type=float, default=1.0)
+    parser.add_argument("--tune-phase", action="store_true",
+                        help="Tune the phase weights too, no engine can load them")
+    args = parser.parse_args()
+
+    if args.positions:
+        start_time = time.perf_counter()
+        with open(args.positions, encoding="utf-8") as positions_file:
+            n_positions = build_features(positions_file, args.features)
+        print(f"Built features of {n_positions:,} positions in "
+              f"{time.perf_counter() - start_time:.1f}s")
+
+    tuner = TexelTuner(args.features, learning_rate=args.learning_rate)
+    print(f"Scaling constant {tuner.scaling_constant:.6f}, initial loss {tuner.loss():.6f}")
+    start_time = time.perf_counter()
+    tuner.fit(args.iterations,
+              callback=lambda iteration, loss: print(f"Iteration {iteration}: loss {loss:.6f}")
+              if iteration % 50 == 0 else None, tune_phase=args.tune_phase)
+    print(f"Final loss {tuner.loss():.6f} after {time.perf_counter() - start_time:.1f}s")
+    tuner.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
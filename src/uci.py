@@ -0,0 +1,227 @@
+"""A UCI (Universal Chess Interface) front-end for MainEngine and src.search, run with
+python -m src.uci so it can be added to match tools as an engine command.
+Input is read on the main thread while searches run on a worker thread, so stop, isready
+and quit are answered during a search. Positions are updated incrementally: a position
+command that extends (or shares a prefix with) the current game only plays the new moves.
+The time from go to the first info line and from stop to bestmove is kept for every search
+and reported as an info string when debug is on."""
+import sys
+import threading
+import time
+from typing import Callable
+from src.evaluation.tapered import TaperedEngine
+from src.main_engine import STARTING_STATE
+from src.move_index import MoveIndex, move_to_uci
+from src.resources.data_translators import state_to_fen
+from src.search import MAX_DEPTH, Search, SearchInfo
+
+ENGINE_NAME = "py_chess_bot"
+ENGINE_AUTHOR = "hai-ben"
+STARTING_FEN = state_to_fen(STARTING_STATE)
+# Time management when only the clock is given
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05
+GO_OPTIONS = {"wtime", "btime", "winc", "binc", "movestogo", "depth", "nodes", "movetime"}
+
+
+def _print_line(line: str):
+    """Writes a line to stdout immediately"""
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def format_info(info: SearchInfo) -> str:
+    """The UCI info line of a completed depth"""
+    mate_in = info.mate_in
+    score = f"mate {mate_in}" if mate_in is not None else f"cp {info.score}"
+    return f"info depth {info.depth} score {score} nodes {info.nodes} nps {info.nps} "\
+        f"time {int(info.seconds * 1000)} pv {' '.join(move_to_uci(move) for move in info.pv)}"
+
+
+def search_seconds(options: dict, white: bool) -> float | None:
+    """The time to spend on a move from the go options, None if the search isn't timed"""
+    if "movetime" in options:
+        return max(options["movetime"] / 1000 - MOVE_OVERHEAD, 0.0)
+    clock, increment = ("wtime", "winc") if white else ("btime", "binc")
+    if clock not in options:
+        return None
+    remaining = options[clock] / 1000
+    budget = remaining / options.get("movestogo", DEFAULT_MOVES_TO_GO)\
+        + options.get(increment, 0) / 2000
+    return max(min(budget, remaining - MOVE_OVERHEAD), 0.0)
+
+
+class UCIEngine:
+    """Handles UCI commands one line at a time, writing responses with output"""
+    def __init__(self, output: Callable[[str], None]=None) -> None:
+        self.output = output or _print_line
+        self.output_lock = threading.Lock()
+        self.fen = STARTING_FEN
+        self.engine = TaperedEngine()
+        self.moves = []
+        self.debug = False
+        self.stop_event = threading.Event()
+        self.search_thread = None
+        # Latencies of the last search in seconds
+        self.go_time = None
+        self.stop_time = None
+        self.first_info_latency = None
+        self.stop_latency = None
+
+    def send(self, line: str):
+        """Writes a line, lines from the search thread are never interleaved"""
+        with self.output_lock:
+            self.output(line)
+
+    def handle(self, line: str) -> bool:
+        """Handles one command line, returns False once the engine should quit"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "debug":
+            self.debug = args[:1] == ["on"]
+        elif command == "ucinewgame":
+            self.stop()
+            self.set_position(STARTING_FEN, [], incremental=False)
+        elif command == "position":
+            self.stop()
+            self.position(args)
+        elif command == "go":
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def position(self, args: list[str]):
+        """Handles position [startpos | fen <fen>] [moves <move> ...]"""
+        if "moves" in args:
+            moves_idx = args.index("moves")
+            position_args, moves = args[:moves_idx], args[moves_idx + 1:]
+        else:
+            position_args, moves = args, []
+        if position_args[:1] == ["startpos"]:
+            fen = STARTING_FEN
+        elif position_args[:1] == ["fen"]:
+            fen = " ".join(position_args[1:])
+        else:
+            self.send("info string position needs startpos or fen")
+            return
+        self.set_position(fen, moves)
+
+    def set_position(self, fen: str, moves: list[str], incremental: bool=True):
+        """Sets the engine to the position after the UCI moves from fen. If fen is the
+        current starting position only the moves that differ are taken back and played"""
+        if not incremental or fen != self.fen:
+            try:
+                self.engine = TaperedEngine.from_fen(fen)
+            except ValueError as error:
+                self.send(f"info string invalid fen: {error}")
+                return
+            self.fen, self.moves = fen, []
+
+        n_shared = 0
+        while n_shared < min(len(moves), len(self.moves))\
+                and moves[n_shared] == self.moves[n_shared]:
+            n_shared += 1
+        for _ in range(len(self.moves) - n_shared):
+            self.engine.reverse_last_instruction()
+        del self.moves[n_shared:]
+
+        for uci in moves[n_shared:]:
+            try:
+                move = MoveIndex(self.engine).from_uci(uci)
+            except ValueError:
+                self.send(f"info string illegal move {uci}")
+                return
+            self.engine.execute_instructions(move)
+            self.moves.append(uci)
+
+    def go(self, args: list[str]):
+        """Starts a search on the worker thread, see search_seconds for the time used"""
+        self.stop()
+        options, infinite = {}, "infinite" in args
+        for name, value in zip(args, args[1:]):
+            if name in GO_OPTIONS:
+                options[name] = int(value)
+        seconds = None if infinite else search_seconds(options, bool(self.engine.state[-1]))
+
+        self.stop_event.clear()
+        self.go_time, self.stop_time = time.perf_counter(), None
+        self.first_info_latency, self.stop_latency = None, None
+        # The search gets its own engine so the position can't change under it
+        search = Search(TaperedEngine(self.engine.state.copy()), self.stop_event, self._info)
+        self.search_thread = threading.Thread(
+            target=self._search, args=(search, options.get("depth", MAX_DEPTH),
+                                       options.get("nodes"), seconds, infinite), daemon=True)
+        self.search_thread.start()
+
+    def _info(self, info: SearchInfo):
+        """Sends the info line of a completed depth"""
+        if self.first_info_latency is None:
+            self.first_info_latency = time.perf_counter() - self.go_time
+        self.send(format_info(info))
+
+    def _search(self, search: Search, depth: int, node_limit: int | None,
+                seconds: float | None, infinite: bool=False):
+        """Runs a search and sends its best move, after stop for an infinite search even if
+        the search ended before it"""
+        result = search.search(depth, node_limit, seconds)
+        if infinite:
+            self.stop_event.wait()
+        best_move = move_to_uci(result.pv[0]) if result.pv else "0000"
+        with self.output_lock:
+            if self.stop_time is not None:
+                self.stop_latency = time.perf_counter() - self.stop_time
+            self.output(f"bestmove {best_move}")
+        if self.debug:
+            self.send(f"info string latency go to first info "
+                      f"{_format_ms(self.first_info_latency)} stop to bestmove "
+                      f"{_format_ms(self.stop_latency)}")
+
+    def stop(self):
+        """Stops the running search, if any, and waits for its bestmove"""
+        if self.search_thread is None:
+            return
+        if self.search_thread.is_alive():
+            with self.output_lock:
+                self.stop_time = time.perf_counter()
+            self.stop_event.set()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def wait(self):
+        """Waits for a search that ends by itself (depth, nodes or time, not infinite) to
+        finish"""
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+
+def _format_ms(seconds: float | None) -> str:
+    """Seconds as milliseconds for info strings"""
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+
+def main():
+    """Command line entry point: reads UCI commands from stdin until quit"""
+    uci_engine = UCIEngine()
+    for line in sys.stdin:
+        if not uci_engine.handle(line):
+            break
+    uci_engine.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Unit tests for the benchmark scenarios and runner"""
+import json
+import sys
+import pytest
+from benchmarks.run import (format_report, main, measure_counters, measure_memory,
+                            run_benchmarks, run_scenario)
+from benchmarks.scenarios import (PERFT_POSITIONS, PERFT_REFERENCE, SCENARIOS, perft,
+                                  walk_positions)
+from src.instrumented_engine import INSTRUMENT_ENV_VAR
+from src.main_engine import MainEngine
+
+LEGALITY_BUG = "MainEngine misses legal moves in this position"
+
+
+@pytest.mark.parametrize("position, depth", [
+    ("start", 3),
+    ("kiwipete", 1),
+    pytest.param("kiwipete", 2, marks=pytest.mark.xfail(reason=LEGALITY_BUG, strict=True)),
+    pytest.param("endgame", 2, marks=pytest.mark.xfail(reason=LEGALITY_BUG, strict=True)),
+])
+def test_perft(position, depth):
+    """perft matches the published node counts and leaves the engine where it was"""
+    engine = MainEngine.from_fen(PERFT_POSITIONS[position])
+    state = engine.state.copy()
+    nodes = [perft(engine, node_depth) for node_depth in range(depth + 1)]
+    assert engine.state == state
+    assert nodes == PERFT_REFERENCE[position][:depth + 1]
+
+
+def test_walk_positions():
+    """Walks are reproducible"""
+    positions = walk_positions(50)
+    assert len(positions) == 50 and positions == walk_positions(50)
+    assert positions[0] == MainEngine().state
+
+
+def test_run_scenario():
+    """Warmup runs are dropped and the repeats are summarised"""
+    result = run_scenario(SCENARIOS["perft_start"], warmup=2, repeats=3, quick=True)
+    assert result["units"] == result["expected_units"] == 400 and result["unit"] == "nodes"
+    assert len(result["times"]) == 3
+    assert min(result["times"]) <= result["median"] <= max(result["times"])
+    assert 0 <= result["iqr"] <= max(result["times"]) - min(result["times"])
+    assert result["units_per_sec"] > 0
+    assert run_scenario(SCENARIOS["perft_start"], 0, 1, quick=True)["iqr"] == 0
+
+
+def test_measure_memory():
+    """The memory pass reports the workload's peak"""
+    memory = measure_memory(SCENARIOS["execute_reverse"], quick=True)
+    assert memory["peak_bytes"] > 0 and memory["retained_bytes"] <= memory["peak_bytes"]
+
+
+def test_instrumented_runs(monkeypatch):
+    """With the environment variable set the report is marked and carries the counters of
+    the workload alone"""
+    assert "counters" not in run_benchmarks(["perft_start"], 0, 1, quick=True)["scenarios"]
+    assert not measure_counters(SCENARIOS["perft_start"], quick=True)
+    monkeypatch.setenv(INSTRUMENT_ENV_VAR, "1")
+    report = run_benchmarks(["perft_start", "random_walk"], 0, 1, quick=True)
+    assert report["instrumented"]
+    # perft generates moves once per position above the leaves: 1 + 20
+    assert report["scenarios"]["perft_start"]["counters"]["calls"]["get_all_moves"] == 21
+    assert report["scenarios"]["random_walk"]["counters"]["calls"]["execute_instructions"] > 0
+
+
+def test_report(tmp_path, monkeypatch):
+    """Reports are JSON with the commit and machine, written by the command line"""
+    report = run_benchmarks(["move_generation", "legality_filter"], 0, 2, memory=True,
+                            quick=True)
+    assert set(report["scenarios"]) == {"move_generation", "legality_filter"}
+    assert "memory" in report["scenarios"]["legality_filter"]
+    assert report["machine"]["python"] and report["quick"] and not report["instrumented"]
+    assert json.loads(json.dumps(report)) == report
+    assert "legality_filter" in format_report(report)
+    assert report["scenarios"]["legality_filter"]["expected_units"] is None
+
+    output_path = str(tmp_path / "bench.json")
+    monkeypatch.setattr(sys, "argv", ["run", "--quick", "--scenarios", "perft_start",
+                                      "--repeats", "1", "--output", output_path])
+    main()
+    with open(output_path, encoding="utf-8") as output_file:
+        assert json.load(output_file)["scenarios"]["perft_start"]["units"] == 400
+
+
+def test_report_flags_wrong_counts():
+    """A workload processing other than the expected units is marked in the table"""
+    result = run_scenario(SCENARIOS["perft_start"], 0, 1, quick=True)
+    report = {"scenarios": {"perft_start": dict(result, expected_units=401)}}
+    assert "WRONG, expected 401 nodes" in format_report(report)
+    assert "WRONG" not in format_report({"scenarios": {"perft_start": result}})
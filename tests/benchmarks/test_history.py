@@ -0,0 +1,97 @@
+"""Unit tests for the benchmark history and regression comparison"""
+import pytest
+from benchmarks.history import (append_report, compare_history, compare_times, format_comparison,
+                                machine_fingerprint, main, mann_whitney_u, read_history)
+
+MACHINE = {"node": "bench", "python": "3.11.7", "cpu_count": 1}
+
+
+def make_report(commit: str, times: list[float], machine: dict=None, params: dict=None) -> dict:
+    """A benchmark report with one scenario"""
+    return {"commit": commit, "machine": machine or MACHINE, "timestamp": "2026-01-01T00:00:00",
+            "scenarios": {"perft_start": {"params": params or {"depth": 4}, "times": times}}}
+
+
+def test_mann_whitney_u():
+    """Exact p-values for small samples, the normal approximation for ties"""
+    assert mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]) == (0, pytest.approx(2 / 252))
+    assert mann_whitney_u([6, 7, 8, 9, 10], [1, 2, 3, 4, 5])[1] == pytest.approx(2 / 252)
+    assert mann_whitney_u([1, 3, 5], [2, 4, 6])[1] == pytest.approx(0.7)
+    u_value, p_value = mann_whitney_u([1, 1, 2, 2, 3], [3, 4, 4, 5, 5])
+    assert u_value == 0.5 and p_value < 0.05
+    assert mann_whitney_u([1, 1], [1, 1]) == (2, 1.0)
+    with pytest.raises(ValueError):
+        mann_whitney_u([], [1])
+
+
+def test_compare_times():
+    """Significant slowdowns above the minimum change are regressions"""
+    base = [1.00, 1.01, 0.99, 1.02, 1.00]
+    assert compare_times(base, [1.20, 1.21, 1.19, 1.22, 1.18])["verdict"] == "regression"
+    assert compare_times(base, [0.80, 0.81, 0.79, 0.82, 0.78])["verdict"] == "improvement"
+    assert compare_times(base, [1.00, 1.02, 0.98, 1.01, 0.99])["verdict"] == "unchanged"
+    assert compare_times(base, [1.011, 1.012, 1.013, 1.014, 1.015],
+                         min_change=0.02)["verdict"] == "unchanged"
+
+
+def test_history_round_trip(tmp_path):
+    """Reports are keyed by commit and machine"""
+    path = str(tmp_path / "history.jsonl")
+    assert not list(read_history(path))
+    append_report(make_report("abc123", [1.0]), path)
+    append_report(make_report("abc123", [1.1]), path, dirty=True)
+    records = list(read_history(path))
+    assert [record["commit"] for record in records] == ["abc123", "abc123-dirty"]
+    assert records[0]["machine_id"] == machine_fingerprint(MACHINE) != machine_fingerprint({})
+
+
+def test_compare_history():
+    """Commits are compared with a base commit or the runs before them on the same machine"""
+    other_machine = dict(MACHINE, node="other")
+    history = [dict(report, machine_id=machine_fingerprint(report["machine"])) for report in (
+        make_report("aaa", [1.00, 1.01, 0.99, 1.02, 1.00]),
+        make_report("bbb", [1.00, 1.02, 0.98, 1.01, 0.99]),
+        make_report("ccc", [0.5] * 5, other_machine),
+        make_report("ddd", [0.1] * 5, params={"depth": 2}),
+        make_report("ddd", [1.20, 1.21, 1.19, 1.22, 1.18]),
+    )]
+    comparison = compare_history(history, base="aaa")
+    assert comparison["head"] == "ddd" and comparison["base"] == ["aaa"]
+    assert comparison["scenarios"]["perft_start"]["verdict"] == "regression"
+    assert comparison["scenarios"]["perft_start"]["head_runs"] == 5
+    assert "!! perft_start" in format_comparison(comparison)
+
+    rolling = compare_history(history, head="ddd", rolling=2)
+    assert rolling["base"] == ["aaa", "bbb"]
+    assert rolling["scenarios"]["perft_start"]["base_runs"] == 10
+    unchanged = compare_history(history, head="bbb", base="aaa")
+    assert unchanged["scenarios"]["perft_start"]["verdict"] == "unchanged"
+    with pytest.raises(ValueError):
+        compare_history(history, head="ccc")
+    with pytest.raises(ValueError):
+        compare_history(history, head="zzz")
+
+    instrumented = dict(make_report("eee", [5.0] * 5), instrumented=True,
+                        machine_id=machine_fingerprint(MACHINE))
+    comparison = compare_history(history + [instrumented], head="ddd", base="aaa")
+    assert comparison["scenarios"]["perft_start"]["head_runs"] == 5
+    # The latest run is instrumented, the uninstrumented runs are no baseline for it
+    with pytest.raises(ValueError):
+        compare_history(history + [instrumented], base="aaa")
+
+
+def test_command_line(tmp_path, capsys):
+    """record stores a run and compare exits with 1 on regressions"""
+    path = str(tmp_path / "history.jsonl")
+    assert main(["--history", path, "record", "--quick", "--scenarios", "perft_endgame",
+                 "--repeats", "2"]) == 0
+    record = next(read_history(path))
+    assert record["scenarios"]["perft_endgame"]["units"] == 190
+    assert main(["--history", path, "list"]) == 0
+    assert record["machine_id"] in capsys.readouterr().out
+
+    machine = record["machine"]
+    append_report(make_report("base", [1.0, 1.01, 0.99, 1.02, 1.0], machine), path)
+    append_report(make_report("head", [1.2, 1.21, 1.19, 1.22, 1.18], machine), path)
+    assert main(["--history", path, "compare", "--base", "base"]) == 1
+    assert main(["--history", path, "compare", "--head", "base", "--base", "head"]) == 0
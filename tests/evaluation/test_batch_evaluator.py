@@ -0,0 +1,71 @@
+"""Unit tests for the NumPy batch evaluator"""
+import random
+import numpy as np
+import pytest
+from src.main_engine import MainEngine
+from src.evaluation.batch_evaluator import BatchEvaluator, pack_states
+
+
+@pytest.fixture(name="walk_states")
+def fixture_walk_states() -> list[list]:
+    """Returns the states visited by a short seeded random walk"""
+    random.seed(1234)
+    engine = MainEngine()
+    states = [engine.state.copy()]
+    for _ in range(60):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        engine.execute_instructions(random.choice(moves))
+        states.append(engine.state.copy())
+    return states
+
+
+def test_pack_states_shape(walk_states):
+    """Each state becomes a single int8 row"""
+    boards = pack_states(walk_states)
+    assert boards.dtype == np.int8
+    assert boards.shape == (len(walk_states), 69)
+    assert boards[0].tolist() == [int(x) for x in walk_states[0]]
+
+
+def test_pack_states_buffer_is_zero_copy(walk_states):
+    """Packed buffers and int8 arrays are viewed rather than copied"""
+    boards = pack_states(walk_states)
+    buffer = bytearray(boards.tobytes())
+    assert np.shares_memory(pack_states(buffer), np.frombuffer(buffer, dtype=np.int8))
+    assert np.shares_memory(pack_states(boards), boards)
+
+
+def test_starting_position_is_balanced():
+    """The symmetric starting position is only worth the tempo bonus"""
+    evaluator = BatchEvaluator()
+    assert evaluator.evaluate([MainEngine().state])[0] == pytest.approx(evaluator.tempo)
+
+
+def test_batch_matches_single_evaluation(walk_states):
+    """The vectorized scores match the scalar path for every state, across chunks"""
+    evaluator = BatchEvaluator(chunk_size=7)
+    batch_scores = evaluator.evaluate(walk_states)
+    assert batch_scores.shape == (len(walk_states),)
+    for state, score in zip(walk_states, batch_scores):
+        assert score == pytest.approx(evaluator.evaluate_state(state))
+
+
+def test_captured_material_changes_score(board_state_generator):
+    """Removing a black queen is worth roughly a queen to white"""
+    evaluator = BatchEvaluator()
+    base = board_state_generator([("e1", "w_king"), ("e8", "b_king"), ("d8", "b_queen")])
+    without_queen = board_state_generator([("e1", "w_king"), ("e8", "b_king")])
+    scores = evaluator.evaluate([base.state, without_queen.state])
+    assert scores[1] - scores[0] > 800
+
+
+def test_save_and_load(tmp_path):
+    """Weights survive a round trip through an .npz file"""
+    evaluator = BatchEvaluator(np.arange(64 * 13).reshape(64, 13), [1, 2, 3, 4], tempo=7)
+    evaluator.save(str(tmp_path / "weights.npz"))
+    loaded = BatchEvaluator.load(str(tmp_path / "weights.npz"))
+    state = MainEngine().state
+    assert loaded.evaluate_state(state) == evaluator.evaluate_state(state)
+    assert loaded.tempo == 7 and np.array_equal(loaded.castle_weights, [1, 2, 3, 4])
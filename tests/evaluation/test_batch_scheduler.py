@@ -0,0 +1,69 @@
+"""Unit tests for the batched leaf-evaluation scheduler"""
+import asyncio
+import random
+import numpy as np
+import pytest
+from src.evaluation.batch_evaluator import BatchEvaluator
+from src.evaluation.batch_scheduler import BatchScheduler, run_greedy_self_play
+from src.main_engine import MainEngine
+
+
+def random_states(n_states: int, seed: int=1) -> list[list]:
+    """States along a random game, restarted when it ends"""
+    rand, engine, states = random.Random(seed), MainEngine(), []
+    while len(states) < n_states:
+        moves = engine.get_all_moves()
+        if not moves:
+            engine = MainEngine()
+            continue
+        engine.execute_instructions(rand.choice(moves))
+        states.append(engine.state.copy())
+    return states
+
+
+async def evaluate_all(scheduler: BatchScheduler, states: list[list]) -> list[float]:
+    """Requests every state from its own coroutine"""
+    return await asyncio.gather(*(scheduler.evaluate(state) for state in states))
+
+
+def test_scores_match_direct_evaluation():
+    """Each coroutine gets its own state's score, batches fill up to batch_size"""
+    evaluator = BatchEvaluator()
+    states = random_states(100)
+    scheduler = BatchScheduler(evaluator.evaluate, batch_size=32, max_latency=0.01)
+    scores = asyncio.run(evaluate_all(scheduler, states))
+    assert np.allclose(scores, evaluator.evaluate(states))
+    # Three full batches and the last 4 states once the latency timer fires
+    assert scheduler.n_positions == 100 and scheduler.n_batches == 4
+    assert scheduler.mean_batch_size == 25.0 and scheduler.evals_per_sec > 0
+
+
+def test_latency_flush():
+    """A lone request is evaluated once max_latency has passed"""
+    scheduler = BatchScheduler(BatchEvaluator().evaluate, batch_size=1000, max_latency=0.001)
+    score = asyncio.run(scheduler.evaluate(MainEngine().state))
+    assert score == pytest.approx(BatchEvaluator().evaluate_state(MainEngine().state))
+    assert scheduler.n_batches == 1
+
+
+def test_errors_reach_every_request():
+    """An exception in the batch evaluation is raised in every waiting coroutine"""
+    def failing_evaluation(boards: np.ndarray) -> np.ndarray:
+        raise RuntimeError(f"{len(boards)} boards")
+
+    async def gather_errors():
+        scheduler = BatchScheduler(failing_evaluation, batch_size=3)
+        return await asyncio.gather(*(scheduler.evaluate(MainEngine().state) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(gather_errors())
+    assert [str(error) for error in errors] == ["3 boards"] * 3
+
+
+def test_greedy_self_play_batches_games():
+    """Concurrent games share batches"""
+    report = run_greedy_self_play(BatchEvaluator().evaluate, n_games=8, batch_size=64,
+                                  max_plies=6)
+    assert report["plies"] == 48
+    assert report["mean_batch_size"] > 20
+    assert report["positions"] == report["mean_batch_size"] * report["batches"]
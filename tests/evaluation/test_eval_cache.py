@@ -0,0 +1,75 @@
+"""Unit tests for the bounded Zobrist evaluation cache"""
+import pytest
+from src.main_engine import MainEngine
+from src.resources.data_translators import SQUARE_IDX, SQUARE_STATES
+from src.evaluation.eval_cache import EvalCache
+from src.evaluation.batch_evaluator import BatchEvaluator
+
+
+@pytest.mark.parametrize("two_way", [True, False])
+def test_store_and_probe(two_way):
+    """A stored score can be probed back and unknown keys miss"""
+    cache = EvalCache(size_bits=4, two_way=two_way)
+    assert cache.probe(12345) is None
+    cache.store(12345, 1.5)
+    assert cache.probe(12345) == 1.5
+    assert cache.probes == 2 and cache.hits == 1
+    assert cache.hit_rate == 0.5
+
+
+def test_zero_key_is_not_an_empty_slot():
+    """Empty slots have a key of 0 but must not report a hit for it"""
+    cache = EvalCache(size_bits=4)
+    assert cache.probe(0) is None
+    cache.store(0, -3.0)
+    assert cache.probe(0) == -3.0
+
+
+def test_two_way_bucket_keeps_two_colliding_keys():
+    """Two keys with the same low bits share a bucket, a third evicts the oldest"""
+    cache = EvalCache(size_bits=4, two_way=True)
+    first, second, third = 1, 1 + (1 << 4), 1 + (2 << 4)
+    cache.store(first, 1.0)
+    cache.store(second, 2.0)
+    assert cache.probe(first) == 1.0 and cache.probe(second) == 2.0
+    cache.store(third, 3.0)
+    assert cache.probe(first) is None
+    assert cache.probe(second) == 2.0 and cache.probe(third) == 3.0
+
+
+def test_always_replace():
+    """Without buckets a colliding key replaces the previous entry"""
+    cache = EvalCache(size_bits=4, two_way=False)
+    cache.store(1, 1.0)
+    cache.store(1 + (1 << 4), 2.0)
+    assert cache.probe(1) is None
+
+
+def test_clear_and_resize():
+    """Clearing empties the cache while resizing keeps entries that still fit"""
+    cache = EvalCache(size_bits=4)
+    for key in range(10):
+        cache.store(key, float(key))
+    assert len(cache) == 10
+    cache.resize(8)
+    assert cache.n_slots == 2 * 256
+    assert all(cache.probe(key) == float(key) for key in range(10))
+    cache.clear()
+    assert len(cache) == 0 and cache.probes == 0
+
+
+def test_transposition_is_a_single_probe(engine: MainEngine):
+    """Reaching the same position by two move orders only evaluates it once"""
+    calls = []
+    evaluator = BatchEvaluator()
+    def counting_eval(state):
+        calls.append(state)
+        return evaluator.evaluate_state(state)
+
+    cache = EvalCache(size_bits=10)
+    start_score = cache.evaluate(engine, counting_eval)
+    for square_from, square_to in (("g1", "f3"), ("g8", "f6"), ("f3", "g1"), ("f6", "g8")):
+        engine.execute_instructions((SQUARE_IDX[square_from], engine.state[SQUARE_IDX[square_from]],
+                                     SQUARE_IDX[square_to], SQUARE_STATES["empty"]))
+    assert cache.evaluate(engine, counting_eval) == start_score
+    assert len(calls) == 1
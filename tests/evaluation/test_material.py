@@ -0,0 +1,68 @@
+"""Unit tests for the material key, material table and material evaluation"""
+import pytest
+from src.main_engine import MainEngine
+from src.resources.material_table import MATERIAL_TABLE, MAX_PHASE, SUFFICIENT_MATERIAL_FLAG,\
+    DRAWISH_FLAG, material_counts
+from src.evaluation.material import evaluate_material
+
+KINGS = [("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8")]
+
+
+def test_material_key_counts_pieces(engine: MainEngine):
+    """The starting key unpacks into the starting piece counts"""
+    counts = material_counts(engine.material_key)
+    assert counts == [0, 8, 2, 2, 2, 1, 0, 8, 2, 2, 2, 1, 0]
+
+
+def test_start_position_entry(engine: MainEngine):
+    """The starting material is balanced, in the opening phase and sufficient"""
+    entry = MATERIAL_TABLE[engine.material_key]
+    assert entry.imbalance == 0
+    assert entry.phase == MAX_PHASE
+    assert entry.flags & SUFFICIENT_MATERIAL_FLAG
+    assert entry.endgame is None
+
+
+def test_capture_updates_material_key(board_state_generator):
+    """Capturing a rook removes it from the key and reversing puts it back"""
+    engine = board_state_generator(KINGS + [(66, 0), ("d4", "w_queen"), ("d7", "b_rook")])
+    start_key = engine.material_key
+    engine.execute_instructions((35, 5, 11, 10))
+    assert material_counts(engine.material_key)[10] == 0
+    assert MATERIAL_TABLE[engine.material_key].endgame == "KXK"
+    engine.reverse_last_instruction()
+    assert engine.material_key == start_key
+
+
+ENDGAME_CASES = {
+    "KBNK_W": ([("c3", "w_bishop"), ("c4", "w_knight")], "KBNK", True),
+    "KBNK_B": ([("c3", "b_bishop"), ("c4", "b_knight")], "KBNK", False),
+    "KRK_B": ([("c3", "b_rook")], "KXK", False),
+    "KPK_W": ([("c3", "w_pawn")], "KPK", True),
+    "KRKR": ([("c3", "w_rook"), ("c4", "b_rook")], None, True),
+}
+
+
+@pytest.mark.parametrize("test_key", ENDGAME_CASES.keys())
+def test_endgame_detection(board_state_generator, test_key):
+    """Special endgames are named by the table with the side trying to win"""
+    mods, endgame, strong_side_white = ENDGAME_CASES[test_key]
+    entry = MATERIAL_TABLE[board_state_generator(KINGS + mods).material_key]
+    assert entry.endgame == endgame
+    if endgame is not None:
+        assert entry.strong_side_white is strong_side_white
+
+
+def test_evaluate_material(board_state_generator):
+    """Insufficient material is a dead draw, drawish material is scaled down and
+    the lone king scores better for the strong side on the edge than in the center"""
+    assert evaluate_material(board_state_generator(KINGS + [("c3", "w_knight")])) == 0.0
+    rook_vs_bishop = board_state_generator(KINGS + [("c3", "w_rook"), ("c4", "b_bishop")])
+    assert MATERIAL_TABLE[rook_vs_bishop.material_key].flags & DRAWISH_FLAG
+    assert 0 < evaluate_material(rook_vs_bishop) < 170 / 2
+
+    edge = board_state_generator([("e1", "w_king"), (65, "e1"), ("a4", "b_king"), (64, "a4"),
+                                  ("h7", "w_queen")])
+    center = board_state_generator([("e1", "w_king"), (65, "e1"), ("d4", "b_king"), (64, "d4"),
+                                    ("h7", "w_queen")])
+    assert evaluate_material(edge) > evaluate_material(center) > 0
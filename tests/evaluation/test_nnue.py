@@ -0,0 +1,73 @@
+"""Unit tests for the NumPy NNUE evaluator"""
+import random
+import numpy as np
+import pytest
+from src.main_engine import MainEngine
+from src.evaluation.batch_evaluator import pack_states
+from src.evaluation.nnue import NNUEEvaluator, benchmark
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.int16])
+def test_incremental_matches_refresh(dtype):
+    """Accumulator updates through a game and back match evaluating from scratch"""
+    random.seed(99)
+    evaluator = NNUEEvaluator.random(hidden_size=32, hidden2_size=8, dtype=dtype)
+    engine = MainEngine()
+    evaluator.refresh(engine.state)
+    scores = [evaluator.evaluate()]
+    for _ in range(80):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        move = random.choice(moves)
+        engine.execute_instructions(move)
+        evaluator.execute_instructions(move)
+        scores.append(evaluator.evaluate())
+        assert scores[-1] == pytest.approx(evaluator.evaluate_state(engine.state), abs=1e-3)
+
+    while engine.state_stack:
+        engine.reverse_last_instruction()
+        evaluator.reverse_last_instruction()
+    assert evaluator.ply == 0
+    assert evaluator.evaluate() == scores[0]
+
+
+def test_int16_close_to_float():
+    """Quantizing the first layer only changes the evaluation slightly"""
+    float_evaluator = NNUEEvaluator.random(dtype=np.float32)
+    int_evaluator = NNUEEvaluator.random(dtype=np.int16)
+    state = MainEngine().state
+    assert int_evaluator.evaluate_state(state) ==\
+        pytest.approx(float_evaluator.evaluate_state(state), abs=5)
+
+
+def test_batch_matches_single():
+    """Evaluating packed states together matches one at a time"""
+    random.seed(7)
+    engine = MainEngine()
+    states = [engine.state.copy()]
+    for _ in range(20):
+        engine.execute_instructions(random.choice(engine.get_all_moves()))
+        states.append(engine.state.copy())
+    evaluator = NNUEEvaluator.random(hidden_size=32, hidden2_size=8)
+    batch_scores = evaluator.evaluate_batch(pack_states(states))
+    for state, score in zip(states, batch_scores):
+        assert score == pytest.approx(evaluator.evaluate_state(state), abs=1e-3)
+
+
+def test_save_and_load(tmp_path):
+    """Saved weights load back into the same network"""
+    evaluator = NNUEEvaluator.random(hidden_size=16, hidden2_size=4)
+    evaluator.save(tmp_path / "weights.npz")
+    loaded = NNUEEvaluator.load(tmp_path / "weights.npz")
+    state = MainEngine().state
+    assert loaded.evaluate_state(state) == pytest.approx(evaluator.evaluate_state(state))
+
+
+def test_benchmark_reports_both_paths():
+    """The benchmark times incremental and full evaluation over the same positions"""
+    results = benchmark(NNUEEvaluator.random(hidden_size=16, hidden2_size=4),
+                        n_games=2, max_turns=10)
+    assert results["evaluations"] == 20
+    assert results["incremental_evals_per_sec"] > 0
+    assert results["full_recompute_evals_per_sec"] > 0
@@ -0,0 +1,47 @@
+"""Unit tests for the pawn structure evaluation and its pawn hash cache"""
+import random
+import pytest
+from src.main_engine import MainEngine
+from src.evaluation.pawn_structure import evaluate_pawn_structure, PawnStructureEvaluator,\
+    DOUBLED_PAWN_SCORE, ISOLATED_PAWN_SCORE, PASSED_PAWN_SCORES
+
+KINGS = [("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8")]
+
+PAWN_STRUCTURE_CASES = {
+    "NO_PAWNS": ([], 0),
+    "START_POSITION": (None, 0),
+    "W_PASSED_ISOLATED": ([("d5", "w_pawn")], PASSED_PAWN_SCORES[3] + ISOLATED_PAWN_SCORE),
+    "B_PASSED_ISOLATED": ([("d4", "b_pawn")], -PASSED_PAWN_SCORES[3] - ISOLATED_PAWN_SCORE),
+    "BLOCKED_BY_ADJACENT_FILE": ([("d4", "w_pawn"), ("e6", "b_pawn")],
+                                 ISOLATED_PAWN_SCORE - ISOLATED_PAWN_SCORE),
+    "PASSED_BESIDE_ENEMY": ([("d5", "w_pawn"), ("e5", "b_pawn")],
+                           PASSED_PAWN_SCORES[3] - PASSED_PAWN_SCORES[2]),
+    "W_DOUBLED": ([("c2", "w_pawn"), ("c3", "w_pawn"), ("d2", "w_pawn"), ("c7", "b_pawn"),
+                   ("d7", "b_pawn")], DOUBLED_PAWN_SCORE),
+}
+
+
+@pytest.mark.parametrize("test_key", PAWN_STRUCTURE_CASES.keys())
+def test_evaluate_pawn_structure(board_state_generator, test_key):
+    """Checks the doubled, isolated and passed pawn terms on small positions"""
+    mods, expected = PAWN_STRUCTURE_CASES[test_key]
+    engine = MainEngine() if mods is None else board_state_generator(KINGS + mods)
+    assert evaluate_pawn_structure(engine.state) == expected
+
+
+def test_cache_is_probed_by_pawn_hash():
+    """Positions sharing a pawn structure are only evaluated once during a search-like walk"""
+    random.seed(4321)
+    engine = MainEngine()
+    evaluator = PawnStructureEvaluator(size_bits=10)
+    for _ in range(40):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        # Evaluate every child like a one ply search would
+        for move in moves:
+            engine.execute_instructions(move)
+            assert evaluator.evaluate(engine) == evaluate_pawn_structure(engine.state)
+            engine.reverse_last_instruction()
+        engine.execute_instructions(random.choice(moves))
+    assert evaluator.cache.hit_rate > 0.5
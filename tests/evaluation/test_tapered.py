@@ -0,0 +1,58 @@
+"""Unit tests for the tapered evaluation and the engine's game phase counter"""
+import random
+import pytest
+from src.main_engine import MainEngine
+from src.resources.material_table import MAX_PHASE
+from src.resources.piece_square_tables import MG_SQUARE_STATE_TABLE, EG_SQUARE_STATE_TABLE
+from src.evaluation.tapered import TaperedEngine, square_state_score, tapered_score
+
+
+def test_phase_counter(engine: MainEngine, board_state_generator):
+    """The phase starts at MAX_PHASE and only counts knights, bishops, rooks and queens"""
+    assert engine.phase == MAX_PHASE
+    kings_and_pawns = board_state_generator([("e1", "w_king"), ("e8", "b_king"),
+                                             ("a2", "w_pawn"), ("h7", "b_pawn")])
+    assert kings_and_pawns.phase == 0
+
+
+def test_phase_follows_captures_and_promotions(board_state_generator):
+    """Capturing a rook drops the phase by 2 and promoting to a queen adds 4"""
+    engine = board_state_generator([("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8"),
+                                    (66, 0), ("b7", "w_pawn"), ("a8", "b_rook")])
+    assert engine.phase == 2
+    for move in engine.get_all_moves():
+        engine.execute_instructions(move)
+        assert engine.phase == MainEngine(engine.state.copy()).phase
+        engine.reverse_last_instruction()
+        assert engine.phase == 2
+    queen_captures_rook = [move for move in engine.get_all_moves()
+                           if len(move) == 12 and move[9] == 5 and move[10] == 0]
+    engine.execute_instructions(queen_captures_rook[0])
+    assert engine.phase == 4
+
+
+def test_tapered_score_blend():
+    """The full phase is all middlegame, phase 0 is all endgame"""
+    assert tapered_score(100, 300, MAX_PHASE) == 100
+    assert tapered_score(100, 300, 0) == 300
+    assert tapered_score(100, 300, MAX_PHASE // 2) == 200
+    assert tapered_score(100, 300, MAX_PHASE + 4) == 100
+
+
+def test_incremental_scores_match_scan():
+    """The tracked scores match a full board scan through a game and back"""
+    random.seed(2024)
+    engine = TaperedEngine()
+    start_evaluation = engine.evaluate()
+    for _ in range(120):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        engine.execute_instructions(random.choice(moves))
+        assert engine.mg_score == pytest.approx(
+            square_state_score(engine.state, MG_SQUARE_STATE_TABLE))
+        assert engine.eg_score == pytest.approx(
+            square_state_score(engine.state, EG_SQUARE_STATE_TABLE))
+    while engine.state_stack:
+        engine.reverse_last_instruction()
+    assert engine.evaluate() == start_evaluation
@@ -0,0 +1,110 @@
+"""Unit tests for the instrumented engine counters"""
+import random
+from src.evaluation.tapered import TaperedEngine
+from src.instrumented_engine import (INSTRUMENT_ENV_VAR, InstrumentationMixin, InstrumentedEngine,
+                                     collecting_counters, get_engine_class, instrumented,
+                                     make_engine)
+from src.main_engine import MainEngine
+from src.main_engine_adapter import MainEngineAdapter
+from src.tournament import play_scheduled_game
+
+
+def test_plays_like_main_engine():
+    """The instrumented engine generates the same moves and counts them"""
+    rand = random.Random(4)
+    engine, instrumented_engine = MainEngine(), InstrumentedEngine()
+    for _ in range(60):
+        moves = engine.get_all_moves()
+        assert instrumented_engine.get_all_moves() == moves
+        if not moves:
+            break
+        move = rand.choice(moves)
+        engine.execute_instructions(move)
+        instrumented_engine.execute_instructions(move)
+    counters = instrumented_engine.counters
+    assert counters["calls", "get_all_moves"] == counters["filter", "positions"] > 0
+    assert sum(count for (category, _), count in counters.items()
+               if category == "moves_generated") == counters["filter", "moves_in"]
+    assert counters["filter", "rejected"] >= counters["pins", "found"]
+    instrumented_engine.reset_counters()
+    assert not instrumented_engine.counters
+
+
+def test_main_engine_untouched():
+    """MainEngine keeps its own methods and has no counters"""
+    assert not hasattr(MainEngine(), "counters")
+    assert InstrumentationMixin not in MainEngine.__mro__
+    for name in ("_filter_illegal_moves", "_move_reveals_check", "execute_instructions"):
+        assert getattr(MainEngine, name).__module__ == "src.main_engine"
+        assert getattr(InstrumentedEngine, name) is not getattr(MainEngine, name)
+
+
+def test_check_and_pin_counters():
+    """Checks, double checks, pins and castle rewrites are counted"""
+    engine = InstrumentedEngine.from_fen("4k3/8/8/8/1b6/8/3N4/4K2r w - - 0 1")
+    engine.get_all_moves()
+    assert engine.counters["checks", "in_check"] == 1
+    assert engine.counters["checks", "unblockable"] + engine.counters["checks", "blockable"] == 1
+
+    engine = InstrumentedEngine.from_fen("4k3/8/8/8/7b/8/4N3/r3K3 w - - 0 1")
+    engine.get_all_moves()
+    assert engine.counters["checks", "double_check"] == 1
+
+    engine = InstrumentedEngine.from_fen("4r1k1/8/8/8/8/8/4B3/4K3 w - - 0 1")
+    engine.get_all_moves()
+    assert engine.counters["pins", "found"] > 0
+    assert engine.counters["pins", "rays_walked"] <= engine.counters["pins", "checked"]
+
+    engine = InstrumentedEngine.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    engine.get_all_moves()
+    assert engine.counters["castle", "rewritten"] == 2
+    assert engine.counters["moves_generated", "castle"] == 2
+    assert "castle rewritten" in engine.format_report()
+    assert engine.report()["castle"]["rewritten"] == 2
+
+
+def test_instrumented_subclass():
+    """Subclasses of MainEngine keep their behaviour when instrumented"""
+    engine_class = instrumented(TaperedEngine)
+    engine, plain_engine = engine_class(), TaperedEngine()
+    move = engine.get_all_moves()[0]
+    engine.execute_instructions(move)
+    plain_engine.execute_instructions(move)
+    assert engine.evaluate() == plain_engine.evaluate()
+    assert engine.counters["calls", "execute_instructions"] == 1
+
+
+def test_selection(monkeypatch):
+    """The engine class is picked by argument or environment"""
+    assert type(make_engine(instrumented_engine=True)) is InstrumentedEngine
+    monkeypatch.setenv(INSTRUMENT_ENV_VAR, "1")
+    assert type(make_engine()) is InstrumentedEngine
+    assert type(make_engine(instrumented_engine=False)) is MainEngine
+    assert get_engine_class() is InstrumentedEngine
+    monkeypatch.setenv(INSTRUMENT_ENV_VAR, "0")
+    assert type(make_engine()) is MainEngine
+    assert get_engine_class() is MainEngine
+
+
+def test_workloads_follow_the_environment(monkeypatch):
+    """The environment variable instruments the engines of the real workloads"""
+    game = ("random_move", "random_move", 3)
+    assert "counters" not in play_scheduled_game(game, max_plies=10)
+    assert type(MainEngineAdapter().engine) is MainEngine
+    monkeypatch.setenv(INSTRUMENT_ENV_VAR, "1")
+    result = play_scheduled_game(game, max_plies=10)
+    assert result["counters"]["calls"]["get_all_moves"] >= result["plies"]
+    assert type(MainEngineAdapter().engine) is InstrumentedEngine
+
+
+def test_collecting_counters():
+    """Engines created inside the block share its counter, others keep their own"""
+    outside = InstrumentedEngine()
+    with collecting_counters() as counters:
+        engines = [InstrumentedEngine(), InstrumentedEngine()]
+    for engine in engines:
+        engine.get_all_moves()
+    outside.get_all_moves()
+    assert counters["calls", "get_all_moves"] == 2
+    assert outside.counters["calls", "get_all_moves"] == 1
+    assert InstrumentedEngine().counters is not counters
@@ -1,9 +1,12 @@
 """Unit Tests for the MainEngine class"""
-from collections import deque
+import random
+from collections import Counter, deque
 import pytest
 from tests.prototyping.pytest_resources import BASE_STATE_ASCII, START_STATE_ASCII
 from src.resources.data_translators import SQUARE_IDX, SQUARE_STATES
-from src.main_engine import MainEngine
+from src.resources.zobrist_hashes import ZOBRIST_TABLE
+from src.main_engine import MOVE_BOUNDS, MOVE_GENERATOR_NAMES, MainEngine,\
+    instruction_square_changes
 
 
 STARTING_LIST_STATE =\
@@ -222,3 +225,219 @@ def test_get_notation_from_state():
 def test_play_game_from_notation():
     # TODO
     pass
+
+
+PROMOTION_AND_EN_PASSANT_STATES = {
+    "W_PROMOTION": ([("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8"),
+                     ("b7", "w_pawn"), ("a8", "b_rook")], "white"),
+    "B_PROMOTION": ([("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8"),
+                     ("g2", "b_pawn"), ("h1", "w_knight")], "black"),
+    "W_EN_PASSANT": ([("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8"),
+                      ("d5", "w_pawn"), ("e5", "b_pawn"), (67, "e")], "white"),
+    "B_EN_PASSANT": ([("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8"),
+                      ("c4", "b_pawn"), ("b4", "w_pawn"), (67, "b")], "black"),
+}
+
+
+@pytest.mark.parametrize("test_key", PROMOTION_AND_EN_PASSANT_STATES.keys())
+def test_execute_and_reverse_every_move(board_state_generator, test_key):
+    """Every legal move keeps the hashes consistent with the board and is fully reversed"""
+    mods, player = PROMOTION_AND_EN_PASSANT_STATES[test_key]
+    engine = board_state_generator(mods + [(66, 0), (68, player)])
+    start_state = engine.state.copy()
+    start_keys = (hash(engine), engine.pawn_hash, engine.material_key)
+    for move in engine.get_all_moves():
+        engine.execute_instructions(move)
+        fresh_engine = MainEngine(engine.state.copy())
+        assert hash(engine) == hash(fresh_engine)
+        assert engine.pawn_hash == fresh_engine.pawn_hash
+        assert engine.material_key == fresh_engine.material_key
+        engine.reverse_last_instruction()
+        assert engine.state == start_state
+        assert (hash(engine), engine.pawn_hash, engine.material_key) == start_keys
+
+
+@pytest.mark.parametrize("test_key", PROMOTION_AND_EN_PASSANT_STATES.keys())
+def test_instruction_square_changes(board_state_generator, test_key):
+    """Applying the listed square changes gives the same board as executing the move"""
+    mods, player = PROMOTION_AND_EN_PASSANT_STATES[test_key]
+    engine = board_state_generator(mods + [(66, 0), (68, player)])
+    for move in engine.get_all_moves():
+        board = engine.state[:64]
+        for square_idx, old_state, new_state in instruction_square_changes(move):
+            assert board[square_idx] == old_state
+            board[square_idx] = new_state
+        engine.execute_instructions(move)
+        assert board == engine.state[:64]
+        engine.reverse_last_instruction()
+
+
+def test_pawn_hash_only_tracks_pawns(engine: MainEngine):
+    """Piece moves leave the pawn hash alone while pawn moves change it"""
+    start_pawn_hash = engine.pawn_hash
+    engine.execute_instructions((SQUARE_IDX["g1"], SQUARE_STATES["w_knight"],
+                                 SQUARE_IDX["f3"], SQUARE_STATES["empty"]))
+    assert engine.pawn_hash == start_pawn_hash
+    engine.execute_instructions((SQUARE_IDX["e7"], SQUARE_STATES["b_pawn"],
+                                 SQUARE_IDX["e5"], SQUARE_STATES["empty"]))
+    assert engine.pawn_hash != start_pawn_hash
+    assert engine.pawn_hash == MainEngine(engine.state.copy()).pawn_hash
+
+
+def test_zobrist_values_are_not_rehashed():
+    """Zobrist values fit in a signed 64-bit int, so hash() returns the incremental key
+    unchanged and it keeps matching a fresh computation"""
+    assert all(value < 2 ** 63 for square in ZOBRIST_TABLE.values() for value in square.values())
+    rand = random.Random(28)
+    engine = MainEngine()
+    for _ in range(60):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        engine.execute_instructions(rand.choice(moves))
+        assert hash(engine) == engine.hash == hash(MainEngine(engine.state.copy()))
+
+
+@pytest.mark.parametrize("test_key", ["W_PROMOTION", "B_PROMOTION"])
+def test_promotion_hash_and_reverse(board_state_generator, test_key):
+    """Promotions take the pawn out of the full hash and reversing one puts the pawn back on
+    its square"""
+    mods, player = PROMOTION_AND_EN_PASSANT_STATES[test_key]
+    engine = board_state_generator(mods + [(66, 0), (68, player)])
+    start_state, start_hash = engine.state.copy(), hash(engine)
+    promotions = [move for move in engine.get_all_moves() if len(move) > 8
+                  and move[0] == move[2]]
+    assert promotions
+    for move in promotions:
+        engine.execute_instructions(move)
+        assert engine.state[move[0]] == 0
+        assert hash(engine) == hash(MainEngine(engine.state.copy()))
+        engine.reverse_last_instruction()
+        assert engine.state == start_state and hash(engine) == start_hash
+
+
+@pytest.mark.parametrize("mods, player, illegal_square", [
+    ([("f1", "w_king"), (65, "f1"), ("h1", "b_rook"), ("a8", "b_king"), (64, "a8")], True, "e1"),
+    ([("d5", "b_king"), (64, "d5"), ("g8", "w_bishop"), ("h1", "w_king"), (65, "h1")],
+     False, "c4"),
+    ([("e4", "w_king"), (65, "e4"), ("e8", "b_queen"), ("a8", "b_king"), (64, "a8"),
+      ("c5", "b_knight")], True, "e3"),
+])
+def test_king_cannot_retreat_along_check(board_state_generator, mods, player, illegal_square):
+    """A king in check by a slider can't step away along the line of the attack"""
+    engine = board_state_generator(mods + [(66, 0), (68, player)])
+    king_idx = engine.state[65 if player else 64]
+    moves = engine.get_all_moves()
+    assert moves
+    assert (king_idx, engine.state[king_idx], SQUARE_IDX[illegal_square], 0) not in moves
+    assert all(move[2] != SQUARE_IDX[illegal_square] for move in moves)
+
+
+def test_king_restored_when_check_filter_raises(board_state_generator, monkeypatch):
+    """The king lifted off the board by the in-check filter is put back on an error"""
+    engine = board_state_generator([("f1", "w_king"), (65, "f1"), ("h1", "b_rook"),
+                                    ("a8", "b_king"), (64, "a8"), (66, 0), (68, True)])
+    state = engine.state.copy()
+    def raise_error(*_):
+        raise RuntimeError("filter failed")
+    monkeypatch.setattr(engine, "_filter_moves_blockable_check", raise_error)
+    with pytest.raises(RuntimeError):
+        engine.get_all_moves()
+    assert engine.state == state
+
+
+def test_from_fen_and_to_fen(engine: MainEngine):
+    """FEN strings load into engines with the same hash as the moves that reach them"""
+    for move in [(SQUARE_IDX["e2"], SQUARE_STATES["w_pawn"], SQUARE_IDX["e4"], 0,
+                  0b1111, 0b1111, -1, 4)]:
+        assert move in engine.get_all_moves()
+        engine.execute_instructions(move)
+    fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+    assert engine.to_fen() == fen
+    loaded = MainEngine.from_fen(fen)
+    assert loaded.state == engine.state and hash(loaded) == hash(engine)
+    assert loaded.pawn_hash == engine.pawn_hash and loaded.material_key == engine.material_key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_playout_matches_execute_instructions(seed):
+    """A playout plays the same game as executing the same sampled moves, and leaves the
+    engine as it was"""
+    rand, engine = random.Random(seed), MainEngine()
+    plies = 0
+    while plies < 120:
+        move = engine.sample_random_move(rand)
+        if move is None or not engine.sufficient_material():
+            break
+        engine.execute_instructions(move)
+        plies += 1
+    start = MainEngine()
+    state, engine_hash = start.state.copy(), hash(start)
+    result = start.playout(120, random.Random(seed))
+    assert result.plies == plies
+    assert start.state == state and hash(start) == engine_hash and not start.state_stack
+    assert start.material_key == MainEngine(state.copy()).material_key
+
+
+@pytest.mark.parametrize("fen, max_plies, halfmove_clock, expected", [
+    ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 0, 0, (0.5, "max_plies", 0)),
+    ("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1", 10, 0, (1.0, "checkmate", 0)),
+    ("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1", 10, 0, (0.5, "stalemate", 0)),
+    ("k7/8/1K6/8/8/8/8/8 w - - 0 1", 10, 100, (0.5, "fifty_move", 0)),
+    ("k7/8/8/8/8/8/8/K6r w - - 0 1", 10, 0, (0.5, "max_plies", 10)),
+])
+def test_playout_terminations(fen, max_plies, halfmove_clock, expected):
+    """Playouts stop on mate, stalemate, the fifty move rule and the ply cap"""
+    assert tuple(MainEngine.from_fen(fen).playout(max_plies, random.Random(0), halfmove_clock))\
+        == expected
+
+
+def test_playout_insufficient_material():
+    """Capturing the last piece that could mate ends the playout"""
+    engine = MainEngine.from_fen("k7/8/8/8/8/8/8/Kq6 w - - 0 1")
+    assert tuple(engine.playout(10, random.Random(0))) == (0.5, "insufficient_material", 1)
+
+
+def test_move_bounds_hold(engine: MainEngine):
+    """No piece ever has more pseudo-legal moves than its MOVE_BOUNDS entry"""
+    rand = random.Random(7)
+    for _ in range(20):
+        while True:
+            for square_idx, square_state in enumerate(engine.state[:64]):
+                if square_state:
+                    moves = getattr(engine, MOVE_GENERATOR_NAMES[square_state])(square_idx)
+                    assert len(moves) <= MOVE_BOUNDS[square_state][square_idx]
+            moves = engine.get_all_moves()
+            if not moves or len(engine.state_stack) > 150:
+                break
+            engine.execute_instructions(rand.choice(moves))
+        while engine.state_stack:
+            engine.reverse_last_instruction()
+
+
+@pytest.mark.parametrize("fen", [
+    "r3k2r/pppq1ppp/2np1n2/2b1p1B1/2B1P1b1/2NP1N2/PPPQ1PPP/R3K2R w KQkq - 0 1",
+    "4k3/1P6/8/3pP3/8/8/6p1/R3K2R w KQ d6 0 1",
+    "4k3/8/8/8/1b6/8/3P4/4K3 w - - 0 1",
+    "4k3/8/8/8/8/8/4r3/4K3 w - - 0 1",
+])
+def test_sample_random_move_is_uniform(fen):
+    """Sampled moves follow the same uniform distribution as random.choice(get_all_moves())
+    (chi-square test), and are always legal"""
+    engine = MainEngine.from_fen(fen)
+    moves = engine.get_all_moves()
+    rand = random.Random(fen)
+    n_samples = 200 * len(moves)
+    counts = Counter(engine.sample_random_move(rand) for _ in range(n_samples))
+    assert set(counts) == set(moves)
+    expected = n_samples / len(moves)
+    chi_square = sum((count - expected) ** 2 / expected for count in counts.values())
+    # Well past the 0.999 quantile of the chi-square distribution for these dofs
+    dof = len(moves) - 1
+    assert chi_square < dof + 5 * (2 * dof) ** 0.5 + 5
+
+
+def test_sample_random_move_without_moves():
+    """Checkmate and stalemate have no move to sample"""
+    assert MainEngine.from_fen("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1").sample_random_move() is None
+    assert MainEngine.from_fen("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1").sample_random_move() is None
@@ -0,0 +1,119 @@
+"""Unit tests for the Monte-Carlo tree search"""
+from src.main_engine import MainEngine
+from src.mcts import MCTS, UNEXPANDED, MCTSStrategy, root_parallel_search
+from src.move_index import move_to_uci
+from src.strategies import ScoringStrategy, make_strategy
+from src.tournament import play_game
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+
+
+def check_tree(tree: MCTS):
+    """Children are consecutive ids and every node's visits add up"""
+    for node in range(len(tree)):
+        children = tree.children(node)
+        if tree.first_child[node] == UNEXPANDED:
+            assert not tree.n_children[node]
+        elif children:
+            # The visit that expanded the node isn't passed on to a child
+            assert sum(tree.visits[child] for child in children) in\
+                (tree.visits[node] - 1, tree.visits[node])
+
+
+def material_evaluation(engine: MainEngine) -> float:
+    """A white score from 0 to 1 from the material balance"""
+    balance = sum((1 if 0 < state < 7 else -1) for state in engine.state[:64] if state)
+    return 1 / (1 + 10 ** (-balance / 4))
+
+
+def test_finds_mate_in_one():
+    """The mating move is visited the most and scores as a win"""
+    tree = MCTS(MainEngine.from_fen(MATE_IN_ONE), rand_seed=1, playout_plies=20)
+    move = tree.search(iterations=300)
+    assert move_to_uci(move) == "a1a8"
+    statistics = {move_to_uci(child): (visits, value_sum)
+                  for child, visits, value_sum in tree.root_statistics()}
+    visits, value_sum = statistics["a1a8"]
+    assert value_sum == visits
+    assert tree.visits[0] == 300 and not tree.engine.state_stack
+    check_tree(tree)
+
+
+def test_terminal_root():
+    """A mated root has no moves"""
+    tree = MCTS(MainEngine.from_fen("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1"), rand_seed=1)
+    assert tree.search(iterations=5) is None and len(tree) == 1
+
+
+def test_advance_keeps_subtree():
+    """Playing a move keeps its subtree with the same statistics and compacts the arrays"""
+    tree = MCTS(rand_seed=3, evaluate=material_evaluation)
+    tree.search(iterations=400)
+    move = tree.best_move()
+    child = next(child for child in tree.children(0) if tree.moves[child] == move)
+    child_visits, child_value = tree.visits[child], tree.value_sums[child]
+    grandchildren = {tree.moves[grandchild]: tree.visits[grandchild]
+                     for grandchild in tree.children(child)}
+    n_nodes = len(tree)
+    tree.advance(move)
+    assert tree.visits[0] == child_visits and tree.value_sums[0] == child_value
+    assert {tree.moves[node]: tree.visits[node] for node in tree.children(0)} == grandchildren
+    assert len(tree) < n_nodes and len(tree.visits) == len(tree.first_child) == len(tree)
+    assert tree.engine.state_stack[-1] == move
+    check_tree(tree)
+    tree.search(iterations=50)
+    check_tree(tree)
+
+
+def test_advance_unknown_move_clears():
+    """A move outside the tree starts a new tree"""
+    tree = MCTS(rand_seed=3, evaluate=material_evaluation)
+    tree.search(iterations=10)
+    unvisited = next(tree.moves[child] for child in tree.children(0) if not tree.visits[child])
+    tree.advance(unvisited)
+    assert len(tree) == 1 and tree.engine.state_stack[-1] == unvisited
+
+
+def test_max_nodes_and_policy():
+    """The tree stops growing at max_nodes, priors come from the policy"""
+    def capture_policy(engine: MainEngine, moves: list[tuple]) -> list[float]:
+        return [2.0 if move[3] else 1.0 for move in moves]
+
+    tree = MCTS(rand_seed=5, max_nodes=100, evaluate=material_evaluation, policy=capture_policy)
+    tree.search(iterations=200)
+    assert len(tree) <= 100 and tree.visits[0] == 200
+    assert set(tree.priors) <= {1.0, 2.0}
+    assert tree.memory_bytes > 0
+    check_tree(tree)
+
+
+def test_root_parallel_search():
+    """Root statistics are summed over the trees"""
+    move, totals = root_parallel_search(MainEngine.from_fen(MATE_IN_ONE), iterations=100,
+                                        n_trees=2, processes=1, playout_plies=20)
+    assert move_to_uci(move) == "a1a8"
+    assert sum(visits for visits, _ in totals.values()) == 2 * 100 - 2
+    move, totals = root_parallel_search(MainEngine.from_fen(MATE_IN_ONE), iterations=50,
+                                        n_trees=2, processes=2, playout_plies=20)
+    assert sum(visits for visits, _ in totals.values()) == 2 * 50 - 2
+
+
+def test_strategy_reuses_tree():
+    """The strategy follows the game in its tree and plays legal moves"""
+    strategy = MCTSStrategy(7, iterations=30, evaluate=material_evaluation)
+    engine = MainEngine()
+    first_move = strategy.choose_move(engine, engine.get_all_moves())
+    engine.execute_instructions(first_move)
+    engine.execute_instructions(engine.get_all_moves()[0])
+    tree = strategy.tree
+    strategy.choose_move(engine, engine.get_all_moves())
+    assert strategy.tree is tree
+    result = play_game(MCTSStrategy(8, iterations=10, evaluate=material_evaluation),
+                       make_strategy("random_move", 9), max_plies=30)
+    assert result["plies"] <= 30
+
+
+def test_strategy_does_not_score_moves():
+    """MCTS chooses moves with its tree, it is not a scoring strategy"""
+    strategy = MCTSStrategy(7, iterations=10, evaluate=material_evaluation)
+    assert not isinstance(strategy, ScoringStrategy) and not hasattr(strategy, "score_move")
@@ -0,0 +1,119 @@
+"""Unit tests for the UCI/SAN move string index"""
+import random
+import pytest
+from src.main_engine import MainEngine
+from src.move_index import SQUARE_NAMES, MoveIndex, move_to_uci, parse_san
+from src.resources.data_translators import SQUARE_IDX
+
+
+def random_game_indexes(seed: int, n_plies: int=200) -> list[MoveIndex]:
+    """The move index of every position of a random game"""
+    random.seed(seed)
+    engine, indexes = MainEngine(), []
+    for _ in range(n_plies):
+        index = MoveIndex(engine)
+        if not index.moves:
+            break
+        indexes.append(index)
+        # Build the tables before the engine moves on
+        _ = index.move_ucis, index.move_sans
+        engine.execute_instructions(random.choice(index.moves))
+    return indexes
+
+
+def test_square_names():
+    """SQUARE_NAMES is the inverse of SQUARE_IDX"""
+    assert SQUARE_NAMES[0] == "a8" and SQUARE_NAMES[63] == "h1"
+    assert all(SQUARE_IDX[name] == idx for idx, name in enumerate(SQUARE_NAMES))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_strings_are_unique_and_round_trip(seed):
+    """Every legal move has its own UCI and SAN string which map back to it"""
+    for index in random_game_indexes(seed):
+        assert len(index.uci_moves) == len(index.moves) == len(index.san_moves)
+        for move in index.moves:
+            assert index.from_uci(index.to_uci(move)) == move
+            assert index.from_san(index.to_san(move, suffix=False)) == move
+            assert index.san_moves[index.to_san(move, suffix=False)] == move
+
+
+def test_starting_position(engine: MainEngine):
+    """Pawn pushes and knight moves in the starting position"""
+    index = MoveIndex(engine)
+    move = index.from_uci("e2e4")
+    assert move[:4] == (SQUARE_IDX["e2"], 1, SQUARE_IDX["e4"], 0)
+    assert index.to_san(move) == "e4" and index.from_san("e4") == move
+    assert index.to_san(index.from_uci("g1f3")) == "Nf3"
+    assert move in index and len(index) == 20
+
+
+def test_promotions_castles_and_checks():
+    """Promotion letters, castles in UCI and the check suffixes"""
+    engine = MainEngine.from_fen("1r2k3/P7/8/8/8/8/8/4K2R w K - 0 1")
+    index = MoveIndex(engine)
+    capture_promotion = index.from_uci("a7b8q")
+    assert index.to_san(capture_promotion) == "axb8=Q+"
+    assert index.from_san("axb8=Q") == capture_promotion
+    assert index.to_san(index.from_uci("a7a8n")) == "a8=N"
+    assert index.to_san(index.from_uci("a7a8r")) == "a8=R"
+    castle = index.from_san("O-O")
+    assert move_to_uci(castle) == "e1g1" and index.to_san(castle) == "O-O"
+
+
+def test_checkmate_suffix():
+    """A mating move ends with #"""
+    engine = MainEngine.from_fen("6k1/5ppp/8/8/8/8/8/R3K3 w - - 0 1")
+    index = MoveIndex(engine)
+    assert index.to_san(index.from_uci("a1a8")) == "Ra8#"
+    assert engine.state == MainEngine.from_fen("6k1/5ppp/8/8/8/8/8/R3K3 w - - 0 1").state
+
+
+def test_disambiguation():
+    """Origins are given by file, then rank, then square"""
+    engine = MainEngine.from_fen("k7/8/8/8/1Q5Q/8/8/1Q1K3R w - - 0 1")
+    index = MoveIndex(engine)
+    assert index.to_san(index.from_uci("h1e1"), suffix=False) == "Re1"
+    assert index.to_san(index.from_uci("b1b2"), suffix=False) == "Q1b2"
+    assert index.to_san(index.from_uci("h4e4"), suffix=False) == "Qhe4"
+    assert index.to_san(index.from_uci("b4e1"), suffix=False) == "Qbe1"
+    index = MoveIndex(MainEngine.from_fen("k7/8/8/8/8/Q7/8/Q1Q1K3 w - - 0 1"))
+    assert index.to_san(index.from_uci("a1b2"), suffix=False) == "Qa1b2"
+
+
+def test_loose_san():
+    """Missing capture marks and over-specified origins still resolve"""
+    engine = MainEngine.from_fen("4k3/8/8/3p4/4P3/8/8/4K3 w - - 0 1")
+    index = MoveIndex(engine)
+    assert index.from_san("ed5") == index.from_san("exd5") == index.from_uci("e4d5")
+    assert index.from_san("e4d5") == index.from_uci("e4d5")
+
+
+@pytest.mark.parametrize("san", ["Nf4", "Ke2", "O-O", "e5", "Nx", "e4=Q", "Nz3"])
+def test_from_san_errors(san):
+    """Illegal and unreadable moves raise ValueError"""
+    with pytest.raises(ValueError):
+        MoveIndex(MainEngine()).from_san(san)
+
+
+def test_parse_san():
+    """SAN moves split into their index key and origin"""
+    assert parse_san("Nbxd2+") == ((2, SQUARE_IDX["d2"], 0), "b", None)
+    assert parse_san("exf8=Q#") == ((1, SQUARE_IDX["f8"], 5), "e", None)
+    assert parse_san("Qh4e1") == ((5, SQUARE_IDX["e1"], 0), "h", "4")
+    assert parse_san("0-0-0") == ("O-O-O", None, None)
+
+
+def test_san_needs_disambiguation():
+    """Two knights reaching the same square need the origin file"""
+    engine = MainEngine.from_fen("4k3/8/8/8/8/8/4K3/1N3N2 w - - 0 1")
+    index = MoveIndex(engine)
+    with pytest.raises(ValueError):
+        index.from_san("Nd2")
+    assert index.from_san("Nbd2")[0] == SQUARE_IDX["b1"]
+
+
+def test_illegal_uci():
+    """UCI strings that aren't legal raise ValueError"""
+    with pytest.raises(ValueError):
+        MoveIndex(MainEngine()).from_uci("e2e5")
@@ -0,0 +1,110 @@
+"""Unit tests for the memory-mapped opening book"""
+import random
+import struct
+import pytest
+from src.main_engine import MainEngine
+from src.move_index import MoveIndex
+from src.opening_book import (HEADER_FORMAT, BookBuilder, BookStrategy, OpeningBook,
+                              encode_move)
+from src.strategies import make_strategy
+
+
+def uci_moves(ucis: list[str]) -> list[tuple]:
+    """The instruction sets of UCI moves played from the starting position"""
+    engine, moves = MainEngine(), []
+    for uci in ucis:
+        moves.append(MoveIndex(engine).from_uci(uci))
+        engine.execute_instructions(moves[-1])
+    return moves
+
+
+@pytest.fixture(name="book")
+def fixture_book(tmp_path) -> OpeningBook:
+    """A book of three short games"""
+    builder = BookBuilder(max_plies=3)
+    builder.add_game(uci_moves(["e2e4", "e7e5", "g1f3", "b8c6"]), 1.0)
+    builder.add_game(uci_moves(["e2e4", "c7c5"]), 0.5)
+    builder.add_game(uci_moves(["d2d4", "d7d5"]), None)
+    assert builder.write(str(tmp_path / "book.bin")) == 6
+    return OpeningBook(str(tmp_path / "book.bin"))
+
+
+def test_encode_move():
+    """Every legal move of a position has its own code"""
+    for fen in ("r3k2r/pPpp1ppp/8/8/8/8/PPPP1PpP/R3K2R w KQkq - 0 1",
+                "r3k2r/pPpp1ppp/8/8/8/8/PPPP1PpP/R3K2R b KQkq - 0 1"):
+        moves = MainEngine.from_fen(fen).get_all_moves()
+        assert len({encode_move(move) for move in moves}) == len(moves)
+
+
+def test_probe(book):
+    """Book moves come with their weights and outcomes for the player who made them"""
+    engine = MainEngine()
+    entries = {entry.move: entry for entry in book.probe(engine)}
+    e2e4, d2d4 = uci_moves(["e2e4"])[0], uci_moves(["d2d4"])[0]
+    assert set(entries) == {e2e4, d2d4}
+    assert entries[e2e4][1:] == (2, 1, 1, 0) and entries[e2e4].score == 0.75
+    assert entries[d2d4][1:] == (1, 0, 0, 0) and entries[d2d4].score is None
+
+    engine.execute_instructions(e2e4)
+    replies = {entry.move: entry for entry in book.probe(engine)}
+    assert replies[uci_moves(["e2e4", "e7e5"])[1]][1:] == (1, 0, 0, 1)
+    assert replies[uci_moves(["e2e4", "c7c5"])[1]][1:] == (1, 0, 1, 0)
+    engine.execute_instructions(uci_moves(["e2e4", "e7e5"])[1])
+    engine.execute_instructions(uci_moves(["e2e4", "e7e5", "g1f3"])[2])
+    assert book.probe(engine) == []
+
+
+def test_keys_match_engine_hash(book):
+    """Records are sorted and keyed by the engine's Zobrist hash"""
+    keys = book.keys.tolist()
+    assert keys == sorted(keys)
+    assert hash(MainEngine()) in keys
+    assert len(book) == 6
+
+
+def test_choose_move(book):
+    """Moves are picked by weight, rare moves can be filtered out"""
+    rand = random.Random(3)
+    engine = MainEngine()
+    picks = {book.choose_move(engine, rand) for _ in range(50)}
+    assert picks == set(uci_moves(["e2e4"])) | set(uci_moves(["d2d4"]))
+    assert book.choose_move(engine, rand, min_weight=2) == uci_moves(["e2e4"])[0]
+    assert book.choose_move(engine, rand, min_weight=3) is None
+
+
+def test_book_strategy(book):
+    """The book is followed until the position leaves it"""
+    strategy = BookStrategy(book, make_strategy("random_move", 1), rand_seed=2, min_weight=2)
+    engine = MainEngine()
+    move = strategy.choose_move(engine, engine.get_all_moves())
+    assert move == uci_moves(["e2e4"])[0]
+    engine.execute_instructions(move)
+    assert strategy.choose_move(engine, engine.get_all_moves()) in engine.get_all_moves()
+
+
+def test_pgn_and_self_play(tmp_path):
+    """Games are added from PGN files and self-play"""
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text('[Result "0-1"]\n\n1. f3 e5 2. g4 Qh4# 0-1\n\n'
+                        '[Result "1-0"]\n\n1. e4 e5 1-0\n')
+    builder = BookBuilder()
+    assert builder.add_pgn(str(pgn_path), processes=1) == 2
+    builder.add_self_play(3, max_plies=20)
+    assert builder.n_games == 5
+    builder.write(str(tmp_path / "book.bin"))
+    entries = OpeningBook(str(tmp_path / "book.bin")).probe(MainEngine())
+    f2f3 = next(entry for entry in entries if entry.move == uci_moves(["f2f3"])[0])
+    assert f2f3.losses >= 1
+    assert sum(entry.weight for entry in entries) == 5
+
+
+def test_bad_and_empty_books(tmp_path):
+    """Files that aren't books are refused, an empty book has no moves"""
+    with open(tmp_path / "bad.bin", "wb") as book_file:
+        book_file.write(struct.pack(HEADER_FORMAT, b"NOTABOOK", 1, 26))
+    with pytest.raises(ValueError):
+        OpeningBook(str(tmp_path / "bad.bin"))
+    BookBuilder().write(str(tmp_path / "empty.bin"))
+    book = OpeningBook(str(tmp_path / "empty.bin"))
+    assert len(book) == 0 and book.probe(MainEngine()) == []
@@ -0,0 +1,98 @@
+"""Unit tests for the streaming PGN reader"""
+import pytest
+from src.main_engine import MainEngine
+from src.move_index import move_endpoints
+from src.pgn import PGNGame, parse_game, read_pgn, replay_game, split_games
+from src.resources.data_translators import SQUARE_IDX
+
+OPERA_GAME = """[Event "Paris"]
+[Site "Paris FRA"]
+[White "Paul Morphy"]
+[Black "Duke Karl / Count Isouard"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 d6 3. d4 Bg4 {This is a weak move} 4. dxe5 Bxf3 5. Qxf3 dxe5
+6. Bc4 Nf6 7. Qb3 Qe7 8. Nc3 c6 9. Bg5 b5 $6 10. Nxb5 cxb5 11. Bxb5+ Nbd7
+12. O-O-O Rd8 13. Rxd7 Rxd7 (13... Nxd7 14. Qb5) 14. Rd1 Qe6 15. Bxd7+ Nxd7
+16. Qb8+ Nxb8 17. Rd8# 1-0
+"""
+
+PROMOTION_GAME = """[Event "Promotion and en passant"]
+[Result "*"]
+
+1. h4 g5 2. hxg5 h6 3. gxh6 Nf6 4. h7 Ng8 5. hxg8=Q Rxg8 6. d3 e5 7. Nc3 e4
+8. f4 exf3 9. Ke3?? *
+
+"""
+
+FEN_GAME = """[Event "From a FEN"]
+[SetUp "1"]
+[FEN "4k3/8/8/8/8/8/4P3/4K2R w K - 0 1"]
+[Result "1/2-1/2"]
+
+1. O-O Kd7 2. e4 Ke6 1/2-1/2
+"""
+
+
+def test_split_games():
+    """Games are split where a tag pair follows movetext"""
+    text = OPERA_GAME + "\n" + PROMOTION_GAME + FEN_GAME
+    games = list(split_games(text.splitlines(keepends=True)))
+    assert len(games) == 3
+    assert games[1].startswith("[Event \"Promotion")
+
+
+def test_parse_game():
+    """Tags, moves and the result are read and comments, NAGs and variations dropped"""
+    game = parse_game(OPERA_GAME)
+    assert game.tags["White"] == "Paul Morphy" and game.result == "1-0"
+    assert len(game.moves) == 33
+    assert game.moves[:3] == ["e4", "e5", "Nf3"] and game.moves[-1] == "Rd8#"
+    assert "Nxd7" not in game.moves[24:26]
+
+
+def test_replay_opera_game():
+    """Disambiguation, long castles and checkmate are resolved"""
+    positions = list(replay_game(parse_game(OPERA_GAME)))
+    assert len(positions) == 33 and all(result == 1.0 for _, _, result in positions)
+    engine = MainEngine(positions[-1][0])
+    engine.execute_instructions(positions[-1][1])
+    assert engine.in_check() and not engine.get_all_moves()
+    castle = positions[22][1]
+    assert castle[:4] == (SQUARE_IDX["e1"], 6, SQUARE_IDX["c1"], 0)
+
+
+def test_replay_promotion_and_en_passant():
+    """Promotions, en passant and a stopped game without a result"""
+    game = parse_game(PROMOTION_GAME)
+    positions = []
+    with pytest.raises(ValueError):
+        for position in replay_game(game):
+            positions.append(position)
+    assert len(positions) == 16 and positions[0][2] is None
+    assert move_endpoints(positions[8][1]) == (SQUARE_IDX["h7"], SQUARE_IDX["g8"], 5)
+    en_passant = positions[15][1]
+    assert len(en_passant) == 12 and en_passant[8] == SQUARE_IDX["f4"]
+
+
+def test_replay_from_fen():
+    """Games with a FEN tag start from that position"""
+    positions = list(replay_game(parse_game(FEN_GAME)))
+    assert len(positions) == 4 and positions[0][2] == 0.5
+    assert positions[0][0] == MainEngine.from_fen("4k3/8/8/8/8/8/4P3/4K2R w K - 0 1").state
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_read_pgn(tmp_path, processes):
+    """Games are streamed from a file in order, broken games come back as None"""
+    path = tmp_path / "games.pgn"
+    path.write_text((OPERA_GAME + "\n" + PROMOTION_GAME + FEN_GAME) * 3)
+    games = list(read_pgn(str(path), processes=processes, games_per_task=2))
+    assert len(games) == 9
+    assert [len(game) if game else None for game in games[:3]] == [33, None, 4]
+
+
+def test_pgn_game_repr():
+    """The repr names the players"""
+    assert "Paul Morphy" in repr(parse_game(OPERA_GAME))
+    assert isinstance(parse_game(FEN_GAME), PGNGame)
@@ -0,0 +1,65 @@
+"""Unit tests for the chess-term to engine state translations"""
+import pytest
+from src.main_engine import MainEngine
+from src.resources.data_translators import SQUARE_IDX, fen_to_state, state_to_fen
+
+
+def test_starting_position():
+    """The starting FEN is the default engine state"""
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    assert fen_to_state(fen) == MainEngine().state
+
+
+def test_castle_en_passant_and_turn():
+    """Partial castle rights, the en passant file and black to move are translated"""
+    state = fen_to_state("4k2r/8/8/8/3pP3/8/8/R3K3 b Qk e3 0 1")
+    assert state[SQUARE_IDX["e4"]] == 1 and state[SQUARE_IDX["d4"]] == 7
+    assert state[64] == SQUARE_IDX["e8"] and state[65] == SQUARE_IDX["e1"]
+    assert state[66] == 0b0110 and state[67] == 4 and state[68] is False
+
+
+def test_move_counters_are_optional():
+    """EPD style positions without move counters are accepted"""
+    assert fen_to_state("4k3/8/8/8/8/8/8/4K3 w - -")[66:] == [0, -1, True]
+
+
+def test_bad_placement():
+    """A rank that is too short is rejected"""
+    with pytest.raises(ValueError):
+        fen_to_state("4k3/8/8/8/8/8/8/4K2 w - - 0 1")
+
+
+@pytest.mark.parametrize("fen", [
+    "4k3/8/8/8/8/8/8/4K3 w KX - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w KK - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w K- - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 x - - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w - i3 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w - e4 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w -",
+])
+def test_bad_fields(fen):
+    """Malformed side to move, castle rights and en passant fields are ValueErrors"""
+    with pytest.raises(ValueError, match="FEN"):
+        fen_to_state(fen)
+
+
+def test_missing_king():
+    """Positions without exactly one king per player are rejected"""
+    with pytest.raises(ValueError):
+        fen_to_state("4k3/8/8/8/8/8/8/8 w - - 0 1")
+    with pytest.raises(ValueError):
+        fen_to_state("4k3/8/8/8/8/8/8/3KK3 w - - 0 1")
+
+
+@pytest.mark.parametrize("fen", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "4k3/8/8/8/3pP3/8/8/R3K3 b Qk e3 12 40",
+])
+def test_state_to_fen_round_trip(fen):
+    """Translating to a state and back gives the same FEN"""
+    halfmove_clock, fullmove_number = map(int, fen.split()[4:])
+    assert state_to_fen(fen_to_state(fen), halfmove_clock, fullmove_number) == fen
@@ -0,0 +1,70 @@
+"""Unit tests for the iterative deepening alpha-beta search"""
+import threading
+from src.evaluation.tapered import TaperedEngine
+from src.move_index import move_to_uci
+from src.search import MATE_SCORE, Search, SearchInfo, order_moves
+from src.main_engine import captured_square_state
+
+
+def test_finds_mate_in_one():
+    """A back rank mate is found and scored as mate in 1"""
+    engine = TaperedEngine.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    result = Search(engine).search(max_depth=3)
+    assert move_to_uci(result.pv[0]) == "a1a8"
+    assert result.score == MATE_SCORE - 1 and result.mate_in == 1
+
+
+def test_wins_hanging_queen():
+    """Free material is taken"""
+    engine = TaperedEngine.from_fen("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1")
+    result = Search(engine).search(max_depth=2)
+    assert move_to_uci(result.pv[0]) == "d2d5"
+    assert result.score > 300
+
+
+def test_getting_mated_and_stalemate():
+    """Being mated scores as a negative mate, stalemate as a draw with no pv"""
+    engine = TaperedEngine.from_fen("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1")
+    result = Search(engine).search(max_depth=2)
+    assert result.pv == [] and result.score == -MATE_SCORE
+    assert SearchInfo(1, -MATE_SCORE + 2, 1, 1.0, []).mate_in == -1
+    stalemate = TaperedEngine.from_fen("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1")
+    result = Search(stalemate).search(max_depth=2)
+    assert result.pv == [] and result.score == 0
+
+
+def test_engine_is_restored():
+    """The engine is left in its position, also when stopped mid-search"""
+    engine = TaperedEngine()
+    state = engine.state.copy()
+    Search(engine).search(max_depth=2)
+    assert engine.state == state and not engine.state_stack
+    result = Search(engine).search(node_limit=500)
+    assert engine.state == state and not engine.state_stack
+    assert result.pv
+
+
+def test_stop_event_and_info_callback():
+    """Every completed depth is reported and a set stop event ends the search"""
+    infos = []
+    stop_event = threading.Event()
+
+    def on_info(info: SearchInfo):
+        infos.append(info)
+        if info.depth == 2:
+            stop_event.set()
+
+    result = Search(TaperedEngine(), stop_event, on_info).search()
+    assert [info.depth for info in infos] == [1, 2]
+    assert result == infos[-1] and result.nodes > 0 and result.pv
+
+
+def test_order_moves():
+    """The first move leads, then captures by victim value"""
+    engine = TaperedEngine.from_fen("4k3/8/8/2q1r3/3P4/8/8/7K w - - 0 1")
+    moves = engine.get_all_moves()
+    quiet_move = next(move for move in moves if not captured_square_state(move))
+    ordered = order_moves(moves, quiet_move)
+    assert ordered[0] == quiet_move
+    assert [captured_square_state(move) for move in ordered[1:3]] == [11, 10]
+    assert sorted(ordered) == sorted(moves)
@@ -0,0 +1,103 @@
+"""Unit tests for the SPRT match runner"""
+import math
+import pytest
+from src.instrumented_engine import INSTRUMENT_ENV_VAR
+from src.main_engine import MainEngine
+from src.sprt import (EngineConfig, counting_engine_class, elo_estimate, elo_to_score,
+                      pentanomial_llr, play_pair, play_timed_game, random_opening, run_sprt,
+                      score_to_elo, sprt_bounds)
+
+
+def test_elo_score_round_trip():
+    """Converting elo to an expected score and back is the identity"""
+    assert elo_to_score(0) == 0.5
+    for elo in (-300, -10, 0, 25, 400):
+        assert score_to_elo(elo_to_score(elo)) == pytest.approx(elo)
+
+
+def test_sprt_bounds():
+    """The usual bounds for alpha = beta = 0.05"""
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert lower == pytest.approx(-2.944, abs=1e-3) and upper == pytest.approx(2.944, abs=1e-3)
+
+
+def test_pentanomial_llr_sign():
+    """Winning pairs favour H1, losing pairs favour H0, no information gives 0"""
+    assert pentanomial_llr([0, 0, 0, 0, 0], 0, 10) == 0
+    assert pentanomial_llr([0, 0, 50, 0, 0], 0, 10) == 0
+    assert pentanomial_llr([5, 10, 30, 30, 25], 0, 10) > 0
+    assert pentanomial_llr([25, 30, 30, 10, 5], 0, 10) < 0
+
+
+def test_elo_estimate():
+    """Symmetric results estimate 0 elo with an error that shrinks with more pairs"""
+    elo, error = elo_estimate([10, 10, 10, 10, 10])
+    assert elo == pytest.approx(0)
+    _, larger_sample_error = elo_estimate([40, 40, 40, 40, 40])
+    assert 0 < larger_sample_error < error
+    assert elo_estimate([0] * 5) == (0.0, math.inf)
+
+
+def test_counting_engine_counts_move_generation():
+    """Every move generation is counted as a node"""
+    engine = counting_engine_class("src.main_engine:MainEngine")()
+    assert isinstance(engine, MainEngine) and not hasattr(engine, "counters")
+    engine.get_all_moves()
+    engine.count_all_moves()
+    assert engine.nodes == 2
+    engine = counting_engine_class("src.main_engine:MainEngine", instrumented_engine=True)()
+    engine.get_all_moves()
+    assert engine.nodes == engine.counters["calls", "get_all_moves"] == 1
+
+
+def test_instrumented_sprt_reports_counters(monkeypatch):
+    """With the environment variable set, both sides' hot path counters are reported"""
+    monkeypatch.setenv(INSTRUMENT_ENV_VAR, "1")
+    report = run_sprt(EngineConfig("random_move"), EngineConfig("cccp"), max_pairs=2,
+                      processes=1, max_plies=30)
+    for side in ("base", "new"):
+        assert report["counters"][side]["calls"]["get_all_moves"] > 0
+
+
+def test_random_opening_is_reproducible():
+    """The opening depends only on the seed and leaves a position with legal moves"""
+    opening = random_opening(7)
+    assert opening == random_opening(7) and len(opening) == 8
+    engine = MainEngine()
+    for move in opening:
+        assert move in engine.get_all_moves()
+        engine.execute_instructions(move)
+
+
+def test_each_side_generates_its_root_moves():
+    """Each side's root move generation runs on its own engine and is counted as its node"""
+    config = EngineConfig("random_move")
+    result = play_timed_game(config, config, random_opening(7), 7, max_plies=40)
+    # random_move doesn't generate moves itself, each of its moves costs one root node
+    assert result["white"]["nodes"] == (result["plies"] + 1) // 2
+    assert result["black"]["nodes"] == result["plies"] // 2
+    assert result["black"]["seconds"] > 0
+
+
+def test_play_pair_swaps_colors():
+    """Both games of a pair are scored for the new configuration and both sides search"""
+    pair = play_pair(EngineConfig("cccp"), EngineConfig("random_move"), 3, max_plies=60)
+    assert len(pair["scores"]) == 2
+    assert pair["new"]["nodes"] > 0 and pair["base"]["nodes"] > 0
+
+
+def test_run_sprt_stops_early():
+    """A much stronger strategy is accepted long before max_pairs"""
+    report = run_sprt(EngineConfig("random_move"), EngineConfig("cccp"),
+                      max_pairs=400, processes=1, max_plies=200)
+    assert report["result"] == "H1"
+    assert report["pairs"] < 400 and report["elo"] > 0
+    assert report["wins"] + report["draws"] + report["losses"] == 2 * report["pairs"]
+    assert report["nodes_per_sec"]["new"] > 0
+
+
+def test_run_sprt_in_worker_processes():
+    """Equal strategies give an inconclusive result when max_pairs runs out"""
+    report = run_sprt(EngineConfig("random_move"), EngineConfig("random_move"),
+                      max_pairs=6, processes=2, max_plies=40)
+    assert report["result"] == "inconclusive" and report["pairs"] == 6
@@ -0,0 +1,85 @@
+"""Unit tests for the weak move choosing strategies"""
+import random
+import pytest
+from src.main_engine import MainEngine
+from src.resources.data_translators import SQUARE_IDX
+from src.strategies import STRATEGIES, RandomMove, ScoringStrategy, Strategy, make_strategy
+
+KINGS = [("e1", "w_king"), (65, "e1"), ("e8", "b_king"), (64, "e8"), (66, 0)]
+
+
+@pytest.mark.parametrize("name", STRATEGIES.keys())
+def test_strategies_play_legal_moves(name):
+    """Every strategy picks a legal move and leaves the engine as it found it"""
+    random.seed(5)
+    engine = MainEngine()
+    strategy = make_strategy(name, rand_seed=5)
+    for _ in range(30):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        state, engine_hash = engine.state.copy(), hash(engine)
+        move = strategy.choose_move(engine, moves)
+        assert move in moves
+        assert engine.state == state and hash(engine) == engine_hash
+        engine.execute_instructions(move)
+
+
+def test_only_scoring_strategies_score_moves():
+    """score_move belongs to the strategies choosing their best scoring move"""
+    assert not hasattr(Strategy, "score_move") and not hasattr(RandomMove, "score_move")
+    assert all(issubclass(strategy, ScoringStrategy)
+               for name, strategy in STRATEGIES.items() if name != "random_move")
+    with pytest.raises(NotImplementedError):
+        Strategy().choose_move(MainEngine(), MainEngine().get_all_moves())
+
+
+def test_count_all_moves_matches_move_list():
+    """The count-only path agrees with the legal move list"""
+    random.seed(11)
+    engine = MainEngine()
+    for _ in range(100):
+        moves = engine.get_all_moves()
+        assert engine.count_all_moves() == len(moves)
+        if not moves:
+            break
+        engine.execute_instructions(random.choice(moves))
+
+
+def test_cccp_checkmates(board_state_generator):
+    """cccp takes a back rank mate over capturing a piece"""
+    engine = board_state_generator([("g1", "w_king"), (65, "g1"), ("g8", "b_king"), (64, "g8"),
+                                    (66, 0), ("f7", "b_pawn"), ("g7", "b_pawn"), ("h7", "b_pawn"),
+                                    ("a1", "w_rook"), ("b2", "w_bishop"), ("c4", "b_knight")])
+    move = make_strategy("cccp", 1).choose_move(engine, engine.get_all_moves())
+    assert (move[0], move[2]) == (SQUARE_IDX["a1"], SQUARE_IDX["a8"])
+
+
+def test_pacifist_avoids_captures(board_state_generator):
+    """pacifist never takes the free queen"""
+    engine = board_state_generator(KINGS + [("d4", "w_rook"), ("d5", "b_queen")])
+    pacifist = make_strategy("pacifist", 3)
+    for _ in range(10):
+        assert pacifist.choose_move(engine, engine.get_all_moves())[2] != SQUARE_IDX["d5"]
+
+
+def test_suicide_king_approaches(board_state_generator):
+    """suicide_king walks its king towards the opposing king"""
+    engine = board_state_generator(KINGS)
+    move = make_strategy("suicide_king", 3).choose_move(engine, engine.get_all_moves())
+    assert move[2] in {SQUARE_IDX["d2"], SQUARE_IDX["e2"], SQUARE_IDX["f2"]}
+
+
+def test_min_oppt_moves_restricts_the_king(board_state_generator):
+    """min_oppt_moves picks a move leaving the opponent with the fewest replies"""
+    engine = board_state_generator([("e1", "w_king"), (65, "e1"), ("h8", "b_king"), (64, "h8"),
+                                    (66, 0), ("a1", "w_queen")])
+    moves = engine.get_all_moves()
+    move = make_strategy("min_oppt_moves", 3).choose_move(engine, moves)
+    counts = []
+    for candidate in moves:
+        engine.execute_instructions(candidate)
+        counts.append(engine.count_all_moves())
+        engine.reverse_last_instruction()
+    engine.execute_instructions(move)
+    assert engine.count_all_moves() == min(counts)
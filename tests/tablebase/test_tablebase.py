@@ -0,0 +1,125 @@
+"""Unit tests for the retrograde endgame tablebases"""
+import random
+import struct
+import pytest
+from src.main_engine import MainEngine
+from src.tablebase import (HEADER_FORMAT, ILLEGAL, SYMMETRIES, FLIP_FILES, TableLayout, Tablebase,
+                           build_table, canonical_material, decode_value, sub_materials,
+                           table_path)
+
+
+@pytest.fixture(name="tablebase", scope="module")
+def fixture_tablebase(tmp_path_factory) -> Tablebase:
+    """KQK and KPK built into a temporary directory"""
+    directory = str(tmp_path_factory.mktemp("tablebase"))
+    for material in ("KQK", "KPK"):
+        build_table(directory, material)
+    return Tablebase(directory)
+
+
+def probe_fen(tablebase: Tablebase, fen: str) -> tuple[int, int | None] | None:
+    """Probes the position of a FEN"""
+    return tablebase.probe(MainEngine.from_fen(fen).state)
+
+
+def test_materials():
+    """Materials are named strong side first and lead to their captures and promotions"""
+    assert canonical_material("KPKR") == "KRKP"
+    assert canonical_material("KKQ") == "KQK"
+    assert canonical_material("KNKB") == "KBKN"
+    assert sub_materials("KRKP") == {"KRK", "KPK", "KQKR", "KRKR", "KRKB", "KRKN"}
+    assert sub_materials("KPK") == {"KK", "KQK", "KRK", "KBK", "KNK"}
+
+
+def test_layout_symmetry():
+    """Symmetric positions share an index which decodes to one of them"""
+    rand = random.Random(3)
+    for material, symmetries in (("KQK", SYMMETRIES), ("KPK", [FLIP_FILES]), ("KNNK", SYMMETRIES)):
+        layout = TableLayout(material)
+        for _ in range(200):
+            squares = rand.sample(range(8, 56), len(layout.pieces))
+            index = layout.index(squares, True)
+            assert layout.index(squares, False) == index + 1
+            for symmetry in symmetries:
+                assert layout.index([symmetry[square_idx] for square_idx in squares], True) == index
+            decoded, white_to_move = layout.decode(index)
+            assert white_to_move and layout.index(decoded, True) == index
+        if material == "KNNK":
+            assert layout.index(squares[:2] + squares[:1:-1], True) == index
+
+
+def test_decode_value():
+    """Table values decode to the result and the plies to mate"""
+    assert decode_value(0) == (0, None)
+    assert decode_value(7) == (1, 7)
+    assert decode_value(-1) == (-1, 0)
+    assert decode_value(-9) == (-1, 8)
+
+
+def test_queen_endings(tablebase):
+    """Mates, stalemates and the longest KQK mate"""
+    assert probe_fen(tablebase, "k7/8/1K6/8/8/8/8/2Q5 w - - 0 1") == (1, 1)
+    assert probe_fen(tablebase, "k1Q5/8/1K6/8/8/8/8/8 b - - 0 1") == (-1, 0)
+    assert probe_fen(tablebase, "k7/2Q5/1K6/8/8/8/8/8 b - - 0 1") == (0, None)
+    table = tablebase.table("KQK")
+    assert int(table.max()) == 19
+    assert int(table[table != ILLEGAL].min()) == -21
+
+
+def test_pawn_endings(tablebase):
+    """Known KPK wins and draws for either color"""
+    assert probe_fen(tablebase, "4k3/8/4K3/4P3/8/8/8/8 w - - 0 1")[0] == 1
+    assert probe_fen(tablebase, "4k3/8/4K3/4P3/8/8/8/8 b - - 0 1")[0] == -1
+    assert probe_fen(tablebase, "k7/8/8/8/8/8/P7/K7 w - - 0 1") == (0, None)
+    assert probe_fen(tablebase, "4k3/4P3/4K3/8/8/8/8/8 b - - 0 1") == (0, None)
+    assert probe_fen(tablebase, "8/8/8/8/4p3/4k3/8/4K3 b - - 0 1")\
+        == probe_fen(tablebase, "4k3/8/4K3/4P3/8/8/8/8 w - - 0 1")
+    assert tablebase.white_score(MainEngine.from_fen("8/8/8/8/4p3/4k3/8/4K3 b - - 0 1").state) == 0
+    assert tablebase.white_score(MainEngine.from_fen("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1").state) == 1
+
+
+def test_uncovered_positions(tablebase):
+    """Positions without a built table aren't probed, dead material is a draw"""
+    assert tablebase.probe(MainEngine().state) is None
+    assert probe_fen(tablebase, "4k3/8/8/8/8/8/8/BN2K3 w - - 0 1") is None
+    assert probe_fen(tablebase, "4k3/8/8/8/8/8/8/B3K3 w - - 0 1") == (0, None)
+    assert tablebase.white_score(MainEngine.from_fen("4k3/8/8/8/8/8/8/4K3 w - - 0 1").state) == 0.5
+
+
+def test_values_match_moves(tablebase):
+    """Every probed value is the best result over the engine's moves"""
+    rand = random.Random(5)
+    n_checked = 0
+    while n_checked < 150:
+        squares = rand.sample(range(8, 56), 3)
+        state = [0] * 64
+        for piece_state, square_idx in zip((6, 12, rand.choice((5, 1, 7))), squares):
+            state[square_idx] = piece_state
+        engine = MainEngine(state + [squares[1], squares[0], 0, -1, rand.random() < 0.5])
+        result = tablebase.probe(engine.state)
+        if result is None:
+            continue
+        n_checked += 1
+        moves = engine.get_all_moves()
+        if not moves:
+            assert result == ((-1, 0) if engine.in_check() else (0, None))
+            continue
+        # Quicker wins and slower losses first
+        best = None
+        for move in moves:
+            engine.execute_instructions(move)
+            child_result, child_plies = tablebase.probe(engine.state)
+            engine.reverse_last_instruction()
+            plies = None if child_plies is None else child_plies + 1
+            key = (-child_result, 0 if plies is None else plies * child_result)
+            if best is None or key > best[0]:
+                best = (key, (-child_result, plies))
+        assert result == best[1]
+
+
+def test_bad_table(tmp_path):
+    """Files that aren't tables are refused"""
+    with open(table_path(str(tmp_path), "KRK"), "wb") as table_file:
+        table_file.write(struct.pack(HEADER_FORMAT, b"NOTATB\x00\x00", 1, 0))
+    with pytest.raises(ValueError):
+        Tablebase(str(tmp_path)).table("KRK")
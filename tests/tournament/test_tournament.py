@@ -0,0 +1,128 @@
+"""Unit tests for the self-play tournament runner"""
+import json
+import multiprocessing
+import pytest
+from src import tournament
+from src.main_engine import MainEngine
+from src.resources.data_translators import SQUARE_IDX
+from src.strategies import ScoringStrategy, make_strategy
+from src.tournament import (aggregate_results, play_game, read_results, run_tournament,
+                            schedule_round_robin)
+
+
+class KnightShuffle(ScoringStrategy):
+    """Moves the king side knight out and back, repeating the position every 4 plies"""
+    name = "knight_shuffle"
+
+    def score_move(self, engine: MainEngine, move: tuple):
+        return move[0] in (SQUARE_IDX["g1"], SQUARE_IDX["f3"], SQUARE_IDX["g8"], SQUARE_IDX["f6"])\
+            and move[2] in (SQUARE_IDX["g1"], SQUARE_IDX["f3"], SQUARE_IDX["g8"], SQUARE_IDX["f6"])
+
+
+def test_checkmate_is_adjudicated(board_state_generator):
+    """cccp mates in one with the queen"""
+    engine = board_state_generator([
+        ("f7", "w_king"), (65, "f7"), ("g1", "w_queen"),
+        ("h8", "b_king"), (64, "h8"), (66, 0)])
+    result = play_game(make_strategy("cccp", 1), make_strategy("random_move", 2), engine=engine)
+    assert result == {"score": 1.0, "result": "1-0", "termination": "checkmate", "plies": 1}
+
+
+def test_checkmate_on_the_last_ply(board_state_generator):
+    """A mate delivered with the last allowed move is a checkmate, not max_plies"""
+    engine = board_state_generator([
+        ("f7", "w_king"), (65, "f7"), ("g1", "w_queen"),
+        ("h8", "b_king"), (64, "h8"), (66, 0)])
+    result = play_game(make_strategy("cccp", 1), make_strategy("random_move", 2), max_plies=1,
+                       engine=engine)
+    assert result == {"score": 1.0, "result": "1-0", "termination": "checkmate", "plies": 1}
+
+
+def test_stalemate_is_adjudicated(board_state_generator):
+    """Black has no legal moves and is not in check"""
+    engine = board_state_generator([
+        ("f7", "w_king"), (65, "f7"), ("g6", "w_queen"),
+        ("h8", "b_king"), (64, "h8"), (66, 0), (68, False)])
+    result = play_game(make_strategy("random_move", 1), make_strategy("random_move", 2),
+                       engine=engine)
+    assert result == {"score": 0.5, "result": "1/2-1/2", "termination": "stalemate", "plies": 0}
+
+
+def test_insufficient_material_is_adjudicated(board_state_generator):
+    """A lone knight can't mate so the game ends after the first move"""
+    engine = board_state_generator([
+        ("e1", "w_king"), (65, "e1"), ("b1", "w_knight"),
+        ("e8", "b_king"), (64, "e8"), (66, 0)])
+    result = play_game(make_strategy("random_move", 1), make_strategy("random_move", 2),
+                       engine=engine)
+    assert result["termination"] == "insufficient_material"
+    assert result["plies"] == 1 and result["score"] == 0.5
+
+
+def test_repetition_is_adjudicated():
+    """The starting position is seen for the third time after 8 plies"""
+    result = play_game(KnightShuffle(1), KnightShuffle(2))
+    assert result == {"score": 0.5, "result": "1/2-1/2", "termination": "repetition", "plies": 8}
+
+
+def test_fifty_move_rule_is_adjudicated(monkeypatch):
+    """Knight moves don't reset the halfmove clock"""
+    monkeypatch.setattr(tournament, "FIFTY_MOVE_PLIES", 4)
+    result = play_game(KnightShuffle(1), KnightShuffle(2))
+    assert result["termination"] == "fifty_move" and result["plies"] == 4
+
+
+def test_max_plies():
+    """Games that run out of plies are drawn"""
+    result = play_game(make_strategy("random_move", 1), make_strategy("random_move", 2),
+                       max_plies=6)
+    assert result == {"score": 0.5, "result": "1/2-1/2", "termination": "max_plies", "plies": 6}
+
+
+def test_games_are_reproducible():
+    """The same seeds play the same game"""
+    results = [play_game(make_strategy("random_move", 3), make_strategy("swarm", 4))
+               for _ in range(2)]
+    assert results[0] == results[1]
+
+
+def test_schedule_round_robin():
+    """Every pair plays the requested number of games with alternating colors"""
+    schedule = schedule_round_robin(["a", "b", "c"], 2)
+    assert len(schedule) == 6
+    assert [game[:2] for game in schedule[:2]] == [("a", "b"), ("b", "a")]
+    assert len({game[2] for game in schedule}) == 6
+
+
+def test_aggregate_results():
+    """Scores are totalled from both sides' points of view"""
+    standings = aggregate_results([
+        {"white": "a", "black": "b", "score": 1.0, "termination": "checkmate"},
+        {"white": "b", "black": "a", "score": 0.5, "termination": "repetition"},
+    ])
+    assert standings["a"]["wins"] == 1 and standings["a"]["draws"] == 1
+    assert standings["a"]["score"] == 1.5 and standings["b"]["score"] == 0.5
+    assert standings["b"]["losses"] == 1 and standings["b"]["games"] == 2
+    assert standings["b"]["terminations"] == {"checkmate": 1, "repetition": 1}
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_run_tournament_streams_results(tmp_path, processes):
+    """Every game is written as a JSON line and the standings match the file"""
+    output_path = tmp_path / "results.jsonl"
+    standings = run_tournament(["random_move", "suicide_king", "swarm"], 2, str(output_path),
+                               processes=processes, max_plies=40)
+    results = list(read_results(str(output_path)))
+    assert len(results) == 6
+    assert all(set(result) >= {"white", "black", "seed", "score", "termination", "plies"}
+               for result in results)
+    assert standings == aggregate_results(results)
+    assert json.loads(output_path.read_text().splitlines()[0]) == results[0]
+
+
+def test_failed_game_stops_the_workers(tmp_path):
+    """A game raising in a worker is re-raised and the pool's processes don't outlive it"""
+    with pytest.raises(KeyError):
+        run_tournament(["random_move", "no_such_strategy"], 2, str(tmp_path / "results.jsonl"),
+                       processes=2, max_plies=10)
+    assert not multiprocessing.active_children()
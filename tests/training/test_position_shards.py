@@ -0,0 +1,85 @@
+"""Unit tests for the sharded position record format"""
+import random
+import numpy as np
+import pytest
+from src.main_engine import MainEngine
+from src.training.position_shards import (HEADER_SIZE, POSITION_DTYPE, ShardReader, ShardWriter,
+                                          pack_records, record_to_state, unpack_states)
+
+
+@pytest.fixture(name="game_positions")
+def fixture_game_positions() -> tuple[list[list], list[int]]:
+    """The states and hashes of a random game"""
+    random.seed(9)
+    engine = MainEngine()
+    states, keys = [engine.state.copy()], [hash(engine)]
+    for _ in range(150):
+        moves = engine.get_all_moves()
+        if not moves:
+            break
+        engine.execute_instructions(random.choice(moves))
+        states.append(engine.state.copy())
+        keys.append(hash(engine))
+    return states, keys
+
+
+def test_record_size():
+    """Records are fixed width and compact"""
+    assert POSITION_DTYPE.itemsize == 48
+
+
+def test_pack_and_unpack(game_positions):
+    """Packing and unpacking records gives back the engine states"""
+    states, keys = game_positions
+    records = pack_records(states, keys, results=2, evals=np.arange(len(states)))
+    assert unpack_states(records).tolist() == [state[:68] + [int(state[68])] for state in states]
+    assert records["key"].tolist() == keys
+    assert record_to_state(records[5]) == states[5]
+    assert records["result"][0] == 2 and records["eval"][3] == 3
+
+
+def test_shards_round_trip(tmp_path, game_positions):
+    """Records are split across shards and read back in order"""
+    states, keys = game_positions
+    records = pack_records(states, keys)
+    with ShardWriter(str(tmp_path), shard_records=40) as writer:
+        writer.append(records[:25])
+        writer.append(records[25:])
+    reader = ShardReader(str(tmp_path))
+    assert len(reader.shards) == -(-len(records) // 40)
+    assert len(reader) == len(records)
+    assert np.concatenate(list(reader)).tobytes() == records.tobytes()
+    assert reader[41]["key"] == keys[41] and reader[-1]["key"] == keys[-1]
+    with pytest.raises(IndexError):
+        reader[len(records)]  # pylint: disable=pointless-statement
+
+
+def test_writer_appends_to_last_shard(tmp_path, game_positions):
+    """A new writer continues the partially filled last shard"""
+    states, keys = game_positions
+    records = pack_records(states[:30], keys[:30])
+    with ShardWriter(str(tmp_path), shard_records=20) as writer:
+        writer.append(records[:10])
+    with ShardWriter(str(tmp_path), shard_records=20) as writer:
+        writer.append(records[10:])
+    reader = ShardReader(str(tmp_path))
+    assert [len(shard) for shard in reader] == [20, 10]
+    assert np.concatenate(list(reader)).tobytes() == records.tobytes()
+
+
+def test_batches_are_views(tmp_path, game_positions):
+    """Batches are memory-mapped views that don't cross shards"""
+    states, keys = game_positions
+    with ShardWriter(str(tmp_path), shard_records=50) as writer:
+        writer.append(pack_records(states, keys))
+    batches = list(ShardReader(str(tmp_path)).batches(30))
+    assert sum(len(batch) for batch in batches) == len(states)
+    assert all(len(batch) <= 30 for batch in batches)
+    assert all(isinstance(batch, np.memmap) for batch in batches)
+
+
+def test_bad_header(tmp_path):
+    """Files that aren't shards are rejected"""
+    (tmp_path / "positions_00000.bin").write_bytes(b"\x00" * (HEADER_SIZE + 48))
+    with pytest.raises(ValueError):
+        ShardReader(str(tmp_path))
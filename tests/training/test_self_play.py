@@ -0,0 +1,29 @@
+"""Unit tests for self-play dataset generation"""
+import numpy as np
+from src.main_engine import MainEngine
+from src.training.self_play import load_dataset, self_play_positions, write_self_play_dataset
+
+
+def test_self_play_positions():
+    """Every position of the game is packed with the game's result"""
+    boards, results = self_play_positions("random_move", seed=3, max_plies=20)
+    assert boards.shape == (20, 69) and boards.dtype == np.int8
+    assert len(set(results.tolist())) == 1 and results[0] in (0, 1, 2)
+    # The first position is the one after white's first move
+    assert boards[0, 68] == 0 and sum(boards[0, :64] != MainEngine().state[:64]) == 2
+
+
+def test_skip_plies():
+    """The opening positions are left out"""
+    boards, _ = self_play_positions("random_move", seed=3, max_plies=20, skip_plies=5)
+    assert len(boards) == 15
+
+
+def test_dataset_round_trip(tmp_path):
+    """Written datasets are memory-mapped back with one result per board and are appendable"""
+    n_positions = write_self_play_dataset(str(tmp_path), 4, processes=1, max_plies=10)
+    assert n_positions == 40
+    n_positions += write_self_play_dataset(str(tmp_path), 2, processes=2, max_plies=10, base_seed=5)
+    boards, results = load_dataset(str(tmp_path))
+    assert boards.shape == (n_positions, 69) and len(results) == n_positions
+    assert set(boards[:, 68].tolist()) == {0, 1}
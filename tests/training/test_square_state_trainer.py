@@ -0,0 +1,47 @@
+"""Unit tests for the square-state table trainer"""
+import numpy as np
+import pytest
+from src.evaluation.batch_evaluator import BatchEvaluator
+from src.training.self_play import self_play_positions
+from src.training.square_state_trainer import SquareStateTrainer
+
+
+@pytest.fixture(name="dataset")
+def fixture_dataset() -> tuple[np.ndarray, np.ndarray]:
+    """Positions from a few short self-play games"""
+    games = [self_play_positions("cccp", seed=seed, max_plies=60) for seed in range(6)]
+    return np.concatenate([game[0] for game in games]), np.concatenate([game[1] for game in games])
+
+
+def test_scores_match_batch_evaluator(dataset):
+    """The trainer evaluates positions the same as the evaluator it starts from"""
+    boards, _ = dataset
+    trainer = SquareStateTrainer()
+    assert np.allclose(trainer.scores(boards), BatchEvaluator().evaluate(boards))
+    assert np.allclose(trainer.evaluator().evaluate(boards), BatchEvaluator().evaluate(boards))
+
+
+def test_gradient_matches_finite_differences(dataset):
+    """The bincount gradient agrees with numerically differentiating the loss"""
+    boards, results = dataset
+    trainer = SquareStateTrainer(l2=1e-4)
+    gradient = trainer.gradient(boards, results.astype(np.float64))
+    # A pawn, an empty square, a castle weight and the tempo
+    for param_idx in (8 * 13 + 7, 35 * 13, 64 * 13 + 1, 64 * 13 + 4):
+        original = trainer.params[param_idx]
+        losses = []
+        for delta in (1e-3, -1e-3):
+            trainer.params[param_idx] = original + delta
+            losses.append(trainer.loss(boards, results)
+                          + trainer.l2 / 2 * (trainer.params[:64 * 13] ** 2).sum())
+        trainer.params[param_idx] = original
+        assert gradient[param_idx] == pytest.approx((losses[0] - losses[1]) / 2e-3, rel=1e-3, abs=1e-9)
+
+
+def test_fit_reduces_loss(dataset):
+    """Training lowers the loss on the data it is trained on"""
+    boards, results = dataset
+    trainer = SquareStateTrainer(batch_size=256)
+    initial_loss = trainer.loss(boards, results)
+    losses = trainer.fit(boards, results, epochs=3)
+    assert len(losses) == 3 and losses[-1] < initial_loss
@@ -0,0 +1,117 @@
+"""Unit tests for the Texel evaluation tuner"""
+import os
+import random
+import numpy as np
+import pytest
+from src.evaluation.tapered import TaperedEngine
+from src.main_engine import MainEngine
+from src.training.texel_tuner import (MATERIAL_FILE, MG_VALUES, N_PARAMS, PHASE,
+                                      PHASE_PIECES_FILE, RESULTS_FILE, SQUARES_FILE, TexelTuner,
+                                      build_features, parse_labeled_position)
+
+LABELED_LINES = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1; 1/2-1/2",
+    "4k3/8/8/8/8/8/4P3/4K2R w K - 0 1 [1.0]",
+    '4k3/8/8/8/8/8/8/4K3 b - - "1/2-1/2"',
+    "r3k3/pppp4/8/8/8/8/8/4K3 w q - 0 1 0-1",
+]
+
+
+@pytest.fixture(name="random_positions")
+def fixture_random_positions() -> tuple[list[list], dict[str, np.ndarray]]:
+    """States from random games labeled with who is ahead in material, in feature form"""
+    random.seed(3)
+    states = []
+    for _ in range(8):
+        engine = MainEngine()
+        for _ in range(120):
+            moves = engine.get_all_moves()
+            if not moves:
+                break
+            engine.execute_instructions(random.choice(moves))
+            states.append(engine.state.copy())
+    squares = np.array([state[:64] for state in states], dtype=np.int8)
+    counts = np.stack([(squares == square_state).sum(axis=1) for square_state in range(13)], 1)
+    material = counts[:, 1:6] - counts[:, 7:12]
+    results = np.sign(material @ [1, 3, 3, 5, 9]) / 2 + 0.5
+    return states, {SQUARES_FILE: squares, MATERIAL_FILE: material,
+                    PHASE_PIECES_FILE: counts[:, 2:6] + counts[:, 8:12], RESULTS_FILE: results}
+
+
+def test_parse_labeled_position():
+    """Results are read in the usual formats"""
+    assert [parse_labeled_position(line)[1] for line in LABELED_LINES] == [0.5, 1.0, 0.5, 0.0]
+    assert parse_labeled_position(LABELED_LINES[1])[0] == "4k3/8/8/8/8/8/4P3/4K2R w K -"
+
+
+def test_build_features(tmp_path):
+    """Features are written as memory-mapped arrays, chunk by chunk"""
+    assert build_features(LABELED_LINES * 2 + ["\n"], str(tmp_path / "chunked"),
+                          chunk_size=3) == 8
+    assert build_features([], str(tmp_path / "empty")) == 0
+    assert len(TexelTuner(str(tmp_path / "empty"), scaling_constant=0.01)) == 0
+    assert build_features(LABELED_LINES, str(tmp_path)) == 4
+    chunked = TexelTuner(str(tmp_path / "chunked"), scaling_constant=0.01)
+    tuner = TexelTuner(str(tmp_path), scaling_constant=0.01)
+    assert len(tuner) == 4
+    assert isinstance(tuner.features[SQUARES_FILE], np.memmap)
+    assert tuner.features[MATERIAL_FILE][1].tolist() == [1, 0, 0, 1, 0]
+    assert tuner.features[PHASE_PIECES_FILE][0].tolist() == [4, 4, 4, 2]
+    for file_name, array in tuner.features.items():
+        assert np.array_equal(chunked.features[file_name], np.concatenate([array, array]))
+    assert sorted(os.listdir(tmp_path / "chunked")) == sorted(tuner.features)
+
+
+def test_scores_match_tapered_engine(random_positions):
+    """The vectorized scores with the initial parameters are the tapered evaluation"""
+    states, features = random_positions
+    tuner = TexelTuner(features, scaling_constant=0.01)
+    assert np.allclose(tuner.scores(), [TaperedEngine(state).evaluate() for state in states])
+    mg_table, eg_table = tuner.square_state_tables()
+    assert np.allclose(tuner.scores(), [TaperedEngine(state, mg_table, eg_table).evaluate()
+                                        for state in states])
+
+
+def test_gradient_matches_finite_differences(random_positions):
+    """The vectorized gradient agrees with numerically differentiating the loss"""
+    _, features = random_positions
+    tuner = TexelTuner(features, scaling_constant=0.005, chunk_size=100)
+    # Move the phase weights off their integer values so the clipping isn't hit exactly
+    tuner.params[PHASE] += 0.1
+    loss, gradient = tuner.gradient()
+    assert loss == pytest.approx(tuner.loss()) and gradient.shape == (N_PARAMS,)
+    # A knight square, a king square, the pawn value and the bishop phase weight
+    for param_idx in (64 + 27, 384 + 5 * 64 + 60, MG_VALUES.start, PHASE.start + 1):
+        original = tuner.params[param_idx]
+        losses = []
+        for delta in (1e-4, -1e-4):
+            tuner.params[param_idx] = original + delta
+            losses.append(tuner.loss())
+        tuner.params[param_idx] = original
+        assert gradient[param_idx] == pytest.approx((losses[0] - losses[1]) / 2e-4,
+                                                    rel=1e-3, abs=1e-10)
+
+
+def test_fit_reduces_loss(random_positions):
+    """Tuning lowers the loss, frozen parameters and by default the phase weights don't move"""
+    _, features = random_positions
+    tuner = TexelTuner(features, learning_rate=2.0)
+    phase_weights = tuner.params[PHASE].copy()
+    losses = tuner.fit(30)
+    assert tuner.loss() < losses[0]
+    assert np.array_equal(tuner.params[PHASE], phase_weights)
+    assert tuner.phase_weights()[8:12] == phase_weights.tolist()
+    mg_values = tuner.params[MG_VALUES].copy()
+    tuner.fit(5, frozen=MG_VALUES, tune_phase=True)
+    assert np.array_equal(tuner.params[MG_VALUES], mg_values)
+    assert not np.array_equal(tuner.params[PHASE], phase_weights)
+
+
+def test_save(tmp_path, random_positions):
+    """The tables TaperedEngine takes are saved with the parameters"""
+    _, features = random_positions
+    tuner = TexelTuner(features, scaling_constant=0.01)
+    tuner.save(str(tmp_path / "tuned.npz"))
+    with np.load(str(tmp_path / "tuned.npz")) as saved:
+        assert saved["mg_table"].shape == (64, 13) and saved["phase_weights"].shape == (13,)
+        assert np.array_equal(saved["params"], tuner.params)
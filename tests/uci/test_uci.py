@@ -0,0 +1,96 @@
+"""Unit tests for the UCI front-end"""
+import time
+from src.uci import STARTING_FEN, UCIEngine, search_seconds
+
+
+def make_uci() -> tuple[UCIEngine, list[str]]:
+    """A UCIEngine writing to a list"""
+    lines = []
+    return UCIEngine(lines.append), lines
+
+
+def test_handshake():
+    """uci, isready and unknown commands are answered, quit ends the loop"""
+    uci, lines = make_uci()
+    assert uci.handle("uci") and uci.handle("isready") and uci.handle("xyzzy")
+    assert lines[2] == "uciok" and lines[3] == "readyok"
+    assert lines[4].startswith("info string unknown command")
+    assert not uci.handle("quit")
+
+
+def test_position_is_incremental():
+    """Extending the game only plays the new moves, a different line takes moves back"""
+    uci, _ = make_uci()
+    uci.handle("position startpos moves e2e4 e7e5")
+    engine = uci.engine
+    assert len(engine.state_stack) == 2
+    state_stack_bottom = engine.state_stack[0]
+    uci.handle("position startpos moves e2e4 e7e5 g1f3")
+    assert uci.engine is engine and engine.state_stack[0] is state_stack_bottom
+    assert uci.moves == ["e2e4", "e7e5", "g1f3"]
+    uci.handle("position startpos moves e2e4 c7c5")
+    assert uci.engine is engine and len(engine.state_stack) == 2
+    assert engine.to_fen() == "rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 1"
+    uci.handle("position startpos")
+    assert uci.engine is engine and engine.to_fen() == STARTING_FEN
+
+
+def test_position_fen_and_illegal_moves():
+    """A new FEN starts a new engine and illegal moves stop the move list"""
+    uci, lines = make_uci()
+    fen = "4k3/8/8/8/8/8/8/4K2R w K - 0 1"
+    uci.handle(f"position fen {fen} moves e1g1 e8d8 a1a2")
+    assert uci.fen == fen and uci.moves == ["e1g1", "e8d8"]
+    assert lines == ["info string illegal move a1a2"]
+    uci.handle("position fen not a fen")
+    assert lines[-1].startswith("info string invalid fen")
+
+
+def test_go_depth_streams_info():
+    """A fixed depth search sends an info line per depth and then its best move"""
+    uci, lines = make_uci()
+    uci.handle("position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    uci.handle("go depth 3")
+    uci.wait()
+    assert lines[0].startswith("info depth 1 score mate 1 nodes ")
+    assert " nps " in lines[0] and lines[0].endswith("pv a1a8")
+    assert lines[-1] == "bestmove a1a8"
+    assert uci.first_info_latency is not None and uci.stop_latency is None
+
+
+def test_stop_and_isready_during_search():
+    """isready is answered while searching and stop ends an infinite search with a bestmove"""
+    uci, lines = make_uci()
+    uci.handle("debug on")
+    uci.handle("go infinite")
+    uci.handle("isready")
+    assert "readyok" in lines
+    time.sleep(0.05)
+    uci.handle("stop")
+    bestmoves = [line for line in lines if line.startswith("bestmove")]
+    assert len(bestmoves) == 1 and bestmoves[0] != "bestmove 0000"
+    assert 0 <= uci.stop_latency < 1.0
+    uci.wait()
+    assert lines[-1].startswith("info string latency go to first info")
+
+
+def test_infinite_holds_bestmove_until_stop():
+    """An infinite search that runs out of depth keeps its bestmove until stop"""
+    uci, lines = make_uci()
+    uci.handle("go infinite depth 1")
+    deadline = time.perf_counter() + 5
+    while not any(line.startswith("info depth 1") for line in lines)\
+            and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert not any(line.startswith("bestmove") for line in lines)
+    uci.handle("stop")
+    assert lines[-1].startswith("bestmove") and lines[-1] != "bestmove 0000"
+
+
+def test_search_seconds():
+    """movetime wins over the clock, the clock is split over the moves to go"""
+    assert search_seconds({"movetime": 1000}, True) == 0.95
+    assert search_seconds({"wtime": 30000, "winc": 1000, "btime": 1}, True) == 1.5
+    assert search_seconds({"btime": 10000, "movestogo": 2}, False) == 5.0
+    assert search_seconds({"depth": 3}, True) is None